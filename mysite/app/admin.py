@@ -0,0 +1,225 @@
+"""
+Admin of the jobs, built for large tables.
+
+The changelist never counts the whole table: the paginator counts exactly
+up to ADMIN_EXACT_COUNT_LIMIT rows and estimates above from the table
+statistics, and the full result count isn't shown. Filters and the date
+hierarchy are served by indexes, the search goes through the trigram index
+of app/search.py, and `desc` isn't loaded by the list.
+
+Actions are set-based UPDATEs in batches that keep the company counters,
+the trend rollups and the caches right. Archiving soft deletes the jobs,
+in place of the delete action, and the purge_deleted_jobs command removes
+their rows later.
+"""
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db import OperationalError, connections
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Greatest, Least
+from django.utils.functional import cached_property
+
+from app import search
+from app.cache import invalidate_jobs
+from app.models import Job, delete_jobs, update_jobs
+from app.percolator import percolate_later
+
+# Days a reactivated job is listed for, like a new job
+REACTIVATION_DAYS = 14
+
+
+def estimated_count(queryset):
+    """
+    Row count of the table of a queryset without filters from the statistics,
+    soft deleted jobs included.
+    """
+    if queryset.query.where != queryset.model._default_manager.all().query.where:
+        return None
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [table],
+            )
+            row = cursor.fetchone()
+            return row[0] if row and row[0] > 0 else None
+        if connection.vendor == "sqlite":
+            # ANALYZE's row count, else the largest rowid, both cheap
+            try:
+                cursor.execute(
+                    "SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table]
+                )
+                row = cursor.fetchone()
+            except OperationalError:  # Never analyzed
+                row = None
+            if row:
+                return int(row[0].split()[0])
+            cursor.execute(f"SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}")
+            return cursor.fetchone()[0]
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Counts exactly up to ADMIN_EXACT_COUNT_LIMIT rows and estimates larger
+    counts, or stops at the limit when no estimate is available.
+    """
+
+    @cached_property
+    def count(self):
+        limit = settings.ADMIN_EXACT_COUNT_LIMIT
+        count = self.object_list.order_by()[: limit + 1].count()
+        if count <= limit:
+            return count
+        return max(estimated_count(self.object_list) or 0, count)
+
+
+class StatusFilter(admin.SimpleListFilter):
+    """
+    The statuses `compute_status` writes, which differ from the field's
+    choices, listed without a DISTINCT over the table.
+    """
+
+    title = "status"
+    parameter_name = "status"
+
+    def lookups(self, request, model_admin):
+        return [
+            ("active", "Active"),
+            ("scheduled", "Scheduled"),
+            ("expired", "Expired"),
+        ]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(status=self.value())
+        return queryset
+
+
+class JobChangeList(ChangeList):
+    def get_queryset(self, request, exclude_parameters=None):
+        return super().get_queryset(request, exclude_parameters).defer("desc")
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = [
+        "id",
+        "title",
+        "company_name",
+        "location",
+        "status",
+        "posting_date",
+        "expiration_date",
+        "views",
+    ]
+    list_display_links = ["id", "title"]
+    list_filter = [StatusFilter]
+    date_hierarchy = "posting_date"
+    # Served by the primary key, unlike the model's -created_at
+    ordering = ["-id"]
+    search_fields = ["title", "desc", "company_name"]
+    search_help_text = "Substring of the title, description or company, or a job id"
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+    actions = ["expire_jobs", "reactivate_jobs", "archive_jobs"]
+    readonly_fields = [
+        "company",
+        "salary_range_avg",
+        "status",
+        "version",
+        "views",
+        "popularity",
+        "latitude",
+        "longitude",
+        "remote",
+        "geo_cell",
+        "created_at",
+        "updated_at",
+    ]
+
+    def get_changelist(self, request, **kwargs):
+        return JobChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        q = search.search_q(term)
+        if term.isdigit():
+            q |= Q(id=int(term))
+        return queryset.filter(q), False
+
+    def update_selected(self, request, queryset, changes, verb):
+        job_ids = list(queryset.order_by().values_list("id", flat=True))
+        updated, activated = update_jobs(job_ids, changes)
+        invalidate_jobs(job_ids)
+        if activated and settings.SAVED_SEARCH_ALERTS_ENABLED:
+            percolate_later(activated)
+        self.message_user(request, f"{updated} jobs {verb}.", messages.SUCCESS)
+
+    @admin.action(description="Expire selected jobs")
+    def expire_jobs(self, request, queryset):
+        yesterday = date.today() - timedelta(days=1)
+        self.update_selected(
+            request,
+            queryset,
+            {
+                "expiration_date": Least(F("expiration_date"), Value(yesterday)),
+                "status": "expired",
+            },
+            "expired",
+        )
+
+    @admin.action(description="Reactivate selected jobs")
+    def reactivate_jobs(self, request, queryset):
+        today = date.today()
+        self.update_selected(
+            request,
+            queryset,
+            {
+                "expiration_date": Greatest(
+                    F("expiration_date"),
+                    Value(today + timedelta(days=REACTIVATION_DAYS)),
+                ),
+                "status": Case(
+                    When(posting_date__gt=today, then=Value("scheduled")),
+                    default=Value("active"),
+                ),
+            },
+            "reactivated",
+        )
+
+    @admin.action(description="Archive selected jobs", permissions=["delete"])
+    def archive_jobs(self, request, queryset):
+        job_ids = list(queryset.order_by().values_list("id", flat=True))
+        archived = delete_jobs(job_ids)
+        invalidate_jobs(job_ids)
+        self.message_user(request, f"{archived} jobs archived.", messages.SUCCESS)
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop("delete_selected", None)  # Archiving soft deletes instead
+        return actions
+
+    def get_deleted_objects(self, objs, request):
+        # A summary instead of every related row, the search grams included
+        count = len(objs) if isinstance(objs, list) else objs.count()
+        opts = self.model._meta
+        perms_needed = set()
+        if not self.has_delete_permission(request):
+            perms_needed.add(opts.verbose_name)
+        summary = f"{count} {opts.verbose_name_plural}"
+        return [summary], {opts.verbose_name_plural: count}, perms_needed, []
+
+    def delete_queryset(self, request, queryset):
+        job_ids = list(queryset.order_by().values_list("id", flat=True))
+        delete_jobs(job_ids)
+        invalidate_jobs(job_ids)
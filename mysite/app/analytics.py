@@ -0,0 +1,155 @@
+"""
+Salary distribution statistics grouped by location, company or skill.
+
+The salaries are read with one streamed query into NumPy arrays and the
+percentiles of every group are computed at once on the sorted values,
+using the same linear interpolation as `numpy.percentile`.
+"""
+import logging
+from array import array
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+
+from app.cache import generation_key
+from app.models import Job
+
+logger = logging.getLogger(__name__)
+
+GROUP_FIELDS = {
+    "location": "location",
+    "company": "company_name",
+    "skill": "required_skills",
+}
+
+# Salaries that are not real figures, 面議 is stored as a placeholder average
+EXCLUDED_SALARY_RANGES = ["", "面議"]
+
+CHUNK_SIZE = 20000
+
+# salary_range_avg has max_digits=10, so cents always fit in 34 bits
+CENTS_BITS = 40
+
+
+def load_salaries(group_by, status=None):
+    """
+    Stream (group, salary) pairs into arrays of group codes and salaries.
+    Returns the group names, the codes and the salaries.
+    """
+    jobs = Job.objects.exclude(salary_range__in=EXCLUDED_SALARY_RANGES)
+    if status:
+        jobs = jobs.filter(status=status)
+    rows = (
+        jobs.order_by()
+        .annotate(salary=Cast("salary_range_avg", FloatField()))
+        .values_list(GROUP_FIELDS[group_by], "salary")
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+    names = []
+    name_codes = {}
+    codes = array("q")
+    salaries = array("d")
+    for name, salary in rows:
+        code = name_codes.get(name)
+        if code is None:
+            code = name_codes[name] = len(names)
+            names.append(name)
+        codes.append(code)
+        salaries.append(salary)
+
+    return (
+        names,
+        np.frombuffer(codes, dtype=np.int64),
+        np.frombuffer(salaries, dtype=np.float64),
+    )
+
+
+def explode_skills(skill_lists, codes, salaries):
+    """
+    Turn one row per job into one row per (job, skill). `skill_lists` are the
+    distinct `required_skills` strings indexed by `codes`.
+    """
+    skills = []
+    skill_codes = {}
+    flat = []
+    lengths = []
+    for skill_list in skill_lists:
+        tokens = dict.fromkeys(
+            token.strip() for token in skill_list.split(",") if token.strip()
+        )
+        for token in tokens:
+            if token not in skill_codes:
+                skill_codes[token] = len(skills)
+                skills.append(token)
+            flat.append(skill_codes[token])
+        lengths.append(len(tokens))
+
+    flat = np.array(flat, dtype=np.int64)
+    lengths = np.array(lengths, dtype=np.int64)
+    offsets = np.cumsum(lengths) - lengths
+
+    counts = lengths[codes]
+    total = int(counts.sum())
+    row_starts = np.repeat(np.cumsum(counts) - counts, counts)
+    positions = np.repeat(offsets[codes], counts) + np.arange(total) - row_starts
+    return skills, flat[positions], np.repeat(salaries, counts)
+
+
+def grouped_stats(names, codes, salaries, percentiles=(25, 50, 75)):
+    # Salaries have two decimals, packing (group, cents) into one integer key
+    # sorts them by group then value much faster than a lexsort
+    keys = (codes << CENTS_BITS) | np.rint(salaries * 100).astype(np.int64)
+    keys.sort()
+    values = (keys & ((1 << CENTS_BITS) - 1)) / 100
+    counts = np.bincount(codes, minlength=len(names))
+    present = np.flatnonzero(counts)
+    counts = counts[present]
+    starts = np.cumsum(counts) - counts
+
+    stats = {
+        "count": counts,
+        "min": values[starts],
+        "max": values[starts + counts - 1],
+    }
+    for percentile in percentiles:
+        position = starts + (counts - 1) * (percentile / 100)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        stats[f"p{percentile}"] = values[low] + (values[high] - values[low]) * (
+            position - low
+        )
+
+    return [
+        {
+            "group": names[code],
+            **{name: column[i].item() for name, column in stats.items()},
+        }
+        for i, code in enumerate(present)
+    ]
+
+
+def salary_stats(group_by, status=None):
+    """
+    Salary statistics per group, largest groups first.
+    Cached until the next job write.
+    """
+    key = generation_key("salary-stats", group_by, status or "")
+    stats = cache.get(key)
+    if stats is not None:
+        return stats
+
+    names, codes, salaries = load_salaries(group_by, status)
+    if group_by == "skill":
+        names, codes, salaries = explode_skills(names, codes, salaries)
+    stats = grouped_stats(names, codes, salaries)
+    for group in stats:
+        group["median"] = group.pop("p50")
+    stats.sort(key=lambda group: (-group["count"], group["group"]))
+
+    logger.debug(f"Computed salary stats by {group_by} over {len(salaries)} rows")
+    cache.set(key, stats, timeout=settings.JOB_ANALYTICS_CACHE_TIMEOUT)
+    return stats
@@ -1,20 +1,64 @@
 import logging
-from datetime import datetime
+from datetime import date
 from typing import List, Optional
 
-from app.models import Job
+from app import columnar, geo, search
+from app.analytics import salary_stats
+from app.auth import JWTAuth
+from app.cache import (
+    CachedList,
+    cache_jobs,
+    get_cached_jobs,
+    invalidate_job,
+    list_cache_key,
+)
+from app.counters import view_counter
+from app.models import (
+    SEARCH_FIELDS,
+    TREND_FIELDS,
+    Company,
+    Job,
+    SavedSearch,
+    compute_status,
+    refresh_statuses,
+    update_company_counters,
+    update_job_derived,
+)
+from app.percolator import percolate_later
 from app.schemas import (
+    CompanyOrderByEnum,
+    CompanySchema,
+    JobBatchQuery,
+    JobBatchRequest,
+    JobBatchSchema,
     JobCreateSchema,
     JobListFilters,
+    JobPatchSchema,
     JobSchema,
     JobUpdateSchema,
     OrderByEnum,
+    SalaryGroupByEnum,
+    SalaryStatsSchema,
+    SimilarJobSchema,
+    SavedSearchCreateSchema,
+    SavedSearchSchema,
+    TrendDimensionEnum,
+    TrendPeriodEnum,
+    TrendPointSchema,
 )
-from django.db.models import Q
+from app.similar import get_similar_jobs
+from app.startup import is_warmup_request
+from app.trends import trend_series
+from app.utils import parse_if_match, version_etag
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from ninja import Query, Router
+from ninja.errors import HttpError
 from ninja.pagination import PageNumberPagination, paginate
-from ninja_jwt.authentication import JWTAuth
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +66,18 @@ router = Router(tags=["Jobs"])  # This is a Router, not a full NinjaAPI
 
 default_auth = JWTAuth()
 
+# PATCHes touching these fields read the row first to keep the company
+# counters, the trend rollups and the search index right
+COUNTER_FIELDS = {
+    "title",
+    "desc",
+    "company_name",
+    "posting_date",
+    "expiration_date",
+    "location",
+    "required_skills",
+}
+
 
 @router.post("/jobs", response={201: JobSchema}, auth=default_auth)
 def create_job(request, payload: JobCreateSchema):
@@ -35,17 +91,21 @@ def create_job(request, payload: JobCreateSchema):
     return job
 
 
-@router.get("/jobs", response={200: List[JobSchema]}, tags=["Jobs"])
-@paginate(PageNumberPagination, page_size=10)
-def list_jobs(
-    request,
-    filters: JobListFilters = Query(default_factory=JobListFilters),
-    order_by: Optional[OrderByEnum] = None,
-):
+JOB_LIST_PAGE_SIZE = 10
+
+
+def filter_jobs(filters, order, search_term=None):
+    """
+    The jobs listed by `list_jobs`, answered from the columnar snapshot when
+    it supports the filters.
+    """
     orm_filters = {}
-    for name, value in filters.dict(exclude_none=True).items():
+    params = filters.dict(exclude_none=True)
+    for name, value in params.items():
         logger.debug(f"Filtering {name}, value: {value}")
-        if "required_skills" in name:
+        if name in geo.GEO_FILTERS:
+            continue  # Applied below with geo.area_q
+        elif "required_skills" in name:
             orm_filters[name + "__icontains"] = value
         elif "salary_" in name:
             # salary_gte: filter all jobs that salary_range avg. >= salary_gte
@@ -62,33 +122,155 @@ def list_jobs(
     jobs = Job.objects.filter(**orm_filters)
     if orm_filters:
         jobs = jobs.filter(**orm_filters)
+    if params.keys() & geo.GEO_FILTERS:
+        jobs = jobs.filter(geo.area_q(params))
 
-    search_term = request.GET.get("search", None)  # Example: /jobs?search=developer
     if search_term:
-        jobs = jobs.filter(
-            Q(title__icontains=search_term)
-            | Q(desc__icontains=search_term)
-            | Q(company_name__icontains=search_term)
-        )
-
-    if order_by:
-        jobs = jobs.order_by(order_by.value)
-    else:
-        jobs = jobs.order_by("-posting_date")  # Default ordering
-
-    for job in Job.objects.filter(
-        Q(status="SCHEDULED", posting_date__lte=datetime.now())
-        | Q(status="ACTIVE", expiration_date__lt=datetime.now())
-    ):
-        job.save()  # This will trigger status update logic in the model
+        jobs = jobs.filter(search.search_q(search_term))
+
+    jobs = jobs.order_by(order, "-id")  # Tie-break so pages are stable
 
+    if not search_term:
+        snapshot_jobs = columnar.query_jobs(filters, order, jobs)
+        if snapshot_jobs is not None:
+            return snapshot_jobs
     return jobs
 
 
+@router.get("/jobs", response={200: List[JobSchema]}, tags=["Jobs"])
+@paginate(PageNumberPagination, page_size=JOB_LIST_PAGE_SIZE)
+def list_jobs(
+    request,
+    filters: JobListFilters = Query(default_factory=JobListFilters),
+    order_by: Optional[OrderByEnum] = None,
+):
+    search_term = request.GET.get("search", None)  # Example: /jobs?search=developer
+    order = order_by.value if order_by else "-posting_date"  # Default ordering
+
+    if not is_warmup_request(request):
+        refresh_statuses()
+
+    def source():
+        return filter_jobs(filters, order, search_term)
+
+    if settings.JOB_LIST_CACHE_ENABLED:
+        params = {**filters.dict(exclude_none=True), "order": order}
+        params["search"] = search_term
+        return CachedList(list_cache_key(params), source, serialize_job)
+    return source()
+
+
+@router.get(
+    "/jobs/analytics/salary",
+    response={200: List[SalaryStatsSchema]},
+    tags=["Analytics"],
+)
+def salary_analytics(
+    request,
+    group_by: SalaryGroupByEnum = SalaryGroupByEnum.location,
+    status: Optional[str] = None,
+):
+    """
+    Salary distribution (min, p25, median, p75, max) of `salary_range_avg`
+    per location, company or skill. Negotiable salaries are left out.
+    """
+    return salary_stats(group_by.value, status)
+
+
+@router.get(
+    "/jobs/analytics/trends",
+    response={200: List[TrendPointSchema]},
+    tags=["Analytics"],
+)
+def trend_analytics(
+    request,
+    dimension: TrendDimensionEnum,
+    period: TrendPeriodEnum = TrendPeriodEnum.week,
+    value: Optional[str] = None,
+    status: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+):
+    """
+    Jobs posted per day or week (buckets start on Mondays) for a skill or
+    location, or for all of them when `value` isn't given. Read from the
+    rollups, so the cost depends on the number of buckets only.
+    """
+    return list(trend_series(dimension.value, period.value, value, status, start, end))
+
+
+def serialize_job(job):
+    return JobSchema.from_orm(job).dict()
+
+
+def load_jobs(job_ids):
+    """
+    Serialized jobs by id, read from the per-id cache when enabled and
+    otherwise with a single `in_bulk` query. Duplicates are dropped.
+    Returns the jobs in the requested order and the missing ids.
+    """
+    job_ids = list(dict.fromkeys(job_ids))
+    jobs = get_cached_jobs(job_ids)
+    misses = [job_id for job_id in job_ids if job_id not in jobs]
+    if misses:
+        fetched = {
+            job_id: serialize_job(job)
+            for job_id, job in Job.objects.in_bulk(misses).items()
+        }
+        cache_jobs(fetched)
+        jobs.update(fetched)
+    items = [jobs[job_id] for job_id in job_ids if job_id in jobs]
+    missing = [job_id for job_id in job_ids if job_id not in jobs]
+    return items, missing
+
+
+@router.get("/jobs/batch", response={200: JobBatchSchema}, tags=["Jobs"])
+def get_jobs_batch(request, query: JobBatchQuery = Query(...)):
+    """
+    Fetch up to 100 jobs by id in one call: /jobs/batch?ids=1,2,3
+    """
+    items, missing = load_jobs(query.ids)
+    return {"items": items, "missing": missing}
+
+
+@router.post("/jobs/batch", response={200: JobBatchSchema}, tags=["Jobs"])
+def post_jobs_batch(request, payload: JobBatchRequest):
+    """
+    Fetch up to 1000 jobs by id, for lists too long for a query string.
+    """
+    items, missing = load_jobs(payload.ids)
+    return {"items": items, "missing": missing}
+
+
 @router.get("/jobs/{job_id}", response={200: JobSchema}, tags=["Jobs"])
-def get_job(request, job_id: int):
-    job = get_object_or_404(Job, id=job_id)
-    return job
+def get_job(request, job_id: int, response: HttpResponse):
+    items, _ = load_jobs([job_id])
+    if not items:
+        raise Http404
+    view_counter.hit(job_id)
+    response["ETag"] = version_etag(items[0]["version"])
+    return items[0]
+
+
+@router.get(
+    "/jobs/{job_id}/similar", response={200: List[SimilarJobSchema]}, tags=["Jobs"]
+)
+def list_similar_jobs(request, job_id: int, limit: int = Query(10, ge=1, le=50)):
+    """
+    Jobs with the most similar title, description and skills, by cosine
+    similarity of their TF-IDF vectors.
+    """
+    neighbours = get_similar_jobs().similar(job_id, limit)
+    if neighbours is None:
+        raise HttpError(503, "The similar jobs index isn't built")
+    if not neighbours and not Job.objects.filter(id=job_id).exists():
+        raise Http404
+    items, _ = load_jobs([job_id for job_id, _ in neighbours])
+    scores = dict(neighbours)
+    return sorted(
+        ({**item, "score": scores[item["id"]]} for item in items),
+        key=lambda item: -item["score"],
+    )
 
 
 @router.put("/jobs/{job_id}", response={200: JobSchema}, auth=default_auth)
@@ -102,8 +284,208 @@ def update_job(request, job_id: int, payload: JobUpdateSchema):
     return job
 
 
+@router.patch("/jobs/{job_id}", response={200: JobSchema, 204: None}, auth=default_auth)
+def patch_job(request, job_id: int, payload: JobPatchSchema, response: HttpResponse):
+    """
+    Partially update a job with a single conditional UPDATE.
+
+    Only the sent fields are written, derived fields are recomputed only when
+    their inputs change. Changes of the company, location, skills, dates or
+    searched text also read the row under lock to update the company
+    counters, the trend rollups and the search index.
+    The expected version comes from the If-Match header (412 on mismatch) or
+    from `version` in the body (409 on mismatch).
+    Send `Prefer: return=minimal` to skip reading the job back.
+    """
+    changes = payload.dict(exclude_unset=True)
+    expected_version = changes.pop("version", None)
+    changes = {attr: value for attr, value in changes.items() if value is not None}
+    if_match = parse_if_match(request.headers.get("If-Match"))
+    logger.info(f"Patching job {job_id} with changes: {changes}")
+
+    jobs = Job.objects.filter(id=job_id)
+    if if_match is not None:
+        jobs = jobs.filter(version__in=if_match)
+    if expected_version is not None:
+        jobs = jobs.filter(version=expected_version)
+
+    if "salary_range" in changes:
+        changes["salary_range_avg"] = Job(
+            salary_range=changes["salary_range"]
+        ).compute_salary_range_avg()
+    if "location" in changes:
+        changes.update(geo.geo_fields(changes["location"]))
+
+    # The searched text, `desc` above all, is only read when it changes
+    searched = not changes.keys().isdisjoint(SEARCH_FIELDS)
+    with transaction.atomic():
+        current = None
+        if COUNTER_FIELDS.intersection(changes):
+            # The company counters and the rollups need the old values
+            current = (
+                jobs.select_for_update()
+                .values(
+                    *dict.fromkeys(
+                        [
+                            "company_id",
+                            "version",
+                            "expiration_date",
+                            *TREND_FIELDS,
+                            *(SEARCH_FIELDS if searched else []),
+                        ]
+                    )
+                )
+                .first()
+            )
+            if current is not None:
+                if "company_name" in changes:
+                    changes["company_id"] = Company.get_for_name(
+                        changes["company_name"]
+                    ).id
+                if "posting_date" in changes or "expiration_date" in changes:
+                    changes["status"] = compute_status(
+                        changes.get("posting_date", current["posting_date"]),
+                        changes.get("expiration_date", current["expiration_date"]),
+                    )
+
+        if not changes:
+            matched = jobs.exists()
+        elif COUNTER_FIELDS.intersection(changes) and current is None:
+            matched = 0
+        else:
+            matched = jobs.update(
+                **changes, version=F("version") + 1, updated_at=timezone.now()
+            )
+
+        if current is not None and matched:
+            update_company_counters(
+                (current["company_id"], current["status"]),
+                (
+                    changes.get("company_id", current["company_id"]),
+                    changes.get("status", current["status"]),
+                ),
+            )
+            update_job_derived(
+                job_id,
+                current["version"] + 1,
+                (
+                    tuple(current[field] for field in TREND_FIELDS),
+                    tuple(changes.get(field, current[field]) for field in TREND_FIELDS),
+                ),
+                (
+                    (
+                        tuple(current[field] for field in SEARCH_FIELDS),
+                        tuple(
+                            changes.get(field, current[field])
+                            for field in SEARCH_FIELDS
+                        ),
+                    )
+                    if searched
+                    else None
+                ),
+            )
+            if (
+                settings.SAVED_SEARCH_ALERTS_ENABLED
+                and changes.get("status") == "active"
+                and current["status"] != "active"
+            ):
+                percolate_later([job_id])
+
+    if changes and matched:
+        invalidate_job(job_id)
+
+    if not matched:
+        current = Job.objects.filter(id=job_id).values_list("version", flat=True)
+        if not current:
+            raise Http404
+        if if_match is not None and current[0] not in if_match:
+            raise HttpError(412, "Precondition Failed")
+        raise HttpError(409, f"Version conflict, current version is {current[0]}")
+
+    if request.headers.get("Prefer") == "return=minimal":
+        # The new version is only known without a read when it was asserted
+        if expected_version is None and if_match and len(if_match) == 1:
+            expected_version = if_match[0]
+        if expected_version is not None:
+            response["ETag"] = version_etag(expected_version + bool(changes))
+        return 204, None
+
+    job = Job.objects.get(id=job_id)
+    response["ETag"] = version_etag(job.version)
+    return job
+
+
+@router.get("/companies", response={200: List[CompanySchema]}, tags=["Companies"])
+@paginate(PageNumberPagination, page_size=10)
+def list_companies(request, order_by: Optional[CompanyOrderByEnum] = None):
+    """
+    Companies with their active and total job counts, maintained on job
+    writes instead of aggregated per request.
+    """
+    order = order_by.value if order_by else "name"
+    return Company.objects.order_by(order, "id")
+
+
 @router.delete("/jobs/{job_id}", response={204: None}, auth=default_auth)
 def delete_job(request, job_id: int):
+    """Soft delete a job, its row is purged later by `purge_deleted_jobs`."""
     job = get_object_or_404(Job, id=job_id)
     job.delete()
     return None
+
+
+@router.post(
+    "/saved-searches",
+    response={201: SavedSearchSchema},
+    auth=default_auth,
+    tags=["Saved searches"],
+)
+def create_saved_search(request, payload: SavedSearchCreateSchema):
+    """
+    Save `filters` to be alerted of the jobs created or activated later
+    that `GET /jobs` would list with them.
+    """
+    saved_search = SavedSearch.objects.create(
+        user=request.auth,
+        name=payload.name,
+        filters=payload.filters.model_dump(mode="json", exclude_none=True),
+    )
+    return 201, saved_search
+
+
+@router.get(
+    "/saved-searches",
+    response={200: List[SavedSearchSchema]},
+    auth=default_auth,
+    tags=["Saved searches"],
+)
+@paginate(PageNumberPagination, page_size=10)
+def list_saved_searches(request):
+    return SavedSearch.objects.filter(user=request.auth)
+
+
+@router.get(
+    "/saved-searches/{saved_search_id}/matches",
+    response={200: List[JobSchema]},
+    auth=default_auth,
+    tags=["Saved searches"],
+)
+@paginate(PageNumberPagination, page_size=10)
+def list_saved_search_matches(request, saved_search_id: int):
+    """Jobs matched by a saved search, the latest matches first."""
+    saved_search = get_object_or_404(SavedSearch, id=saved_search_id, user=request.auth)
+    return Job.objects.filter(id__in=saved_search.matches.values("job_id")).order_by(
+        "-created_at", "-id"
+    )
+
+
+@router.delete(
+    "/saved-searches/{saved_search_id}",
+    response={204: None},
+    auth=default_auth,
+    tags=["Saved searches"],
+)
+def delete_saved_search(request, saved_search_id: int):
+    saved_search = get_object_or_404(SavedSearch, id=saved_search_id, user=request.auth)
+    saved_search.delete()
+    return 204, None
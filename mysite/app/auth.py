@@ -0,0 +1,27 @@
+"""
+JWT authentication of the API, with ninja_jwt imported on first use.
+
+ninja_jwt pulls in ninja_extra and pydantic.v1, which every module with an
+endpoint would otherwise import with it. `JWTAuth` only imports it for the
+first request with a bearer token.
+"""
+from functools import cache
+
+from ninja.security import HttpBearer
+
+
+@cache
+def jwt_authentication():
+    from ninja_jwt.authentication import JWTAuth
+
+    return JWTAuth()
+
+
+class JWTAuth(HttpBearer):
+    """
+    ninja_jwt's JWTAuth, imported by the first request with a token. Named
+    alike, so the OpenAPI security scheme doesn't change.
+    """
+
+    def authenticate(self, request, token):
+        return jwt_authentication().authenticate(request, token)
@@ -0,0 +1,217 @@
+"""
+Cache helpers shared by the job endpoints.
+
+Every job write bumps a generation number. Values derived from many jobs
+embed the generation in their cache key, so a write invalidates all of them
+at once without tracking which jobs they were computed from.
+
+Single jobs are cached by id when JOB_CACHE_ENABLED is set and are deleted
+from the cache on every write of that job.
+
+`get_or_compute` protects hot entries such as the first `list_jobs` page
+from stampedes: one caller per key recomputes (threads of a process wait on
+it, other processes are kept out by a lock in the cache) while the others
+are served the stale value, and entries are refreshed early with a
+probability growing as they near expiry so they don't all expire together.
+"""
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+GENERATION_KEY = "jobs:generation"
+
+
+def get_generation() -> int:
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Start from the clock so an evicted counter never goes back to a
+        # generation that still has cached values
+        cache.add(GENERATION_KEY, time.time_ns() // 1000, timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_generation() -> None:
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        get_generation()
+
+
+def generation_key(prefix: str, *parts) -> str:
+    return ":".join([prefix, *map(str, parts), f"g{get_generation()}"])
+
+
+def job_key(job_id) -> str:
+    return f"jobs:{job_id}"
+
+
+def get_cached_jobs(job_ids) -> dict:
+    if not settings.JOB_CACHE_ENABLED:
+        return {}
+    cached = cache.get_many([job_key(job_id) for job_id in job_ids])
+    return {data["id"]: data for data in cached.values()}
+
+
+def cache_jobs(jobs: dict) -> None:
+    if settings.JOB_CACHE_ENABLED and jobs:
+        cache.set_many(
+            {job_key(job_id): data for job_id, data in jobs.items()},
+            timeout=settings.JOB_CACHE_TIMEOUT,
+        )
+
+
+def invalidate_job(job_id) -> None:
+    cache.delete(job_key(job_id))
+    bump_generation()
+
+
+def invalidate_jobs(job_ids) -> None:
+    cache.delete_many([job_key(job_id) for job_id in job_ids])
+    bump_generation()
+
+
+class Flight:
+    """A computation in progress in this process."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.failed = False
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def is_fresh(entry, generation, beta=1.0) -> bool:
+    """
+    Whether a cached entry can be served without refreshing it. Entries are
+    stale once expired or computed before the last job write, and are
+    refreshed early with probability growing near expiry (XFetch), scaled by
+    how long they took to compute.
+    """
+    if entry["generation"] != generation:
+        return False
+    early = entry["delta"] * beta * -math.log(1.0 - random.random())
+    return time.time() + early < entry["expires"]
+
+
+def get_or_compute(key, compute, timeout=None, stale_timeout=None):
+    """
+    Return the cached value of `key`, computing it with `compute()` when
+    missing or stale. Only one caller computes a key at a time, the others
+    get the stale value or, when there is none yet, wait for the result.
+    """
+    timeout = settings.JOB_LIST_CACHE_TIMEOUT if timeout is None else timeout
+    if stale_timeout is None:
+        stale_timeout = settings.JOB_LIST_CACHE_STALE_TIMEOUT
+    lock_timeout = settings.JOB_CACHE_LOCK_TIMEOUT
+
+    generation = get_generation()
+    entry = cache.get(key)
+    if entry is not None and is_fresh(entry, generation):
+        return entry["value"]
+
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = Flight()
+
+    if not leader:
+        if entry is not None:
+            return entry["value"]
+        flight.done.wait(lock_timeout)
+        if flight.done.is_set() and not flight.failed:
+            return flight.value
+        return compute()
+
+    lock_key = f"{key}:lock"
+    try:
+        locked = cache.add(lock_key, True, timeout=lock_timeout)
+        if not locked:
+            # Another process is computing it
+            if entry is not None:
+                flight.value = entry["value"]
+                return entry["value"]
+            deadline = time.monotonic() + lock_timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                entry = cache.get(key)
+                if entry is not None and entry["generation"] == generation:
+                    flight.value = entry["value"]
+                    return entry["value"]
+
+        started = time.monotonic()
+        try:
+            value = compute()
+        finally:
+            if locked:
+                cache.delete(lock_key)
+        cache.set(
+            key,
+            {
+                "value": value,
+                "generation": generation,
+                "expires": time.time() + timeout,
+                "delta": time.monotonic() - started,
+            },
+            timeout=timeout + stale_timeout,
+        )
+        flight.value = value
+        return value
+    except Exception:
+        flight.failed = True
+        raise
+    finally:
+        flight.done.set()
+        with _flights_lock:
+            _flights.pop(key, None)
+
+
+def list_cache_key(params) -> str:
+    digest = hashlib.md5(
+        json.dumps(params, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return f"jobs:list:{digest}"
+
+
+class CachedList:
+    """
+    Stands in for the `list_jobs` QuerySet in ninja's pagination, the count
+    and every page are cached with `get_or_compute`. `source()` builds the
+    QuerySet-like object read on a miss and `serialize` turns its jobs into
+    cacheable dicts.
+    """
+
+    def __init__(self, key, source, serialize):
+        self.key = key
+        self.source = source
+        self.serialize = serialize
+        self._source = None
+
+    def get_source(self):
+        if self._source is None:
+            self._source = self.source()
+        return self._source
+
+    def all(self):
+        return self
+
+    def count(self):
+        return get_or_compute(
+            f"{self.key}:count", lambda: self.get_source().all().count()
+        )
+
+    def __getitem__(self, item):
+        return get_or_compute(
+            f"{self.key}:{item.start}:{item.stop}",
+            lambda: [self.serialize(job) for job in self.get_source()[item]],
+        )
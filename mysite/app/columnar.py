@@ -0,0 +1,334 @@
+"""
+In-process columnar snapshot of the ACTIVE jobs.
+
+The active set is small compared to the job history and is read on almost
+every `list_jobs` call, so it is kept in NumPy columns and filtered with
+vectorized masks. Only the filters and orderings below are answered here,
+anything else returns None and `list_jobs` falls back to the ORM.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+
+from app.models import Job
+from app.utils import fold_case
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+logger = logging.getLogger(__name__)
+
+STATUS_CODES = {"active": 0, "expired": 1, "scheduled": 2}
+SNAPSHOT_STATUSES = ["active"]
+
+# filter name -> (column, comparison)
+SUPPORTED_FILTERS = {
+    "status": ("status", "eq"),
+    "location": ("location", "eq"),
+    "salary_gte": ("salary", "gte"),
+    "salary_lte": ("salary", "lte"),
+    "posting_date__gte": ("posting_date", "gte"),
+    "posting_date__lte": ("posting_date", "lte"),
+    "expiration_date__gte": ("expiration_date", "gte"),
+    "expiration_date__lte": ("expiration_date", "lte"),
+    "required_skills": ("skills", "icontains"),
+    "company_id": ("company_id", "eq"),
+}
+
+ORDERINGS = {
+    "posting_date": ("posting_date", False),
+    "-posting_date": ("posting_date", True),
+    "expiration_date": ("expiration_date", False),
+    "-expiration_date": ("expiration_date", True),
+}
+
+FIELDS = [
+    "id",
+    "status",
+    "posting_date",
+    "expiration_date",
+    "salary_range_avg",
+    "location",
+    "company_name",
+    "company_id",
+    "required_skills",
+    "updated_at",
+]
+
+# Rows committed slightly out of updated_at order are picked up again
+WATERMARK_OVERLAP = timedelta(seconds=5)
+
+
+class Interner:
+    """Map strings to dense integer ids."""
+
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+
+    def __len__(self):
+        return len(self.values)
+
+    def intern(self, value):
+        if value not in self.ids:
+            self.ids[value] = len(self.values)
+            self.values.append(value)
+        return self.ids[value]
+
+    def get(self, value):
+        return self.ids.get(value, -1)
+
+
+class ColumnarResult:
+    """
+    Ordered job ids quacking like a QuerySet for ninja's pagination, only the
+    requested page is loaded from the database.
+    """
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    def all(self):
+        return self
+
+    def count(self):
+        return len(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, item):
+        ids = self.ids[item].tolist()
+        jobs = Job.objects.in_bulk(ids)
+        return [jobs[job_id] for job_id in ids if job_id in jobs]
+
+
+class ActiveJobSnapshot:
+    def __init__(self, refresh_interval=1.0):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._refreshed_at = None
+        self._watermark = None
+        # (columns, interners), replaced as a whole so readers never see a
+        # half-applied refresh. Interners are append-only between rebuilds.
+        self.state = self._build_columns([], self._new_interners())
+
+    def __len__(self):
+        return len(self.state[0]["id"])
+
+    @staticmethod
+    def _new_interners():
+        return {"location": Interner(), "company": Interner(), "skills": Interner()}
+
+    def _build_columns(self, rows, interners):
+        skill_pairs = ([], [])
+        for i, row in enumerate(rows):
+            for token in fold_case(row["required_skills"]).split(","):
+                skill_pairs[0].append(i)
+                skill_pairs[1].append(interners["skills"].intern(token))
+
+        words = max(1, -(-len(interners["skills"]) // 64))
+        skills = np.zeros((len(rows), words), dtype=np.uint64)
+        row_idx = np.array(skill_pairs[0], dtype=np.int64)
+        token_ids = np.array(skill_pairs[1], dtype=np.uint64)
+        np.bitwise_or.at(
+            skills,
+            (row_idx, (token_ids // np.uint64(64)).astype(np.int64)),
+            np.left_shift(np.uint64(1), token_ids % np.uint64(64)),
+        )
+
+        def column(values, dtype):
+            return np.fromiter(values, dtype=dtype, count=len(rows))
+
+        columns = {
+            "id": column((row["id"] for row in rows), np.int64),
+            "status": column((STATUS_CODES[row["status"]] for row in rows), np.int8),
+            "posting_date": column(
+                (row["posting_date"].toordinal() for row in rows), np.int32
+            ),
+            "expiration_date": column(
+                (row["expiration_date"].toordinal() for row in rows), np.int32
+            ),
+            # cents, so comparisons with the DecimalField stay exact
+            "salary": column(
+                (int(row["salary_range_avg"] * 100) for row in rows), np.int64
+            ),
+            "location": column(
+                (interners["location"].intern(row["location"]) for row in rows),
+                np.int32,
+            ),
+            "company": column(
+                (interners["company"].intern(row["company_name"]) for row in rows),
+                np.int32,
+            ),
+            "company_id": column((row["company_id"] or -1 for row in rows), np.int64),
+            "skills": skills,
+        }
+        return columns, interners
+
+    def _merge(self, columns, changed_ids, new_columns):
+        keep = ~np.isin(columns["id"], changed_ids)
+        merged = {}
+        for name, values in columns.items():
+            added = new_columns[name]
+            if name == "skills" and values.shape[1] < added.shape[1]:
+                padding = added.shape[1] - values.shape[1]
+                values = np.pad(values, ((0, 0), (0, padding)))
+            merged[name] = np.concatenate([values[keep], added])
+        return merged
+
+    def rebuild(self):
+        rows = list(Job.objects.filter(status__in=SNAPSHOT_STATUSES).values(*FIELDS))
+        self.state = self._build_columns(rows, self._new_interners())
+        self._watermark = max((row["updated_at"] for row in rows), default=None)
+        logger.debug(f"Columnar snapshot rebuilt with {len(rows)} jobs")
+
+    def refresh(self, force=False):
+        """
+        Apply the jobs changed or soft deleted since the last refresh. The
+        snapshot is rebuilt when it was never loaded or when its size no
+        longer matches the database, which catches rows deleted otherwise.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if (
+                not force
+                and self._refreshed_at is not None
+                and now - self._refreshed_at < self.refresh_interval
+            ):
+                return
+            self._refreshed_at = now
+
+            if self._watermark is None:
+                self.rebuild()
+                return
+
+            # Deleted jobs included, to drop them
+            changed = list(
+                Job.all_objects.filter(
+                    updated_at__gte=self._watermark - WATERMARK_OVERLAP
+                ).values(*FIELDS, "deleted_at")
+            )
+            if changed:
+                columns, interners = self.state
+                added, interners = self._build_columns(
+                    [
+                        row
+                        for row in changed
+                        if row["status"] in SNAPSHOT_STATUSES
+                        and row["deleted_at"] is None
+                    ],
+                    interners,
+                )
+                columns = self._merge(columns, [row["id"] for row in changed], added)
+                self.state = columns, interners
+                self._watermark = max(
+                    self._watermark, *(r["updated_at"] for r in changed)
+                )
+
+            active = Job.objects.filter(status__in=SNAPSHOT_STATUSES).count()
+            if active != len(self):
+                logger.info(
+                    f"Columnar snapshot has {len(self)} jobs, database {active}, rebuilding"
+                )
+                self.rebuild()
+
+    def _mask(self, columns, interners, params):
+        mask = np.ones(len(columns["id"]), dtype=bool)
+        for name, value in params.items():
+            column, comparison = SUPPORTED_FILTERS[name]
+            if column == "status":
+                mask &= columns["status"] == STATUS_CODES[value]
+            elif column == "company_id":
+                mask &= columns["company_id"] == value
+            elif column == "location":
+                mask &= columns["location"] == interners["location"].get(value)
+            elif column == "skills":
+                term = fold_case(value)
+                words = np.zeros(columns["skills"].shape[1], dtype=np.uint64)
+                for token_id, token in enumerate(interners["skills"].values):
+                    if term in token and token_id // 64 < len(words):
+                        words[token_id // 64] |= np.uint64(1) << np.uint64(
+                            token_id % 64
+                        )
+                mask &= (columns["skills"] & words).any(axis=1)
+            else:
+                if column == "salary":
+                    bound = int(value) * 100
+                else:
+                    bound = value.toordinal()
+                if comparison == "gte":
+                    mask &= columns[column] >= bound
+                else:
+                    mask &= columns[column] <= bound
+        return mask
+
+    def query(self, filters, order="-posting_date"):
+        """
+        Return the ordered ids of the jobs matching `filters`, or None when
+        the filters or the ordering can't be answered from the snapshot.
+        Ties are broken by descending id, like the ORM path.
+        """
+        params = filters.dict(exclude_none=True)
+        if (
+            set(params) - set(SUPPORTED_FILTERS)
+            or order not in ORDERINGS
+            or params.get("status") not in SNAPSHOT_STATUSES
+            or "," in params.get("required_skills", "")
+        ):
+            return None
+
+        self.refresh()
+        columns, interners = self.state
+        indexes = np.flatnonzero(self._mask(columns, interners, params))
+        column, descending = ORDERINGS[order]
+        primary = columns[column][indexes].astype(np.int64)
+        if descending:
+            primary = -primary
+        ordered = indexes[np.lexsort((-columns["id"][indexes], primary))]
+        return columns["id"][ordered]
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_snapshot():
+    global _snapshot
+    with _snapshot_lock:
+        if _snapshot is None:
+            _snapshot = ActiveJobSnapshot(settings.JOB_COLUMNAR_REFRESH_INTERVAL)
+        return _snapshot
+
+
+def reset_snapshot():
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = None
+
+
+def query_jobs(filters, order, queryset):
+    """
+    Answer `list_jobs` from the snapshot when enabled and supported.
+    With JOB_COLUMNAR_VERIFY the result is compared to `queryset` and the
+    ORM result is used on any difference.
+    """
+    if not settings.JOB_COLUMNAR_ENABLED or np is None:
+        return None
+    ids = get_snapshot().query(filters, order)
+    if ids is None:
+        return None
+    if settings.JOB_COLUMNAR_VERIFY:
+        expected = list(queryset.values_list("id", flat=True))
+        if expected != ids.tolist():
+            logger.warning(
+                f"Columnar snapshot mismatch for {filters.dict(exclude_none=True)} "
+                f"ordered by {order}, using the ORM result"
+            )
+            return None
+    return ColumnarResult(ids)
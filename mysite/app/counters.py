@@ -0,0 +1,108 @@
+"""
+Buffered job view counters.
+
+`get_job` only bumps an in-process counter; the counts are written once
+JOB_VIEW_FLUSH_INTERVAL seconds have passed (or JOB_VIEW_FLUSH_MAX_PENDING
+jobs are pending) with one `UPDATE ... SET views = views + n` per distinct
+n, and when the process exits.
+
+`popularity` is a forward-decayed view count: a view at time t weighs
+2 ** ((t - POPULARITY_EPOCH) / half-life). Older views weigh exponentially
+less relative to new ones, and since a row's score never has to be decayed
+in place, ordering by the column ranks jobs by their decayed score.
+
+The weights grow without bound, so the column stores the log2 of their sum
+and views are added to it with a log-sum-exp, which stays finite however
+far the clock is from the epoch. Jobs never viewed keep 0.
+"""
+import atexit
+import logging
+import math
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Abs, Greatest, Least, Log, Power
+
+from app.models import Job
+
+logger = logging.getLogger(__name__)
+
+POPULARITY_EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp()
+
+
+# Past this many half-lives the smaller of two scores doesn't change their
+# sum, and POWER would underflow, an error on PostgreSQL
+SCORE_MAX_GAP = 64.0
+
+
+def view_score(count=1, at=None):
+    """log2 of the weight of `count` views at `at`, a timestamp."""
+    at = time.time() if at is None else at
+    half_life = settings.JOB_POPULARITY_HALF_LIFE_DAYS * 86400
+    return (at - POPULARITY_EPOCH) / half_life + math.log2(count)
+
+
+def add_score(score):
+    """Expression of `popularity` with the views of log2 weight `score` added."""
+    score = Value(score)
+    gap = Least(Abs(F("popularity") - score), Value(SCORE_MAX_GAP))
+    return Case(
+        When(views=0, then=score),
+        default=Greatest(F("popularity"), score)
+        + Log(Value(2.0), Value(1.0) + Power(Value(2.0), -gap)),
+    )
+
+
+class ViewCounter:
+    def __init__(self):
+        self.pending = Counter()
+        self._lock = threading.Lock()
+        self._flushed_at = time.monotonic()
+
+    def hit(self, job_id):
+        with self._lock:
+            self.pending[job_id] += 1
+            due = (
+                time.monotonic() - self._flushed_at >= settings.JOB_VIEW_FLUSH_INTERVAL
+                or len(self.pending) >= settings.JOB_VIEW_FLUSH_MAX_PENDING
+            )
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write the pending counts, returns the number of jobs updated."""
+        with self._lock:
+            pending, self.pending = self.pending, Counter()
+            self._flushed_at = time.monotonic()
+        if not pending:
+            return 0
+
+        by_count = defaultdict(list)
+        for job_id, count in pending.items():
+            by_count[count].append(job_id)
+        now = time.time()
+        for count, job_ids in by_count.items():
+            Job.objects.filter(id__in=job_ids).update(
+                views=F("views") + count,
+                popularity=add_score(view_score(count, now)),
+            )
+        logger.debug(
+            f"Flushed {sum(pending.values())} views of {len(pending)} jobs "
+            f"in {len(by_count)} updates"
+        )
+        return len(pending)
+
+
+view_counter = ViewCounter()
+
+
+@atexit.register
+def flush_on_exit():
+    try:
+        view_counter.flush()
+    except Exception as e:
+        logger.warning(f"Could not flush job views on exit: {e}")
@@ -0,0 +1,59 @@
+"""
+Connection pools of the PostgreSQL databases, configured by SQL_POOL_* in
+the settings.
+
+A pool belongs to its process: the gunicorn master closes the pools it
+opened while warming up before forking, see gunicorn.conf.py, and every
+worker opens its own on its first query. `pool_stats` reports how
+saturated the pools of the current process are, served by the debug API.
+"""
+from django.db import connections
+
+
+def is_pooled(connection):
+    return connection.vendor == "postgresql" and bool(
+        connection.settings_dict["OPTIONS"].get("pool")
+    )
+
+
+def close_pools():
+    """Close the pools of this process, their connections can't be shared."""
+    for connection in connections.all():
+        if is_pooled(connection):
+            connection.close_pool()
+
+
+def pool_stats():
+    """
+    Usage of the pool of each database: the connections open, in use and
+    available, the requests waiting for one and the totals since startup.
+    Databases without a pool only report their CONN_MAX_AGE.
+    """
+    stats = []
+    for connection in connections.all():
+        row = {
+            "alias": connection.alias,
+            "vendor": connection.vendor,
+            "pooled": is_pooled(connection),
+            "conn_max_age": connection.settings_dict["CONN_MAX_AGE"],
+        }
+        if row["pooled"]:
+            pool = connection.pool.get_stats()
+            in_use = pool.get("pool_size", 0) - pool.get("pool_available", 0)
+            row.update(
+                min_size=pool.get("pool_min", 0),
+                max_size=pool.get("pool_max", 0),
+                size=pool.get("pool_size", 0),
+                available=pool.get("pool_available", 0),
+                in_use=in_use,
+                waiting=pool.get("requests_waiting", 0),
+                saturation=in_use / pool["pool_max"] if pool.get("pool_max") else 0.0,
+                requests=pool.get("requests_num", 0),
+                requests_queued=pool.get("requests_queued", 0),
+                requests_wait_ms=pool.get("requests_wait_ms", 0),
+                requests_errors=pool.get("requests_errors", 0),
+                connections_opened=pool.get("connections_num", 0),
+                connections_lost=pool.get("connections_lost", 0),
+            )
+        stats.append(row)
+    return stats
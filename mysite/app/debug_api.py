@@ -0,0 +1,64 @@
+from typing import List, Literal
+
+from app.auth import JWTAuth
+from app.dbpool import pool_stats
+from app.instrumentation import sampler, top_offenders
+from app.profiling import KINDS, list_profiles, profile_path
+from app.schemas import DatabasePoolSchema, ProfileSchema, SlowQuerySchema
+from django.http import FileResponse, Http404
+from ninja import Query, Router
+from ninja.errors import HttpError
+
+router = Router(tags=["Debug"])
+
+
+class StaffJWTAuth(JWTAuth):
+    def authenticate(self, request, token):
+        user = super().authenticate(request, token)
+        if not user.is_staff:
+            raise HttpError(403, "Staff only")
+        return user
+
+
+staff_auth = StaffJWTAuth()
+
+
+@router.get("/slow-queries", response={200: List[SlowQuerySchema]}, auth=staff_auth)
+def slow_queries(request, limit: int = Query(20, ge=1, le=500)):
+    """
+    Slow queries sampled by this worker, grouped by normalized SQL with the
+    largest total time first.
+    """
+    return top_offenders(sampler.samples, limit)
+
+
+@router.get("/db-pools", response={200: List[DatabasePoolSchema]}, auth=staff_auth)
+def db_pools(request):
+    """
+    Connection pool usage of this worker per database, a `saturation` near
+    1 or `waiting` requests mean SQL_POOL_MAX is too small.
+    """
+    return pool_stats()
+
+
+@router.get("/profiles", response={200: List[ProfileSchema]}, auth=staff_auth)
+def profiles(request, limit: int = Query(50, ge=1, le=500)):
+    """Request profiles stored by this host, newest first."""
+    return list_profiles()[:limit]
+
+
+@router.get("/profiles/{profile_id}/{kind}", auth=staff_auth)
+def download_profile(request, profile_id: str, kind: Literal["pstats", "collapsed"]):
+    """
+    Download a profile, `pstats` for pstats/snakeviz or `collapsed` stacks
+    for flamegraph.pl/speedscope.
+    """
+    path = profile_path(profile_id, kind)
+    if path is None:
+        raise Http404("Profile not found")
+    return FileResponse(
+        path.open("rb"),
+        as_attachment=True,
+        filename=path.name,
+        content_type=KINDS[kind],
+    )
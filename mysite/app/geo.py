@@ -0,0 +1,301 @@
+"""
+Geocoding of job locations and radius / bounding box filters.
+
+Locations are geocoded offline from the gazetteer bundled in
+app/data/gazetteer.csv into the indexed `latitude`, `longitude` and
+`geo_cell` columns of the job, `geo_cell` being the geohash of the point.
+Jobs whose location is a remote keyword get `remote` set instead, unknown
+locations get no coordinates and never match a geo filter.
+
+A geohash prefix is a grid cell, and every point in the cell has a geohash
+starting with it, so an area is first covered with the prefixes of at most
+MAX_COVER_CELLS cells, scanned as ranges of the `geo_cell` index, and only
+the candidates in those cells get the exact bounding box or haversine
+distance checks.
+"""
+import csv
+import math
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import F, Q, Value
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+from django.db.models.lookups import LessThanOrEqual
+
+EARTH_RADIUS_KM = 6371.0088
+GEO_CELL_PRECISION = 8
+MAX_COVER_CELLS = 32
+GEO_FILTERS = {"near", "lat", "lon", "radius_km", "bbox"}
+REMOTE_KEYWORDS = {"remote", "anywhere", "work from home", "wfh", "遠端", "遠距"}
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+# Sorts after every geohash character, closing the range of a prefix
+PREFIX_END = "{"
+
+_SEPARATORS = re.compile(r"[\s,./()\-]+")
+
+
+def normalize(place):
+    return _SEPARATORS.sub(" ", place.lower()).strip()
+
+
+@lru_cache(maxsize=None)
+def gazetteer():
+    """Normalized place names and aliases -> (latitude, longitude)."""
+    places = {}
+    path = Path(settings.GEO_GAZETTEER_PATH)
+    with path.open(newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            point = (float(row["latitude"]), float(row["longitude"]))
+            for name in [row["name"], *row["aliases"].split(";")]:
+                if name.strip():
+                    places.setdefault(normalize(name), point)
+    return places
+
+
+def geocode(location):
+    """(latitude, longitude, remote) of a location, coordinates may be None."""
+    place = normalize(location or "")
+    if not place:
+        return None, None, False
+    if place in REMOTE_KEYWORDS or place.split(" ")[0] in REMOTE_KEYWORDS:
+        return None, None, True
+    places = gazetteer()
+    point = places.get(place)
+    if point is None:
+        # "Austin, TX, USA" -> "Austin, TX" -> "Austin"
+        parts = [part for part in location.split(",") if part.strip()]
+        for i in range(len(parts) - 1, 0, -1):
+            point = places.get(normalize(",".join(parts[:i])))
+            if point is not None:
+                break
+    if point is None:
+        return None, None, False
+    return point[0], point[1], False
+
+
+def encode(latitude, longitude, precision=GEO_CELL_PRECISION):
+    """Geohash of a point."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return "".join(chars)
+
+
+def geo_fields(location):
+    """The geo columns of a job at `location`."""
+    latitude, longitude, remote = geocode(location)
+    return {
+        "latitude": latitude,
+        "longitude": longitude,
+        "remote": remote,
+        "geo_cell": "" if latitude is None else encode(latitude, longitude),
+    }
+
+
+def geocode_jobs(jobs):
+    """
+    Geocode the jobs of a queryset with one UPDATE per distinct location,
+    for bulk loads that bypass `Job.save()` and gazetteer updates.
+    Returns the number of jobs updated.
+    """
+    locations = jobs.order_by().values_list("location", flat=True).distinct()
+    return sum(
+        jobs.filter(location=location).update(**geo_fields(location))
+        for location in list(locations)
+    )
+
+
+def cell_size(precision):
+    """(height, width) in degrees of the cells of a geohash precision."""
+    bits = 5 * precision
+    return 180 / 2 ** (bits // 2), 360 / 2 ** ((bits + 1) // 2)
+
+
+def cover(min_lat, min_lon, max_lat, max_lon, max_cells=MAX_COVER_CELLS):
+    """
+    Geohash prefixes of the cells covering a box, at the finest precision
+    needing at most `max_cells` cells. A box crossing the antimeridian has
+    min_lon > max_lon.
+    """
+    if min_lon > max_lon:
+        return cover(min_lat, min_lon, max_lat, 180.0, max_cells // 2) + cover(
+            min_lat, -180.0, max_lat, max_lon, max_cells // 2
+        )
+    for precision in range(GEO_CELL_PRECISION, 0, -1):
+        height, width = cell_size(precision)
+        rows = range(
+            int((min_lat + 90) // height),
+            min(int((max_lat + 90) // height), round(180 / height) - 1) + 1,
+        )
+        columns = range(
+            int((min_lon + 180) // width),
+            min(int((max_lon + 180) // width), round(360 / width) - 1) + 1,
+        )
+        if len(rows) * len(columns) <= max_cells:
+            return sorted(
+                {
+                    encode(
+                        -90 + (row + 0.5) * height,
+                        -180 + (column + 0.5) * width,
+                        precision,
+                    )
+                    for row in rows
+                    for column in columns
+                }
+            )
+    return [""]
+
+
+def radius_box(latitude, longitude, radius_km):
+    """Bounding box of a circle, as (min_lat, min_lon, max_lat, max_lon)."""
+    delta_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = latitude - delta_lat, latitude + delta_lat
+    if min_lat <= -90 or max_lat >= 90:
+        # The circle contains a pole
+        return max(min_lat, -90.0), -180.0, min(max_lat, 90.0), 180.0
+    delta_lon = math.degrees(
+        math.asin(
+            math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(latitude))
+        )
+    )
+    if delta_lon >= 180:
+        return min_lat, -180.0, max_lat, 180.0
+    min_lon, max_lon = longitude - delta_lon, longitude + delta_lon
+    if min_lon < -180:
+        min_lon += 360
+    if max_lon > 180:
+        max_lon -= 360
+    return min_lat, min_lon, max_lat, max_lon
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def parse_bbox(bbox):
+    """(min_lat, min_lon, max_lat, max_lon) of a "min_lon,min_lat,max_lon,max_lat"."""
+    min_lon, min_lat, max_lon, max_lat = (float(part) for part in bbox.split(","))
+    return min_lat, min_lon, max_lat, max_lon
+
+
+def areas(filters):
+    """
+    The circle and the box of `filters` (`JobListFilters` values), as
+    ("radius", lat, lon, km) and ("bbox", min_lat, min_lon, max_lat, max_lon).
+    """
+    result = []
+    if filters.get("near") is not None or filters.get("lat") is not None:
+        if filters.get("near") is not None:
+            latitude, longitude, _ = geocode(filters["near"])
+        else:
+            latitude, longitude = filters["lat"], filters["lon"]
+        radius_km = filters.get("radius_km") or settings.GEO_DEFAULT_RADIUS_KM
+        result.append(("radius", float(latitude), float(longitude), float(radius_km)))
+    if filters.get("bbox") is not None:
+        result.append(("bbox", *parse_bbox(filters["bbox"])))
+    return result
+
+
+def _in_box(latitude, longitude, min_lat, min_lon, max_lat, max_lon):
+    if not min_lat <= latitude <= max_lat:
+        return False
+    if min_lon > max_lon:
+        return longitude >= min_lon or longitude <= max_lon
+    return min_lon <= longitude <= max_lon
+
+
+def _box_q(min_lat, min_lon, max_lat, max_lon):
+    q = Q(latitude__gte=min_lat, latitude__lte=max_lat)
+    if min_lon > max_lon:
+        return q & (Q(longitude__gte=min_lon) | Q(longitude__lte=max_lon))
+    return q & Q(longitude__gte=min_lon, longitude__lte=max_lon)
+
+
+def cell_ranges(prefixes):
+    """
+    [start, stop) `geo_cell` ranges of the cells, cells following each other
+    in geohash order sharing one range.
+    """
+    ranges = []
+    for prefix in sorted(prefixes):
+        last = ranges[-1][1] if ranges else None
+        if (
+            last
+            and last[-1] != BASE32[-1]
+            and prefix == last[:-1] + BASE32[BASE32.index(last[-1]) + 1]
+        ):
+            ranges[-1][1] = prefix
+        else:
+            ranges.append([prefix, prefix])
+    return [(start, stop + PREFIX_END) for start, stop in ranges]
+
+
+def _cells_q(box):
+    q = Q()
+    for start, stop in cell_ranges(cover(*box)):
+        q |= Q(geo_cell__gte=start, geo_cell__lt=stop)
+    return q
+
+
+def distance(latitude, longitude):
+    """Haversine distance in km of the jobs to a point, as an expression."""
+    a = Power(Sin(Radians(F("latitude") - latitude) / 2), 2) + math.cos(
+        math.radians(latitude)
+    ) * Cos(Radians(F("latitude"))) * Power(
+        Sin(Radians(F("longitude") - longitude) / 2), 2
+    )
+    # Rounding can take `a` just past 1 near the antipode, out of ASIN's domain
+    return 2 * EARTH_RADIUS_KM * ASin(Least(Sqrt(a), Value(1.0)))
+
+
+def area_q(filters):
+    """Q of the jobs within the geo filters, cell ranges first."""
+    q = Q()
+    for area in areas(filters):
+        if area[0] == "radius":
+            _, latitude, longitude, radius_km = area
+            box = radius_box(latitude, longitude, radius_km)
+            q &= (
+                _cells_q(box)
+                & _box_q(*box)
+                & Q(LessThanOrEqual(distance(latitude, longitude), radius_km))
+            )
+        else:
+            q &= _cells_q(area[1:]) & _box_q(*area[1:])
+    return q
+
+
+def in_area(filters, latitude, longitude):
+    """Whether a point is within the geo filters, the Python `area_q`."""
+    for area in areas(filters):
+        if latitude is None or longitude is None:
+            return False
+        if area[0] == "radius":
+            _, center_lat, center_lon, radius_km = area
+            if haversine(center_lat, center_lon, latitude, longitude) > radius_km:
+                return False
+        elif not _in_box(latitude, longitude, *area[1:]):
+            return False
+    return True
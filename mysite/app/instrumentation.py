@@ -0,0 +1,181 @@
+"""
+Opt-in slow query sampler.
+
+Queries slower than SLOW_QUERY_THRESHOLD_MS are recorded with their
+normalized SQL, the shape of their parameters, the duration, the endpoint
+that ran them and the database's query plan. Samples are kept in an
+in-process ring buffer and, when SLOW_QUERY_LOG_PATH is set, appended to a
+bounded JSON lines file read by the `slow_queries` management command.
+"""
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import deque
+from datetime import date, datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+EXPLAIN_PREFIXES = {
+    "sqlite": "EXPLAIN QUERY PLAN ",
+    "postgresql": "EXPLAIN ",
+    "mysql": "EXPLAIN ",
+}
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w\"])-?\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)", re.IGNORECASE)
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """Strip literals and collapse IN lists so similar queries group together."""
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    sql = _IN_LIST.sub("IN (...)", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+def params_shape(params) -> str:
+    if params is None:
+        return "none"
+    if isinstance(params, dict):
+        return (
+            "{" + ", ".join(f"{k}: {type(v).__name__}" for k, v in params.items()) + "}"
+        )
+    types = [type(param).__name__ for param in params]
+    if len(types) > 10:
+        return f"{len(types)} x {'|'.join(sorted(set(types)))}"
+    return "(" + ", ".join(types) + ")"
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+class QuerySampler:
+    def __init__(self, size=500):
+        self.samples = deque(maxlen=size)
+        self._local = threading.local()
+        self._file_lock = threading.Lock()
+
+    def wrapper(self, request=None):
+        """A `connection.execute_wrapper` callable sampling for `request`."""
+
+        def sample(execute, sql, params, many, context):
+            if getattr(self._local, "explaining", False):
+                return execute(sql, params, many, context)
+            started = time.perf_counter()
+            result = execute(sql, params, many, context)
+            duration_ms = (time.perf_counter() - started) * 1000
+            if (
+                duration_ms >= settings.SLOW_QUERY_THRESHOLD_MS
+                and random.random() < settings.SLOW_QUERY_SAMPLE_RATE
+            ):
+                self.record(sql, params, many, duration_ms, context, request)
+            return result
+
+        return sample
+
+    def explain(self, connection, sql, params):
+        prefix = EXPLAIN_PREFIXES.get(connection.vendor)
+        if prefix is None or not sql.lstrip().upper().startswith("SELECT"):
+            return None
+        self._local.explaining = True
+        try:
+            # A savepoint, so a failed EXPLAIN doesn't abort the request's
+            # transaction on PostgreSQL
+            with transaction.atomic(using=connection.alias):
+                with connection.cursor() as cursor:
+                    cursor.execute(prefix + sql, params)
+                    return "\n".join(
+                        " ".join(str(column) for column in row)
+                        for row in cursor.fetchall()
+                    )
+        except DatabaseError as e:
+            logger.debug(f"Could not explain slow query: {e}")
+            return None
+        finally:
+            self._local.explaining = False
+
+    def record(self, sql, params, many, duration_ms, context, request=None):
+        endpoint = None
+        if request is not None:
+            match = request.resolver_match
+            endpoint = f"{request.method} {match.route if match else request.path}"
+        sample = {
+            "sql": normalize_sql(sql),
+            "params": "many" if many else params_shape(params),
+            "duration_ms": round(duration_ms, 3),
+            "endpoint": endpoint,
+            "plan": None if many else self.explain(context["connection"], sql, params),
+            "at": timezone.now().isoformat(),
+        }
+        self.samples.append(sample)
+        logger.warning(
+            f"Slow query ({sample['duration_ms']} ms) on {endpoint}: {sample['sql']}"
+        )
+        if settings.SLOW_QUERY_LOG_PATH:
+            self.spool(sample)
+
+    def spool(self, sample):
+        path = Path(settings.SLOW_QUERY_LOG_PATH)
+        with self._file_lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with path.open("a") as f:
+                f.write(json.dumps(sample, default=_json_default) + "\n")
+            # Keep the newest half when the file outgrows the buffer size
+            lines = path.read_text().splitlines()
+            if len(lines) > 2 * self.samples.maxlen:
+                path.write_text("\n".join(lines[-self.samples.maxlen :]) + "\n")
+
+
+def top_offenders(samples, limit=20):
+    """Group samples by normalized SQL, the largest total time first."""
+    groups = {}
+    for sample in samples:
+        group = groups.setdefault(
+            sample["sql"],
+            {
+                "sql": sample["sql"],
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "endpoints": set(),
+                "params": sample["params"],
+                "plan": None,
+            },
+        )
+        group["count"] += 1
+        group["total_ms"] += sample["duration_ms"]
+        group["max_ms"] = max(group["max_ms"], sample["duration_ms"])
+        if sample["endpoint"]:
+            group["endpoints"].add(sample["endpoint"])
+        group["plan"] = sample["plan"] or group["plan"]
+
+    offenders = sorted(groups.values(), key=lambda group: -group["total_ms"])[:limit]
+    for group in offenders:
+        group["total_ms"] = round(group["total_ms"], 3)
+        group["mean_ms"] = round(group["total_ms"] / group["count"], 3)
+        group["endpoints"] = sorted(group["endpoints"])
+    return offenders
+
+
+def read_spool(path=None):
+    path = Path(path or settings.SLOW_QUERY_LOG_PATH)
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text().splitlines() if line]
+
+
+sampler = QuerySampler(settings.SLOW_QUERY_BUFFER_SIZE)
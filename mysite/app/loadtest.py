@@ -0,0 +1,477 @@
+"""
+Concurrent load replay against the WSGI or ASGI application, in-process, or
+against a running server.
+
+Virtual users are threads sending requests back to back, either drawn from
+a weighted mix of scenarios (filtered lists, searches, job details and
+authenticated writes with JWTs from `/api/v1/token/pair`) or replayed from
+an access log. Latencies, statuses and database lock errors are collected
+per scenario. In-process, lock errors are read from the exceptions behind
+500 responses; against a server, from the body of DEBUG error pages.
+
+Writes PATCH the skills of existing jobs with their current value, which
+bumps `version` and `updated_at` and takes the same locks as real edits.
+Run it against a copy of the data.
+"""
+import asyncio
+import contextvars
+import http.client
+import io
+import json
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from urllib.parse import unquote, urlencode, urlsplit
+
+from django.core.signals import got_request_exception
+from django.db import OperationalError
+
+from app.models import Job, parse_skills
+
+API_PREFIX = "/api/v1"
+DEFAULT_MIX = {"list": 50, "search": 15, "detail": 30, "write": 5}
+ORDERS = [None, "posting_date", "expiration_date", "-popularity"]
+LOCK_MESSAGES = [b"database is locked", b"database table is locked"]
+# Access tokens live 5 minutes, see NINJA_JWT
+TOKEN_MAX_AGE = 60
+
+# Exceptions raised while handling the current in-process request
+_exceptions = contextvars.ContextVar("loadtest_exceptions", default=None)
+
+
+def record_exception(sender, request=None, **kwargs):
+    exceptions = _exceptions.get()
+    if exceptions is not None:
+        exceptions.append(sys.exc_info()[1])
+
+
+def is_lock_error(exception=None, body=b""):
+    if isinstance(exception, OperationalError) and "locked" in str(exception):
+        return True
+    return any(message in body for message in LOCK_MESSAGES)
+
+
+class WSGITarget:
+    def __init__(self, application):
+        self.application = application
+        got_request_exception.connect(record_exception, dispatch_uid="loadtest")
+
+    def request(self, method, path, body=b"", headers=None, extra_environ=None):
+        """(status, body, exceptions) of one request."""
+        path, _, query = path.partition("?")
+        environ = {
+            "REQUEST_METHOD": method,
+            "SCRIPT_NAME": "",
+            "PATH_INFO": unquote(path),
+            "QUERY_STRING": query,
+            "SERVER_NAME": "127.0.0.1",
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "REMOTE_ADDR": "127.0.0.1",
+            "HTTP_HOST": "127.0.0.1",
+            "CONTENT_LENGTH": str(len(body)),
+            "CONTENT_TYPE": "application/json",
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for name, value in (headers or {}).items():
+            environ[f"HTTP_{name.upper().replace('-', '_')}"] = value
+        environ.update(extra_environ or {})
+
+        statuses = []
+
+        def start_response(status, response_headers, exc_info=None):
+            statuses.append(int(status.split(" ", 1)[0]))
+
+        exceptions = []
+        token = _exceptions.set(exceptions)
+        try:
+            result = self.application(environ, start_response)
+            try:
+                content = b"".join(result)
+            finally:
+                if hasattr(result, "close"):
+                    result.close()  # Fires request_finished
+        finally:
+            _exceptions.reset(token)
+        return statuses[0], content, exceptions
+
+    def close(self):
+        pass
+
+
+class ASGITarget:
+    """
+    Requests are sent from the virtual user threads to one event loop, like
+    an ASGI server does.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        got_request_exception.connect(record_exception, dispatch_uid="loadtest")
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    async def _request(self, method, path, body, headers):
+        path, _, query = path.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": unquote(path),
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [(b"host", b"127.0.0.1"), (b"content-type", b"application/json")]
+            + [
+                (name.lower().encode(), value.encode())
+                for name, value in (headers or {}).items()
+            ],
+            "client": ("127.0.0.1", 0),
+            "server": ("127.0.0.1", 80),
+        }
+        received = False
+
+        async def receive():
+            nonlocal received
+            if received:
+                # The client stays connected, Django cancels this when done
+                await asyncio.Future()
+            received = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        response = {"status": None, "body": []}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+
+        exceptions = []
+        _exceptions.set(exceptions)
+        await self.application(scope, receive, send)
+        return response["status"], b"".join(response["body"]), exceptions
+
+    def request(self, method, path, body=b"", headers=None):
+        return asyncio.run_coroutine_threadsafe(
+            self._request(method, path, body, headers), self.loop
+        ).result()
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+class HTTPTarget:
+    """A running server, one keep-alive connection per virtual user."""
+
+    def __init__(self, base_url):
+        url = urlsplit(base_url)
+        self.connection_class = (
+            http.client.HTTPSConnection
+            if url.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        self.netloc = url.netloc
+        self.prefix = url.path.rstrip("/")
+        self._local = threading.local()
+
+    def request(self, method, path, body=b"", headers=None):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self.connection_class(
+                self.netloc, timeout=30
+            )
+        try:
+            connection.request(
+                method,
+                self.prefix + path,
+                body=body or None,
+                headers={"Content-Type": "application/json", **(headers or {})},
+            )
+            response = connection.getresponse()
+            return response.status, response.read(), []
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            self._local.connection = None
+            raise
+
+    def close(self):
+        pass
+
+
+class Tokens:
+    """Access tokens from `/api/v1/token/pair`, renewed every TOKEN_MAX_AGE."""
+
+    def __init__(self, target, username, password):
+        self.target = target
+        self.credentials = json.dumps(
+            {"username": username, "password": password}
+        ).encode()
+        self._lock = threading.Lock()
+        self._token = None
+        self._obtained_at = None
+
+    def get(self):
+        with self._lock:
+            if (
+                self._token is None
+                or time.monotonic() - self._obtained_at > TOKEN_MAX_AGE
+            ):
+                status, body, _ = self.target.request(
+                    "POST", f"{API_PREFIX}/token/pair", self.credentials
+                )
+                if status != 200:
+                    raise ValueError(f"Could not obtain a token: {status} {body[:200]}")
+                self._token = json.loads(body)["access"]
+                self._obtained_at = time.monotonic()
+            return self._token
+
+
+class Workload:
+    """Requests drawn from a weighted mix of the scenarios in DEFAULT_MIX."""
+
+    def __init__(self, mix, tokens=None, sample_size=1000):
+        unknown = set(mix) - set(DEFAULT_MIX)
+        if unknown:
+            raise ValueError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        self.scenarios = [name for name, weight in mix.items() if weight > 0]
+        self.weights = [mix[name] for name in self.scenarios]
+        if "write" in self.scenarios and tokens is None:
+            raise ValueError("Writes need the credentials of a user")
+        self.tokens = tokens
+
+        jobs = list(
+            Job.objects.order_by("?").values_list(
+                "id", "title", "location", "required_skills"
+            )[:sample_size]
+        )
+        if not jobs:
+            raise ValueError("No jobs to request, run seed_data first")
+        self.jobs = [(job_id, skills) for job_id, _, _, skills in jobs]
+        self.locations = sorted({location for _, _, location, _ in jobs})
+        self.skills = sorted(
+            {skill for *_, skills in jobs for skill in parse_skills(skills)}
+        ) or ["Python"]
+        self.words = sorted(
+            {
+                word
+                for _, title, _, _ in jobs
+                for word in title.split()
+                if word.isalpha()
+            }
+        ) or ["Engineer"]
+
+    def __call__(self, rng):
+        scenario = rng.choices(self.scenarios, self.weights)[0]
+        return getattr(self, scenario)(rng)
+
+    def list(self, rng):
+        params = {}
+        for name, values in [
+            ("location", self.locations),
+            ("required_skills", self.skills),
+            ("status", ["active"]),
+        ]:
+            if rng.random() < 0.3:
+                params[name] = rng.choice(values)
+        if rng.random() < 0.2:
+            params["salary_gte"] = rng.choice([40000, 50000, 60000])
+        order = rng.choice(ORDERS)
+        if order:
+            params["order_by"] = order
+        if rng.random() < 0.2:
+            params["page"] = rng.randint(2, 5)
+        path = f"{API_PREFIX}/jobs"
+        return {"scenario": "list", "method": "GET", "path": _query(path, params)}
+
+    def search(self, rng):
+        path = _query(f"{API_PREFIX}/jobs", {"search": rng.choice(self.words)})
+        return {"scenario": "search", "method": "GET", "path": path}
+
+    def detail(self, rng):
+        job_id, _ = rng.choice(self.jobs)
+        return {
+            "scenario": "detail",
+            "method": "GET",
+            "path": f"{API_PREFIX}/jobs/{job_id}",
+        }
+
+    def write(self, rng):
+        job_id, skills = rng.choice(self.jobs)
+        return {
+            "scenario": "write",
+            "method": "PATCH",
+            "path": f"{API_PREFIX}/jobs/{job_id}",
+            "body": json.dumps({"required_skills": skills}).encode(),
+            "auth": True,
+        }
+
+
+def _query(path, params):
+    return f"{path}?{urlencode(params)}" if params else path
+
+
+ACCESS_LOG_REQUEST = re.compile(r'"(?P<method>[A-Z]+) (?P<path>\S+) HTTP/[\d.]+"')
+NUMERIC_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+def parse_access_log(lines):
+    """
+    (method, path) of the GET requests of a common or combined format access
+    log; other methods are skipped since the log has no request bodies.
+    """
+    requests = []
+    for line in lines:
+        match = ACCESS_LOG_REQUEST.search(line)
+        if match and match["method"] == "GET":
+            requests.append((match["method"], match["path"]))
+    return requests
+
+
+class Replay:
+    """The requests of an access log, in order, shared by the virtual users."""
+
+    def __init__(self, requests, loop=False):
+        if not requests:
+            raise ValueError("No GET requests to replay")
+        self.requests = requests
+        self.loop = loop
+        self._lock = threading.Lock()
+        self._position = 0
+
+    def __call__(self, rng):
+        with self._lock:
+            if self._position >= len(self.requests):
+                if not self.loop:
+                    return None
+                self._position = 0
+            method, path = self.requests[self._position]
+            self._position += 1
+        route = NUMERIC_SEGMENT.sub("/{id}", path.split("?", 1)[0])
+        return {"scenario": f"{method} {route}", "method": method, "path": path}
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of sorted `values`."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(len(values) * fraction + 0.5) - 1))]
+
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.lock_errors = Counter()
+
+    def record(self, scenario, seconds, status, lock_error):
+        """`status` is None when the request raised."""
+        with self._lock:
+            self.latencies[scenario].append(seconds)
+            self.statuses[scenario][status] += 1
+            self.lock_errors[scenario] += lock_error
+
+    def summary(self, elapsed):
+        """One row per scenario, then the total."""
+        rows = []
+        for scenario in sorted(self.latencies) + ["total"]:
+            if scenario == "total":
+                latencies = [s for values in self.latencies.values() for s in values]
+                statuses = sum(self.statuses.values(), Counter())
+                lock_errors = sum(self.lock_errors.values())
+            else:
+                latencies = self.latencies[scenario]
+                statuses = self.statuses[scenario]
+                lock_errors = self.lock_errors[scenario]
+            latencies = sorted(latencies)
+            count = len(latencies)
+            errors = sum(
+                n for status, n in statuses.items() if status is None or status >= 500
+            )
+            rows.append(
+                {
+                    "scenario": scenario,
+                    "requests": count,
+                    "throughput": round(count / elapsed, 2) if elapsed else 0.0,
+                    "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+                    "p90_ms": round(percentile(latencies, 0.9) * 1000, 2),
+                    "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+                    "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+                    "errors": errors,
+                    "error_rate": round(errors / count, 4) if count else 0.0,
+                    "client_errors": sum(
+                        n
+                        for status, n in statuses.items()
+                        if status is not None and 400 <= status < 500
+                    ),
+                    "lock_errors": lock_errors,
+                }
+            )
+        return rows
+
+
+def run(target, next_request, users=10, duration=10.0, max_requests=None, seed=0):
+    """
+    Send the requests of `next_request(rng)` from `users` threads until
+    `duration` seconds passed, `max_requests` were sent or it returns None.
+    Returns the Stats and the elapsed seconds.
+    """
+    stats = Stats()
+    deadline = time.monotonic() + duration
+    sent = Counter()
+    sent_lock = threading.Lock()
+    tokens = getattr(next_request, "tokens", None)
+
+    def user(number):
+        rng = random.Random(seed * 1000 + number)
+        while time.monotonic() < deadline:
+            if max_requests is not None:
+                with sent_lock:
+                    if sent["requests"] >= max_requests:
+                        return
+                    sent["requests"] += 1
+            request = next_request(rng)
+            if request is None:
+                return
+            headers = {}
+            started = time.perf_counter()
+            try:
+                if request.get("auth"):
+                    headers["Authorization"] = f"Bearer {tokens.get()}"
+                status, body, exceptions = target.request(
+                    request["method"],
+                    request["path"],
+                    request.get("body", b""),
+                    headers,
+                )
+                lock_error = any(is_lock_error(e) for e in exceptions) or (
+                    status >= 500 and is_lock_error(body=body)
+                )
+            except Exception as e:
+                status, lock_error = None, is_lock_error(e)
+            stats.record(
+                request["scenario"], time.perf_counter() - started, status, lock_error
+            )
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats, time.perf_counter() - started
@@ -0,0 +1,22 @@
+from app.similar import build_index, index_path
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds the TF-IDF index of GET /jobs/{id}/similar to "
+        "SIMILAR_JOBS_INDEX_PATH. Jobs written later are added incrementally "
+        "by the API workers until the next build."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path", default=None, help="Defaults to settings.SIMILAR_JOBS_INDEX_PATH"
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"] or index_path()
+        index = build_index(path)
+        self.stdout.write(
+            self.style.SUCCESS(f"Indexed {len(index.ids)} jobs to {path}.")
+        )
@@ -0,0 +1,70 @@
+from collections import defaultdict
+
+from app.models import SavedSearchMatch
+from django.conf import settings
+from django.core.mail import send_mass_mail
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Emails the pending saved search matches, one message per user, "
+        "and marks them delivered. Matches of jobs deleted since are marked "
+        "without being sent. Delivery is at least once: a worker dying "
+        "between sending a batch and committing its mark sends it again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def claim(self, batch_size):
+        matches = SavedSearchMatch.objects.filter(delivered_at__isnull=True)
+        if connection.features.has_select_for_update_skip_locked:
+            # Concurrent workers take different batches
+            matches = matches.select_for_update(skip_locked=True, of=("self",))
+        return list(
+            matches.select_related("saved_search__user", "job").order_by("id")[
+                :batch_size
+            ]
+        )
+
+    def handle(self, *args, **options):
+        delivered = 0
+        while True:
+            with transaction.atomic():
+                matches = self.claim(options["batch_size"])
+                if not matches:
+                    break
+
+                by_user = defaultdict(list)
+                for match in matches:
+                    if match.job.deleted_at is None:
+                        by_user[match.saved_search.user].append(match)
+                messages = []
+                for user, user_matches in by_user.items():
+                    if not user.email:
+                        continue
+                    lines = [
+                        f"[{match.saved_search}] {match.job} ({match.job.location})"
+                        for match in user_matches
+                    ]
+                    messages.append(
+                        (
+                            f"{len(user_matches)} new jobs match your saved searches",
+                            "\n".join(lines),
+                            settings.DEFAULT_FROM_EMAIL,
+                            [user.email],
+                        )
+                    )
+                # Marked before sending: without SKIP LOCKED (SQLite), workers
+                # that read the same batch conflict on this write instead of
+                # all sending it, and a failed send rolls the mark back
+                SavedSearchMatch.objects.filter(
+                    id__in=[match.id for match in matches]
+                ).update(delivered_at=timezone.now())
+                send_mass_mail(messages)
+                delivered += len(matches)
+
+        self.stdout.write(self.style.SUCCESS(f"Delivered {delivered} matches."))
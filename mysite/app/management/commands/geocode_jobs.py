@@ -0,0 +1,24 @@
+from app.geo import geocode_jobs
+from app.models import Job
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Geocodes the job locations from the bundled gazetteer, after bulk "
+        "loads or gazetteer updates."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--missing",
+            action="store_true",
+            help="Only the jobs without coordinates that aren't remote.",
+        )
+
+    def handle(self, *args, **options):
+        jobs = Job.objects.all()
+        if options["missing"]:
+            jobs = jobs.filter(latitude__isnull=True, remote=False)
+        updated = geocode_jobs(jobs)
+        self.stdout.write(self.style.SUCCESS(f"Geocoded {updated} jobs."))
@@ -0,0 +1,98 @@
+import json
+import os
+import subprocess
+import sys
+
+from app.startup import (
+    PRELOAD_STEPS,
+    WARMUP_STEPS,
+    importtime_summary,
+    parse_importtime,
+)
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Imports the application in a fresh interpreter, then prints the warm-up
+# timings as JSON
+STARTUP_SCRIPT = """
+import importlib, json, os, sys, time
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", {settings_module!r})
+start = time.perf_counter()
+importlib.import_module({module!r})
+timings = {{"import": time.perf_counter() - start}}
+if {steps!r}:
+    from app.startup import warm_up
+    timings.update(warm_up({steps!r}))
+print(json.dumps(timings))
+"""
+
+
+class Command(BaseCommand):
+    help = (
+        "Reports the startup cost of the application: imports it in a fresh "
+        "interpreter under `python -X importtime`, optionally runs the "
+        "warm-up steps, and lists the slowest packages and modules."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--module", default="mysite.wsgi", help="Module to import, e.g. mysite.asgi"
+        )
+        parser.add_argument(
+            "--warm-up",
+            nargs="?",
+            const=",".join(PRELOAD_STEPS),
+            default="",
+            help=f"Comma separated warm-up steps to time, among {', '.join(WARMUP_STEPS)}",
+        )
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument("--json", action="store_true", help="Output JSON")
+
+    def handle(self, *args, **options):
+        steps = [step for step in options["warm_up"].split(",") if step]
+        unknown = set(steps) - set(WARMUP_STEPS)
+        if unknown:
+            raise CommandError(f"Unknown warm-up steps {', '.join(sorted(unknown))}")
+
+        script = STARTUP_SCRIPT.format(
+            settings_module=os.environ.get(
+                "DJANGO_SETTINGS_MODULE", settings.SETTINGS_MODULE
+            ),
+            module=options["module"],
+            steps=steps,
+        )
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", script],
+            capture_output=True,
+            text=True,
+            cwd=settings.BASE_DIR,
+        )
+        if process.returncode:
+            raise CommandError(process.stderr.strip().splitlines()[-1])
+        timings = json.loads(process.stdout.strip().splitlines()[-1])
+        summary = importtime_summary(parse_importtime(process.stderr), options["limit"])
+
+        if options["json"]:
+            self.stdout.write(json.dumps({"timings": timings, **summary}))
+            return
+        self.stdout.write(
+            self.style.HTTP_INFO(
+                f"{summary['modules']} modules imported in "
+                f"{summary['total_us'] / 1000:.0f}ms, "
+                + ", ".join(
+                    f"{name} {seconds * 1000:.0f}ms"
+                    for name, seconds in timings.items()
+                )
+            )
+        )
+        self.stdout.write(f"\n{'package':<40} {'self ms':>9}")
+        for row in summary["packages"]:
+            self.stdout.write(
+                f"{row['package'][:40]:<40} {row['self_us'] / 1000:>9.1f}"
+            )
+        self.stdout.write(f"\n{'module':<60} {'self ms':>9} {'cumul. ms':>9}")
+        for row in summary["slowest"]:
+            self.stdout.write(
+                f"{row['module'][:60]:<60} {row['self_us'] / 1000:>9.1f} "
+                f"{row['cumulative_us'] / 1000:>9.1f}"
+            )
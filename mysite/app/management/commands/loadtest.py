@@ -0,0 +1,127 @@
+import json
+
+from app.loadtest import (
+    DEFAULT_MIX,
+    ASGITarget,
+    HTTPTarget,
+    Replay,
+    Tokens,
+    WSGITarget,
+    Workload,
+    parse_access_log,
+    run,
+)
+from django.core.management.base import BaseCommand, CommandError
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        try:
+            mix[name.strip()] = float(weight)
+        except ValueError:
+            raise CommandError(f"Invalid mix entry {part!r}, expected name=weight")
+    return mix
+
+
+class Command(BaseCommand):
+    help = (
+        "Replays a weighted request mix or an access log with concurrent "
+        "virtual users against the WSGI/ASGI application in-process or a "
+        "running server, reporting throughput, latency percentiles, errors "
+        "and database lock errors per scenario. Writes modify the jobs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target",
+            default="wsgi",
+            help="wsgi, asgi or the base URL of a running server",
+        )
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--duration", type=float, default=10.0)
+        parser.add_argument(
+            "--requests", type=int, default=None, help="Stop after this many"
+        )
+        parser.add_argument(
+            "--mix",
+            default=",".join(
+                f"{name}={weight}" for name, weight in DEFAULT_MIX.items()
+            ),
+            help="Scenario weights, e.g. list=50,search=15,detail=30,write=5",
+        )
+        parser.add_argument("--username", help="User of the authenticated writes")
+        parser.add_argument("--password")
+        parser.add_argument("--replay", help="Access log to replay instead of the mix")
+        parser.add_argument(
+            "--loop", action="store_true", help="Replay the log until --duration"
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--json", action="store_true", help="Output JSON")
+
+    def handle(self, *args, **options):
+        target = self.get_target(options["target"])
+        try:
+            if options["replay"]:
+                with open(options["replay"]) as f:
+                    next_request = Replay(parse_access_log(f), options["loop"])
+            else:
+                tokens = None
+                if options["username"]:
+                    tokens = Tokens(target, options["username"], options["password"])
+                next_request = Workload(parse_mix(options["mix"]), tokens)
+        except (OSError, ValueError) as e:
+            target.close()
+            raise CommandError(str(e))
+
+        try:
+            stats, elapsed = run(
+                target,
+                next_request,
+                users=options["users"],
+                duration=options["duration"],
+                max_requests=options["requests"],
+                seed=options["seed"],
+            )
+        finally:
+            target.close()
+        rows = stats.summary(elapsed)
+
+        if options["json"]:
+            self.stdout.write(json.dumps({"elapsed": elapsed, "scenarios": rows}))
+            return
+        self.stdout.write(
+            self.style.HTTP_INFO(
+                f"{options['users']} users, {elapsed:.1f} s against {options['target']}"
+            )
+        )
+        self.stdout.write(
+            f"{'scenario':<28} {'requests':>8} {'req/s':>8} {'p50 ms':>8} "
+            f"{'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} {'errors':>7} "
+            f"{'4xx':>5} {'locked':>6}"
+        )
+        for row in rows:
+            line = (
+                f"{row['scenario'][:28]:<28} {row['requests']:>8} "
+                f"{row['throughput']:>8.1f} {row['p50_ms']:>8.1f} "
+                f"{row['p90_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f} "
+                f"{row['error_rate']:>7.1%} {row['client_errors']:>5} "
+                f"{row['lock_errors']:>6}"
+            )
+            self.stdout.write(
+                self.style.ERROR(line) if row["lock_errors"] or row["errors"] else line
+            )
+
+    def get_target(self, name):
+        if name == "wsgi":
+            from mysite.wsgi import application
+
+            return WSGITarget(application)
+        if name == "asgi":
+            from mysite.asgi import application
+
+            return ASGITarget(application)
+        if name.startswith(("http://", "https://")):
+            return HTTPTarget(name)
+        raise CommandError("--target must be wsgi, asgi or an http(s) URL")
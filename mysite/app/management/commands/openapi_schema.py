@@ -0,0 +1,42 @@
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Writes the OpenAPI document of the API to --output "
+        "(OPENAPI_SCHEMA_PATH by default), served by the workers instead of "
+        "building it, see app/openapi.py. Run it at deploy time. With --check, "
+        "fails when the file doesn't match the code instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=settings.OPENAPI_SCHEMA_PATH)
+        parser.add_argument("--check", action="store_true")
+
+    def handle(self, *args, **options):
+        from mysite.urls import api_v1
+
+        if not options["output"]:
+            raise CommandError("Set OPENAPI_SCHEMA_PATH or --output")
+        output = Path(options["output"])
+        body = api_v1.build_openapi_document()
+
+        if options["check"]:
+            if not output.exists() or output.read_bytes() != body:
+                raise CommandError(
+                    f"{output} is out of date, run `manage.py openapi_schema`"
+                )
+            self.stdout.write(self.style.SUCCESS(f"{output} is up to date."))
+            return
+
+        # Replaced at once, workers starting meanwhile read either version
+        tmp = output.with_name(f".{output.name}.{os.getpid()}")
+        tmp.write_bytes(body)
+        tmp.replace(output)
+        self.stdout.write(
+            self.style.SUCCESS(f"Wrote the OpenAPI document to {output}.")
+        )
@@ -0,0 +1,40 @@
+import time
+
+from app.snapshots import Publisher
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Pre-renders the first pages of the most requested GET /jobs listings "
+        "to STATIC_SNAPSHOT_DIR, with gzip siblings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only re-render the listings affected by job changes",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=None,
+            help="Keep publishing incrementally every INTERVAL seconds",
+        )
+        parser.add_argument(
+            "--dir", default=None, help="Defaults to settings.STATIC_SNAPSHOT_DIR"
+        )
+
+    def handle(self, *args, **options):
+        publisher = Publisher(options["dir"])
+        incremental = options["incremental"]
+        while True:
+            written, removed = publisher.publish(incremental=incremental)
+            self.stdout.write(
+                self.style.SUCCESS(f"Wrote {written} snapshots, removed {removed}.")
+            )
+            if options["interval"] is None:
+                return
+            incremental = True
+            time.sleep(options["interval"])
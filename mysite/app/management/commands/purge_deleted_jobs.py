@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from app.models import purge_jobs
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Hard deletes the jobs soft deleted more than --days ago, in small "
+        "batches with a pause in between so readers and writers aren't "
+        "locked out."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=float, default=settings.JOB_PURGE_AFTER_DAYS)
+        parser.add_argument(
+            "--batch-size", type=int, default=settings.JOB_PURGE_BATCH_SIZE
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=settings.JOB_PURGE_PAUSE,
+            help="Seconds between batches",
+        )
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options["days"])
+        purged = 0
+        for count in purge_jobs(before, options["batch_size"], options["pause"]):
+            purged += count
+            if options["verbosity"] > 1:
+                self.stdout.write(f"Purged {purged} jobs")
+        self.stdout.write(self.style.SUCCESS(f"Purged {purged} deleted jobs."))
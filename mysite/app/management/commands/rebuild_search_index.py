@@ -0,0 +1,14 @@
+from app.models import Job
+from app.search import rebuild
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the trigram search index of the jobs, after bulk loads "
+        "that bypass Job.save()."
+    )
+
+    def handle(self, *args, **options):
+        grams = rebuild(Job.objects.all())
+        self.stdout.write(self.style.SUCCESS(f"Indexed {grams} search grams."))
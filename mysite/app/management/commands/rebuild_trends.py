@@ -0,0 +1,17 @@
+from app.trends import rebuild
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the skill/location trend rollups from the jobs table, "
+        "counting id ranges in parallel processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--chunk-size", type=int, default=50000)
+
+    def handle(self, *args, **options):
+        rows = rebuild(options["workers"], options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} trend rows."))
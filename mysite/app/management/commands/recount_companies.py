@@ -0,0 +1,13 @@
+from app.models import Company
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the active/total job counters of every company, "
+        "after imports that bypass Job.save()."
+    )
+
+    def handle(self, *args, **options):
+        updated = Company.recount()
+        self.stdout.write(self.style.SUCCESS(f"Recounted {updated} companies."))
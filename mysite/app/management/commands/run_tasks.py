@@ -0,0 +1,103 @@
+import signal
+import subprocess
+import sys
+import threading
+from datetime import timedelta
+
+from app.tasks import purge_tasks, work, worker_name
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the deferred tasks of the database queue, see app/tasks.py, "
+        "with --threads workers in each of --processes processes, until "
+        "stopped with SIGTERM or SIGINT, or until the queue is empty with "
+        "--once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=settings.TASK_WORKER_THREADS)
+        parser.add_argument("--processes", type=int, default=1)
+        parser.add_argument("--batch-size", type=int, default=settings.TASK_BATCH_SIZE)
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=settings.TASK_POLL_INTERVAL,
+            help="Seconds between polls of an empty queue",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Exit once no task is due"
+        )
+
+    def handle(self, *args, **options):
+        if options["processes"] > 1:
+            return self.spawn(options)
+
+        stop = threading.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: stop.set())
+
+        purged = purge_tasks(
+            timezone.now() - timedelta(days=settings.TASK_DONE_RETENTION_DAYS)
+        )
+        if purged and options["verbosity"] > 1:
+            self.stdout.write(f"Purged {purged} done tasks")
+
+        counts = []
+
+        def run_worker():
+            try:
+                counts.append(
+                    work(
+                        worker_name(),
+                        stop,
+                        options["batch_size"],
+                        options["poll_interval"],
+                        options["once"],
+                    )
+                )
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=run_worker, name=f"task-worker-{i}")
+            for i in range(options["threads"])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            # Polling join, so the main thread keeps handling signals
+            while thread.is_alive():
+                thread.join(1)
+        self.stdout.write(self.style.SUCCESS(f"Ran {sum(counts)} tasks."))
+
+    def spawn(self, options):
+        """Run one single process worker per --processes, forwarding signals."""
+        command = [
+            sys.executable,
+            sys.argv[0],
+            "run_tasks",
+            "--processes=1",
+            f"--threads={options['threads']}",
+            f"--batch-size={options['batch_size']}",
+            f"--poll-interval={options['poll_interval']}",
+        ]
+        if options["once"]:
+            command.append("--once")
+        children = [
+            subprocess.Popen(command, cwd=settings.BASE_DIR)
+            for _ in range(options["processes"])
+        ]
+
+        def forward(signum, frame):
+            for child in children:
+                child.send_signal(signum)
+
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, forward)
+        for child in children:
+            child.wait()
@@ -1,9 +1,12 @@
 import random
 import sys
 import traceback
+from collections import Counter
 from datetime import timedelta
 
-from app.models import Job
+from app.geo import geo_fields
+from app.models import TREND_FIELDS, Company, Job, apply_trend_deltas, trend_keys
+from app.search import index_jobs
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.utils import timezone
@@ -106,6 +109,7 @@ class Command(BaseCommand):
                 num_jobs_per_company = 10  # Create a few jobs for each company
 
                 current_time = timezone.now()
+                companies = {name: Company.get_for_name(name) for name in company_names}
 
                 for company in company_names:
                     for i in range(num_jobs_per_company):
@@ -150,6 +154,7 @@ class Command(BaseCommand):
                             "title": f"{title} (Test Job #{i + 1})",
                             "desc": description,
                             "company_name": company,
+                            "company": companies[company],
                             "location": location,
                             "salary_range": salary_range,
                             "salary_range_avg": salary_range_avg,
@@ -157,10 +162,21 @@ class Command(BaseCommand):
                             "expiration_date": expiration_date,
                             "required_skills": ",".join(required_skills),
                             "status": status,
+                            **geo_fields(location),
                         }
                         jobs_to_create.append(Job(**job_data))
 
                 Job.objects.bulk_create(jobs_to_create)
+                # bulk_create bypasses Job.save(), which maintains the counters,
+                # the trend rollups and the search index
+                Company.recount(ids=[company.id for company in companies.values()])
+                trends = Counter()
+                for job in jobs_to_create:
+                    trends.update(
+                        trend_keys(*(getattr(job, field) for field in TREND_FIELDS))
+                    )
+                apply_trend_deltas(trends)
+                index_jobs(jobs_to_create)
 
                 self.stdout.write(
                     self.style.SUCCESS(
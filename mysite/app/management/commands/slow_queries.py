@@ -0,0 +1,44 @@
+import json
+
+from app.instrumentation import read_spool, top_offenders
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Shows the slowest sampled queries by total time, from SLOW_QUERY_LOG_PATH."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument(
+            "--path", default=None, help="Defaults to settings.SLOW_QUERY_LOG_PATH"
+        )
+        parser.add_argument("--json", action="store_true", help="Output JSON")
+
+    def handle(self, *args, **options):
+        path = options["path"] or settings.SLOW_QUERY_LOG_PATH
+        if not path:
+            raise CommandError("Set SLOW_QUERY_LOG_PATH or pass --path")
+
+        offenders = top_offenders(read_spool(path), options["limit"])
+        if options["json"]:
+            self.stdout.write(json.dumps(offenders, indent=2))
+            return
+        if not offenders:
+            self.stdout.write("No slow queries sampled.")
+            return
+
+        for rank, offender in enumerate(offenders, start=1):
+            self.stdout.write(
+                self.style.HTTP_INFO(
+                    f"#{rank} total {offender['total_ms']} ms, "
+                    f"{offender['count']} calls, mean {offender['mean_ms']} ms, "
+                    f"max {offender['max_ms']} ms"
+                )
+            )
+            self.stdout.write(f"  endpoints: {', '.join(offender['endpoints']) or '-'}")
+            self.stdout.write(f"  params: {offender['params']}")
+            self.stdout.write(f"  sql: {offender['sql']}")
+            if offender["plan"]:
+                for line in offender["plan"].splitlines():
+                    self.stdout.write(f"  plan: {line}")
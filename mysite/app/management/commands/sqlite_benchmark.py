@@ -0,0 +1,125 @@
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from app.sqlite import apply_pragmas
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+READ_SQL = (
+    "SELECT * FROM app_job WHERE status = ? "
+    "ORDER BY posting_date DESC, id DESC LIMIT 10"
+)
+WRITE_SQL = "UPDATE app_job SET updated_at = ?, version = version + 1 WHERE id = ?"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares concurrent read/write throughput of a copy of the SQLite "
+        "database with the default and the production (SQLITE_PRAGMAS) profile."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=2)
+        parser.add_argument("--seconds", type=float, default=5.0)
+        parser.add_argument(
+            "--writes-per-transaction",
+            type=int,
+            default=20,
+            help="Updates per write transaction",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("The default database is not SQLite")
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT id FROM app_job")
+            ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            raise CommandError("No jobs to benchmark, run seed_data first")
+
+        source = Path(settings.DATABASES["default"]["NAME"])
+        with tempfile.TemporaryDirectory() as directory:
+            for name, pragmas, immediate in (
+                ("default", {"journal_mode": "DELETE"}, False),
+                ("production", settings.SQLITE_PRAGMAS, True),
+            ):
+                path = Path(directory) / f"{name}.sqlite3"
+                shutil.copyfile(source, path)
+                result = self.run_profile(path, pragmas, immediate, ids, options)
+                self.report(name, result, options["seconds"])
+
+    def run_profile(self, path, pragmas, immediate, ids, options):
+        result = {"reads": 0, "writes": 0, "errors": 0, "read_latencies": []}
+        result_lock = threading.Lock()
+        deadline = time.monotonic() + options["seconds"]
+
+        def connect():
+            # isolation_level=None, transactions are started explicitly
+            conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+            apply_pragmas(conn, pragmas)
+            return conn
+
+        def reader():
+            conn = connect()
+            reads, errors, latencies = 0, 0, []
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    conn.execute(READ_SQL, ("active",)).fetchall()
+                    reads += 1
+                    latencies.append(time.perf_counter() - started)
+                except sqlite3.OperationalError:
+                    errors += 1
+            conn.close()
+            with result_lock:
+                result["reads"] += reads
+                result["errors"] += errors
+                result["read_latencies"].extend(latencies)
+
+        def writer():
+            conn = connect()
+            writes, errors = 0, 0
+            begin = "BEGIN IMMEDIATE" if immediate else "BEGIN"
+            while time.monotonic() < deadline:
+                try:
+                    conn.execute(begin)
+                    for job_id in random.sample(
+                        ids, min(len(ids), options["writes_per_transaction"])
+                    ):
+                        conn.execute(WRITE_SQL, (time.time(), job_id))
+                    conn.execute("COMMIT")
+                    writes += 1
+                except sqlite3.OperationalError:
+                    errors += 1
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+            conn.close()
+            with result_lock:
+                result["writes"] += writes
+                result["errors"] += errors
+
+        threads = [threading.Thread(target=reader) for _ in range(options["readers"])]
+        threads += [threading.Thread(target=writer) for _ in range(options["writers"])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return result
+
+    def report(self, name, result, seconds):
+        latencies = sorted(result["read_latencies"])
+        p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+        self.stdout.write(
+            self.style.SUCCESS(f"{name}:")
+            + f" {result['reads'] / seconds:.0f} reads/s,"
+            f" {result['writes'] / seconds:.0f} write transactions/s,"
+            f" p95 read {p95:.2f} ms,"
+            f" {result['errors']} locked errors"
+        )
@@ -0,0 +1,23 @@
+from app.sqlite import run_maintenance
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs PRAGMA optimize and a WAL checkpoint on the production SQLite database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        if connection.vendor != "sqlite":
+            raise CommandError(f"{options['database']} is not a SQLite database")
+
+        results = run_maintenance(options["database"], force=True)
+        if not results:
+            raise CommandError("SQLITE_PRODUCTION is not enabled")
+        for task, result in results.items():
+            self.stdout.write(self.style.SUCCESS(f"{task}: {result}"))
@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.db import connection
+
+from app.instrumentation import sampler
+from app.profiling import profile_request, profile_trigger
+from app.ratelimit import client_key, get_limiter, rejection, request_cost
+
+
+class SlowQuerySamplerMiddleware:
+    """
+    Samples the slow queries of every request when SLOW_QUERY_SAMPLER_ENABLED
+    is set, see app/instrumentation.py.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.SLOW_QUERY_SAMPLER_ENABLED:
+            return self.get_response(request)
+        with connection.execute_wrapper(sampler.wrapper(request)):
+            return self.get_response(request)
+
+
+class RequestProfilingMiddleware:
+    """
+    Profiles requests asked for by staff or drawn by the sample rate when
+    REQUEST_PROFILING_ENABLED is set, see app/profiling.py.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.REQUEST_PROFILING_ENABLED:
+            return self.get_response(request)
+        trigger = profile_trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+        return profile_request(request, self.get_response, trigger)
+
+
+class RateLimitMiddleware:
+    """
+    Rate limits the API per client and sheds expensive requests over the
+    concurrency limit when RATE_LIMIT_ENABLED is set, see app/ratelimit.py.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            if getattr(request, "_rate_limit_slot", False):
+                request._rate_limit_slot = False
+                get_limiter().release_slot()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not settings.RATE_LIMIT_ENABLED or not request.path.startswith(
+            settings.RATE_LIMIT_PATH_PREFIX
+        ):
+            return None
+        limiter = get_limiter()
+        cost = request_cost(request)
+        wait = limiter.take(client_key(request), cost)
+        if wait:
+            return rejection(429, "Too many requests", wait)
+        if cost >= settings.RATE_LIMIT_EXPENSIVE_COST:
+            if not limiter.acquire_slot():
+                return rejection(
+                    503, "Server busy, retry later", settings.RATE_LIMIT_RETRY_AFTER
+                )
+            request._rate_limit_slot = True
+        return None
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-19 05:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="version",
+            field=models.PositiveIntegerField(default=1, verbose_name="版本"),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0002_job_version"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(fields=["status"], name="app_job_status_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(fields=["updated_at"], name="app_job_updated_at_idx"),
+        ),
+    ]
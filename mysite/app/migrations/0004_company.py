@@ -0,0 +1,66 @@
+# Generated by Django 5.2.1 on 2026-10-19 05:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0003_job_status_updated_at_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Company",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(max_length=255, unique=True, verbose_name="公司名稱"),
+                ),
+                (
+                    "active_job_count",
+                    models.PositiveIntegerField(default=0, verbose_name="刊登中職缺數"),
+                ),
+                (
+                    "total_job_count",
+                    models.PositiveIntegerField(default=0, verbose_name="職缺總數"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="建立時間"),
+                ),
+            ],
+            options={
+                "verbose_name": "公司",
+                "verbose_name_plural": "公司",
+                "ordering": ["name"],
+                "indexes": [
+                    models.Index(
+                        fields=["-active_job_count"],
+                        name="app_company_active_count_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="company",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="jobs",
+                to="app.company",
+                verbose_name="公司",
+            ),
+        ),
+    ]
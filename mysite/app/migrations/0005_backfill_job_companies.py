@@ -0,0 +1,29 @@
+from django.db import migrations
+from django.db.models import Count, Q
+
+
+def backfill_companies(apps, schema_editor):
+    Company = apps.get_model("app", "Company")
+    Job = apps.get_model("app", "Job")
+
+    counts = (
+        Job.objects.order_by()
+        .values("company_name")
+        .annotate(total=Count("id"), active=Count("id", filter=Q(status="active")))
+    )
+    for row in list(counts):
+        company, _ = Company.objects.get_or_create(name=row["company_name"])
+        Job.objects.filter(company_name=row["company_name"]).update(company=company)
+        Company.objects.filter(id=company.id).update(
+            active_job_count=row["active"], total_job_count=row["total"]
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0004_company"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_companies, migrations.RunPython.noop),
+    ]
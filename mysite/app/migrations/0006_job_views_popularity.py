@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-19 05:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0005_backfill_job_companies"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="popularity",
+            field=models.FloatField(default=0, verbose_name="熱門程度"),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="views",
+            field=models.PositiveIntegerField(default=0, verbose_name="瀏覽次數"),
+        ),
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(
+                fields=["-popularity", "-id"], name="app_job_popularity_idx"
+            ),
+        ),
+    ]
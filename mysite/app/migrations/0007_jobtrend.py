@@ -0,0 +1,107 @@
+# Generated by Django 5.2.1 on 2026-10-19 05:54
+
+from collections import Counter
+from datetime import timedelta
+
+from django.db import migrations, models
+
+# Frozen copies of the app.models helpers as of this migration
+TREND_FIELDS = ["location", "required_skills", "posting_date", "status"]
+
+
+def parse_skills(required_skills):
+    return list(
+        dict.fromkeys(
+            skill.strip() for skill in required_skills.split(",") if skill.strip()
+        )
+    )
+
+
+def trend_keys(location, required_skills, posting_date, status):
+    buckets = [
+        ("day", posting_date),
+        ("week", posting_date - timedelta(days=posting_date.weekday())),
+    ]
+    values = [("location", location)]
+    values += [("skill", skill) for skill in parse_skills(required_skills)]
+    return [
+        (period, dimension, value, bucket, status)
+        for period, bucket in buckets
+        for dimension, value in values
+    ]
+
+
+def backfill_trends(apps, schema_editor):
+    Job = apps.get_model("app", "Job")
+    JobTrend = apps.get_model("app", "JobTrend")
+    counts = Counter()
+    for row in Job.objects.values_list(*TREND_FIELDS).iterator(chunk_size=5000):
+        counts.update(trend_keys(*row))
+    JobTrend.objects.bulk_create(
+        (
+            JobTrend(
+                period=period,
+                dimension=dimension,
+                value=value,
+                bucket=bucket,
+                status=status,
+                job_count=count,
+            )
+            for (period, dimension, value, bucket, status), count in counts.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0006_job_views_popularity"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="JobTrend",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "period",
+                    models.CharField(
+                        choices=[("day", "Day"), ("week", "Week")],
+                        max_length=4,
+                        verbose_name="區間",
+                    ),
+                ),
+                (
+                    "dimension",
+                    models.CharField(
+                        choices=[("skill", "Skill"), ("location", "Location")],
+                        max_length=10,
+                        verbose_name="維度",
+                    ),
+                ),
+                ("value", models.CharField(max_length=255, verbose_name="值")),
+                ("bucket", models.DateField(verbose_name="區間起始日")),
+                ("status", models.CharField(max_length=10, verbose_name="狀態")),
+                ("job_count", models.IntegerField(default=0, verbose_name="職缺數")),
+            ],
+            options={
+                "verbose_name": "職缺趨勢",
+                "verbose_name_plural": "職缺趨勢",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("period", "dimension", "value", "bucket", "status"),
+                        name="app_jobtrend_key",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_trends, migrations.RunPython.noop),
+    ]
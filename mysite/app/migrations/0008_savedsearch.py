@@ -0,0 +1,120 @@
+# Generated by Django 5.2.1 on 2026-10-19 05:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0007_jobtrend"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SavedSearch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(blank=True, max_length=255, verbose_name="名稱"),
+                ),
+                ("filters", models.JSONField(default=dict, verbose_name="篩選條件")),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="建立時間"),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(auto_now=True, verbose_name="更新時間"),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="saved_searches",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="使用者",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "儲存的搜尋",
+                "verbose_name_plural": "儲存的搜尋",
+                "ordering": ["-created_at"],
+            },
+        ),
+        migrations.CreateModel(
+            name="SavedSearchMatch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(auto_now_add=True, verbose_name="建立時間"),
+                ),
+                (
+                    "delivered_at",
+                    models.DateTimeField(blank=True, null=True, verbose_name="寄送時間"),
+                ),
+                (
+                    "job",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="app.job",
+                        verbose_name="工作職缺",
+                    ),
+                ),
+                (
+                    "saved_search",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="matches",
+                        to="app.savedsearch",
+                        verbose_name="儲存的搜尋",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "搜尋通知",
+                "verbose_name_plural": "搜尋通知",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="savedsearch",
+            index=models.Index(
+                fields=["updated_at"], name="app_savedsearch_updated_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="savedsearchmatch",
+            index=models.Index(
+                condition=models.Q(("delivered_at__isnull", True)),
+                fields=["id"],
+                name="app_match_pending_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="savedsearchmatch",
+            constraint=models.UniqueConstraint(
+                fields=("saved_search", "job"), name="app_savedsearchmatch_unique"
+            ),
+        ),
+    ]
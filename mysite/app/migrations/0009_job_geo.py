@@ -0,0 +1,46 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:03
+
+from django.db import migrations, models
+
+from app import geo
+
+
+def geocode_jobs(apps, schema_editor):
+    Job = apps.get_model("app", "Job")
+    geo.geocode_jobs(Job.objects.all())
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0008_savedsearch"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="geo_cell",
+            field=models.CharField(
+                blank=True, default="", max_length=12, verbose_name="地理網格"
+            ),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="latitude",
+            field=models.FloatField(blank=True, null=True, verbose_name="緯度"),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="longitude",
+            field=models.FloatField(blank=True, null=True, verbose_name="經度"),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="remote",
+            field=models.BooleanField(default=False, verbose_name="遠端"),
+        ),
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(fields=["geo_cell"], name="app_job_geo_cell_idx"),
+        ),
+        migrations.RunPython(geocode_jobs, migrations.RunPython.noop),
+    ]
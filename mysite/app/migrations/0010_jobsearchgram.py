@@ -0,0 +1,90 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copies of the app.models/app.utils helpers as of this migration
+SEARCH_FIELDS = ["title", "desc", "company_name"]
+GRAM_PAD = "\0\0"
+GRAM_BITS = 21
+ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def fold_case(value, vendor):
+    if vendor == "sqlite":
+        return value.translate(ASCII_LOWER)
+    return value.upper()
+
+
+def encode_gram(chars):
+    value = 0
+    for char in chars:
+        value = (value << GRAM_BITS) | ord(char)
+    return value << (GRAM_BITS * (3 - len(chars)))
+
+
+def search_grams(texts, vendor):
+    grams = set()
+    for text in texts:
+        if text:
+            text = fold_case(text, vendor) + GRAM_PAD
+            grams.update(encode_gram(text[i : i + 3]) for i in range(len(text) - 2))
+    return grams
+
+
+def index_jobs(apps, schema_editor):
+    Job = apps.get_model("app", "Job")
+    JobSearchGram = apps.get_model("app", "JobSearchGram")
+    vendor = schema_editor.connection.vendor
+    for row in Job.objects.values("id", *SEARCH_FIELDS).iterator(chunk_size=2000):
+        texts = [row[field] for field in SEARCH_FIELDS]
+        JobSearchGram.objects.bulk_create(
+            [
+                JobSearchGram(job_id=row["id"], gram=gram)
+                for gram in search_grams(texts, vendor)
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0009_job_geo"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="JobSearchGram",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("gram", models.BigIntegerField(verbose_name="字元組")),
+                (
+                    "job",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="app.job",
+                        verbose_name="工作職缺",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "搜尋索引",
+                "verbose_name_plural": "搜尋索引",
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("gram", "job"), name="app_jobgram_key"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(index_jobs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0010_jobsearchgram"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(
+                fields=["posting_date"], name="app_job_posting_date_idx"
+            ),
+        ),
+    ]
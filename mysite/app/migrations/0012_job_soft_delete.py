@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-19 06:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0011_job_posting_date_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="deleted_at",
+            field=models.DateTimeField(blank=True, null=True, verbose_name="刪除時間"),
+        ),
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", True)),
+                fields=["-posting_date", "-id"],
+                name="app_job_live_posting_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="job",
+            index=models.Index(
+                condition=models.Q(("deleted_at__isnull", False)),
+                fields=["deleted_at"],
+                name="app_job_deleted_at_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+from django.db.models import F
+from django.db.models.functions import Log, Power
+
+
+def to_log2(apps, schema_editor):
+    Job = apps.get_model("app", "Job")
+    Job.objects.filter(views__gt=0, popularity__gt=0).update(
+        popularity=Log(2.0, F("popularity"))
+    )
+
+
+def from_log2(apps, schema_editor):
+    Job = apps.get_model("app", "Job")
+    Job.objects.filter(views__gt=0).update(popularity=Power(2.0, F("popularity")))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0013_task"),
+    ]
+
+    operations = [
+        migrations.RunPython(to_log2, from_log2),
+    ]
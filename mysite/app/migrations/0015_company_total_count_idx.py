@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 08:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("app", "0014_job_popularity_log2"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="company",
+            index=models.Index(
+                fields=["-total_job_count", "id"], name="app_company_total_count_idx"
+            ),
+        ),
+    ]
@@ -1,11 +1,248 @@
+import time
+import uuid
+from collections import Counter, defaultdict
 from datetime import date, timedelta
 from decimal import Decimal
 
+from django.conf import settings
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete
 from django.utils import timezone
 
-from app.utils import salary_range_validator
+from app import geo
+from app.utils import fold_case, salary_range_validator
+
+
+def compute_status(posting_date, expiration_date):
+    if expiration_date < date.today():
+        return "expired"
+    elif posting_date > date.today():
+        return "scheduled"
+    return "active"
+
+
+class Company(models.Model):
+    """
+    Company of the jobs, with job counters maintained on every job write so
+    listing companies never aggregates over the jobs table.
+    """
+
+    name = models.CharField("公司名稱", max_length=255, unique=True)
+    active_job_count = models.PositiveIntegerField("刊登中職缺數", default=0)
+    total_job_count = models.PositiveIntegerField("職缺總數", default=0)
+    created_at = models.DateTimeField("建立時間", auto_now_add=True)
+
+    @classmethod
+    def get_for_name(cls, name):
+        company, _ = cls.objects.get_or_create(name=name)
+        return company
+
+    @classmethod
+    def recount(cls, ids=None):
+        """
+        Recompute the counters from the jobs table, for backfills and bulk
+        loads that bypass `Job.save()`.
+        """
+
+        def job_count(**filters):
+            jobs = (
+                Job.objects.filter(company=models.OuterRef("pk"), **filters)
+                .order_by()
+                .values("company")
+                .annotate(count=models.Count("*"))
+                .values("count")
+            )
+            return Coalesce(models.Subquery(jobs), 0)
+
+        companies = cls.objects.all() if ids is None else cls.objects.filter(id__in=ids)
+        return companies.update(
+            active_job_count=job_count(status="active"),
+            total_job_count=job_count(),
+        )
+
+    class Meta:
+        verbose_name = "公司"
+        verbose_name_plural = "公司"
+        ordering = ["name"]
+        indexes = [
+            models.Index(
+                fields=["-active_job_count"], name="app_company_active_count_idx"
+            ),
+            models.Index(
+                fields=["-total_job_count", "id"], name="app_company_total_count_idx"
+            ),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+def update_company_counters(old, new):
+    """
+    Apply the counter changes of one job going from `old` to `new`, both
+    (company_id, status) tuples or None when the job didn't/doesn't exist.
+    Must run in the transaction writing the job.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for state, sign in ((old, -1), (new, 1)):
+        if state is not None and state[0] is not None:
+            deltas[state[0]][0] += sign * (state[1] == "active")
+            deltas[state[0]][1] += sign
+    apply_company_deltas(deltas)
+
+
+def apply_company_deltas(deltas):
+    """Add `deltas` ({company_id: [active, total]}) to the counters."""
+    for company_id, (active, total) in deltas.items():
+        if active or total:
+            Company.objects.filter(id=company_id).update(
+                active_job_count=F("active_job_count") + active,
+                total_job_count=F("total_job_count") + total,
+            )
+
+
+class JobTrend(models.Model):
+    """
+    Number of jobs posted per day or week, per skill or location and
+    current status. Maintained on every job write by `update_job_trends`,
+    rebuilt with the `rebuild_trends` command.
+    """
+
+    class Period(models.TextChoices):
+        DAY = "day", "Day"
+        WEEK = "week", "Week"
+
+    class Dimension(models.TextChoices):
+        SKILL = "skill", "Skill"
+        LOCATION = "location", "Location"
+
+    period = models.CharField("區間", max_length=4, choices=Period.choices)
+    dimension = models.CharField("維度", max_length=10, choices=Dimension.choices)
+    value = models.CharField("值", max_length=255)
+    bucket = models.DateField("區間起始日")
+    status = models.CharField("狀態", max_length=10)
+    job_count = models.IntegerField("職缺數", default=0)
+
+    class Meta:
+        verbose_name = "職缺趨勢"
+        verbose_name_plural = "職缺趨勢"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["period", "dimension", "value", "bucket", "status"],
+                name="app_jobtrend_key",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension} {self.value} {self.period} of {self.bucket}"
+
+
+TREND_FIELDS = ["location", "required_skills", "posting_date", "status"]
+
+
+def parse_skills(required_skills):
+    return list(
+        dict.fromkeys(
+            skill.strip() for skill in required_skills.split(",") if skill.strip()
+        )
+    )
+
+
+def trend_keys(location, required_skills, posting_date, status):
+    """The JobTrend keys a job with these values counts towards."""
+    buckets = [
+        (JobTrend.Period.DAY, posting_date),
+        (JobTrend.Period.WEEK, posting_date - timedelta(days=posting_date.weekday())),
+    ]
+    values = [(JobTrend.Dimension.LOCATION, location)]
+    values += [
+        (JobTrend.Dimension.SKILL, skill) for skill in parse_skills(required_skills)
+    ]
+    return [
+        (period, dimension, value, bucket, status)
+        for period, bucket in buckets
+        for dimension, value in values
+    ]
+
+
+def apply_trend_deltas(deltas, batch_size=500):
+    """Add `deltas` ({key: delta}) to the rollups with batched upserts."""
+    deltas = sorted((key, delta) for key, delta in deltas.items() if delta)
+    table = connection.ops.quote_name(JobTrend._meta.db_table)
+    if connection.vendor == "mysql":
+        conflict = "ON DUPLICATE KEY UPDATE job_count = job_count + VALUES(job_count)"
+    else:
+        conflict = (
+            "ON CONFLICT (period, dimension, value, bucket, status) "
+            f"DO UPDATE SET job_count = {table}.job_count + excluded.job_count"
+        )
+    for i in range(0, len(deltas), batch_size):
+        batch = deltas[i : i + batch_size]
+        rows = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(batch))
+        params = []
+        for (period, dimension, value, bucket, status), delta in batch:
+            bucket = connection.ops.adapt_datefield_value(bucket)
+            params += [period, dimension, value, bucket, status, delta]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} "
+                "(period, dimension, value, bucket, status, job_count) "
+                f"VALUES {rows} {conflict}",
+                params,
+            )
+
+
+def update_job_trends(old, new):
+    """
+    Apply the rollup changes of one job going from `old` to `new`, both
+    (location, required_skills, posting_date, status) tuples or None when
+    the job didn't/doesn't exist. Must run in the transaction writing the job.
+    """
+    apply_trend_deltas(trend_deltas(old, new))
+
+
+def trend_deltas(old, new):
+    """The rollup deltas ({key: delta}) of one job going from `old` to `new`."""
+    deltas = Counter()
+    if old is not None and None not in old:
+        deltas.subtract(trend_keys(*old))
+    if new is not None:
+        deltas.update(trend_keys(*new))
+    return deltas
+
+
+SEARCH_FIELDS = ["title", "desc", "company_name"]
+# Pads the end of every field, so that any substring starts a trigram
+GRAM_PAD = "\0\0"
+GRAM_BITS = 21  # per character, enough for any code point
+
+
+def encode_gram(chars):
+    """Up to three characters as one integer, left aligned like a prefix."""
+    value = 0
+    for char in chars:
+        value = (value << GRAM_BITS) | ord(char)
+    return value << (GRAM_BITS * (3 - len(chars)))
+
+
+def search_grams(*texts):
+    """The character trigrams of case-folded `texts`, as integers."""
+    grams = set()
+    for text in texts:
+        if text:
+            text = fold_case(text) + GRAM_PAD
+            grams.update(encode_gram(text[i : i + 3]) for i in range(len(text) - 2))
+    return grams
+
+
+class LiveJobManager(models.Manager):
+    """The jobs that aren't soft deleted, what every read path sees."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
 
 
 class Job(models.Model):
@@ -28,6 +265,14 @@ class Job(models.Model):
         validators=[MinValueValidator(28590)],
     )
     company_name = models.CharField("公司名稱", max_length=255)
+    company = models.ForeignKey(
+        Company,
+        verbose_name="公司",
+        on_delete=models.PROTECT,
+        related_name="jobs",
+        null=True,
+        blank=True,
+    )
     posting_date = models.DateField("發布日期", default=date.today)
     expiration_date = models.DateField(
         "刊登期限", default=(timezone.now() + timedelta(days=14)).date()
@@ -43,6 +288,21 @@ class Job(models.Model):
         choices=JobStatus.choices,
         default=JobStatus.ACTIVE,
     )
+    version = models.PositiveIntegerField("版本", default=1)
+    # Written in batches by app/counters.py, outside save()
+    views = models.PositiveIntegerField("瀏覽次數", default=0)
+    popularity = models.FloatField("熱門程度", default=0)
+    # Geocoded from location by app/geo.py
+    latitude = models.FloatField("緯度", null=True, blank=True)
+    longitude = models.FloatField("經度", null=True, blank=True)
+    remote = models.BooleanField("遠端", default=False)
+    geo_cell = models.CharField("地理網格", max_length=12, blank=True, default="")
+    # Soft deleted, hard deleted later by the purge_deleted_jobs command
+    deleted_at = models.DateTimeField("刪除時間", null=True, blank=True)
+
+    objects = LiveJobManager()
+    # Deleted jobs included, for the incremental refreshes and the purge
+    all_objects = models.Manager()
 
     def compute_salary_range_avg(self):
         if self.salary_range:
@@ -58,22 +318,470 @@ class Job(models.Model):
                     return None
         return None
 
+    # Loaded values of the fields with derived data outside the row
+    tracked_fields = ["company_id", "title", "desc", "company_name", *TREND_FIELDS]
+    # Incremented in the database by app/counters.py, save() never writes them
+    buffered_fields = ["views", "popularity"]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            field: instance.__dict__[field]
+            for field in cls.tracked_fields
+            if field in instance.__dict__
+        }
+        return instance
+
+    def loaded_value(self, field):
+        return getattr(self, "_loaded_values", {}).get(field)
+
+    def compute_status(self):
+        return compute_status(self.posting_date, self.expiration_date)
+
     def save(self, *args, **kwargs):
         salary_range_avg = self.compute_salary_range_avg()
         self.salary_range_avg = salary_range_avg
+        self.status = self.compute_status()
+        if self.company_id is None or self.company_name != self.loaded_value(
+            "company_name"
+        ):
+            self.company = Company.get_for_name(self.company_name)
+        if self._state.adding or self.location != self.loaded_value("location"):
+            for field, value in geo.geo_fields(self.location).items():
+                setattr(self, field, value)
+
+        old = old_trend = None
+        old_search = ("",) * len(SEARCH_FIELDS)
+        if not self._state.adding:
+            self.version += 1
+            old = (self.loaded_value("company_id"), self.loaded_value("status"))
+            old_trend = tuple(self.loaded_value(field) for field in TREND_FIELDS)
+            old_search = None
+            loaded = getattr(self, "_loaded_values", {})
+            if all(field in loaded for field in SEARCH_FIELDS):
+                old_search = tuple(self.loaded_value(field) for field in SEARCH_FIELDS)
+        update_fields = None
+        if not self._state.adding:
+            update_fields = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.buffered_fields
+            ]
+        with transaction.atomic():
+            super().save(update_fields=update_fields)
+            update_company_counters(old, (self.company_id, self.status))
+            update_job_derived(
+                self.id,
+                self.version,
+                (old_trend, tuple(getattr(self, field) for field in TREND_FIELDS)),
+                (old_search, tuple(getattr(self, field) for field in SEARCH_FIELDS)),
+            )
+        self._loaded_values = {
+            field: getattr(self, field) for field in self.tracked_fields
+        }
+
+    def delete(self, *args, **kwargs):
+        """
+        Soft delete: the job leaves the counters, the rollups and every read
+        path at once, its row is purged later with `hard_delete`.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            # The row as stored, the instance may predate other writes
+            current = (
+                Job.objects.select_for_update()
+                .filter(id=self.id)
+                .values("version", "company_id", *TREND_FIELDS)
+                .first()
+            )
+            deleted = 0
+            if current is not None:
+                deleted = Job.objects.filter(id=self.id).update(
+                    deleted_at=now, updated_at=now, version=F("version") + 1
+                )
+                update_company_counters(
+                    (current["company_id"], current["status"]), None
+                )
+                update_job_derived(
+                    self.id,
+                    current["version"] + 1,
+                    (tuple(current[field] for field in TREND_FIELDS), None),
+                )
+        if deleted:
+            self.deleted_at = self.updated_at = now
+            self.version = current["version"] + 1
+            # Receivers see soft deletes like deletes
+            post_delete.send(
+                sender=Job, instance=self, using=self._state.db, origin=self
+            )
+        return deleted, {self._meta.label: deleted}
 
-        if self.expiration_date < date.today():
-            self.status = "expired"
-        elif self.posting_date > date.today():
-            self.status = "scheduled"
-        else:
-            self.status = "active"
-        super().save()
+    def hard_delete(self, *args, **kwargs):
+        """Delete the row, with the derived data of a job that wasn't soft deleted."""
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            if self.deleted_at is None:
+                update_company_counters((self.company_id, self.status), None)
+                update_job_trends(
+                    tuple(getattr(self, field) for field in TREND_FIELDS), None
+                )
+        return result
 
     class Meta:
         verbose_name = "工作職缺"
         verbose_name_plural = "工作職缺"
         ordering = ["-created_at"]
+        indexes = [
+            # active-set counts and incremental refreshes of app/columnar.py
+            models.Index(fields=["status"], name="app_job_status_idx"),
+            models.Index(fields=["updated_at"], name="app_job_updated_at_idx"),
+            # date hierarchy and posting date filters of the admin
+            models.Index(fields=["posting_date"], name="app_job_posting_date_idx"),
+            # order_by=-popularity, with list_jobs' id tie-break
+            models.Index(fields=["-popularity", "-id"], name="app_job_popularity_idx"),
+            # cell range scans of the radius and bounding box filters
+            models.Index(fields=["geo_cell"], name="app_job_geo_cell_idx"),
+            # list_jobs' default order over the jobs that aren't deleted
+            models.Index(
+                fields=["-posting_date", "-id"],
+                condition=models.Q(deleted_at__isnull=True),
+                name="app_job_live_posting_idx",
+            ),
+            # the purge, over the deleted jobs only
+            models.Index(
+                fields=["deleted_at"],
+                condition=models.Q(deleted_at__isnull=False),
+                name="app_job_deleted_at_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title} at {self.company_name}"
+
+
+class JobSearchGram(models.Model):
+    """
+    Inverted index of the character trigrams of the searched job fields,
+    maintained by `update_job_search_grams`, see app/search.py.
+    """
+
+    job = models.ForeignKey(
+        Job, verbose_name="工作職缺", on_delete=models.CASCADE, related_name="+"
+    )
+    gram = models.BigIntegerField("字元組")
+
+    class Meta:
+        verbose_name = "搜尋索引"
+        verbose_name_plural = "搜尋索引"
+        constraints = [
+            # posting lists, read with the index only
+            models.UniqueConstraint(fields=["gram", "job"], name="app_jobgram_key"),
+        ]
+
+
+def update_job_search_grams(job_id, old, new, batch_size=500):
+    """
+    Apply the index changes of one job going from `old` to `new`, both
+    (title, desc, company_name) tuples. `old` is None when unknown, the
+    indexed grams are read instead. Must run in the transaction writing the job.
+    """
+    if old == new:
+        return
+    new_grams = search_grams(*new)
+    if old is None:
+        old_grams = set(
+            JobSearchGram.objects.filter(job_id=job_id).values_list("gram", flat=True)
+        )
+    else:
+        old_grams = search_grams(*old)
+    removed = list(old_grams - new_grams)
+    for i in range(0, len(removed), batch_size):
+        JobSearchGram.objects.filter(
+            job_id=job_id, gram__in=removed[i : i + batch_size]
+        ).delete()
+    added = new_grams - old_grams
+    JobSearchGram.objects.bulk_create(
+        (JobSearchGram(job_id=job_id, gram=gram) for gram in added),
+        batch_size=batch_size,
+        ignore_conflicts=True,
+    )
+
+
+def update_job_derived(job_id, version, trends, search=None):
+    """
+    Apply the rollup and search index changes of one job write, `trends`
+    and `search` being the (old, new) pairs of `update_job_trends` and
+    `update_job_search_grams`, `search` None when the searched fields didn't
+    change. Must run in the transaction writing the job, version `version`.
+
+    With TASK_QUEUE_ENABLED they are enqueued in that transaction instead
+    and applied by the run_tasks workers, see app/tasks.py, so the write
+    only pays for its row. The idempotency keys drop duplicates of a write:
+    besides the version they hold a token of the write, as writes through
+    stale instances can give two writes the same version.
+    """
+    if not settings.TASK_QUEUE_ENABLED:
+        update_job_trends(*trends)
+        if search is not None:
+            update_job_search_grams(job_id, *search)
+        return
+
+    tasks = []
+    write = f"{job_id}:{version}:{uuid.uuid4().hex[:12]}"
+    deltas = [
+        [period, dimension, value, bucket.isoformat(), status, delta]
+        for (period, dimension, value, bucket, status), delta in trend_deltas(
+            *trends
+        ).items()
+        if delta
+    ]
+    if deltas:
+        tasks.append(
+            Task(
+                name="apply_trend_deltas",
+                key=f"trends:{write}",
+                kwargs={"deltas": deltas},
+            )
+        )
+    if search is not None and search[0] != search[1]:
+        tasks.append(
+            Task(
+                name="index_job",
+                key=f"search:{write}",
+                kwargs={"job_id": job_id},
+            )
+        )
+    Task.enqueue(tasks)
+
+
+def job_set_deltas(jobs, sign):
+    """
+    Company counter and trend rollup deltas of adding (`sign` 1) or removing
+    (-1) the jobs of a queryset, aggregated in the database by value.
+    """
+    companies = defaultdict(lambda: [0, 0])
+    for row in jobs.order_by().values("company_id", "status").annotate(n=Count("*")):
+        if row["company_id"] is not None:
+            companies[row["company_id"]][0] += (
+                sign * row["n"] * (row["status"] == "active")
+            )
+            companies[row["company_id"]][1] += sign * row["n"]
+    trends = Counter()
+    for row in jobs.order_by().values(*TREND_FIELDS).annotate(n=Count("*")):
+        for key in trend_keys(*(row[field] for field in TREND_FIELDS)):
+            trends[key] += sign * row["n"]
+    return companies, trends
+
+
+def _merge_deltas(total, deltas):
+    companies, trends = total
+    for company_id, (active, count) in deltas[0].items():
+        companies[company_id][0] += active
+        companies[company_id][1] += count
+    trends.update(deltas[1])
+
+
+def update_jobs(job_ids, changes, batch_size=500):
+    """
+    Apply `changes` (field values or expressions, not to the searched text)
+    to the jobs `job_ids` with set-based UPDATEs in batches, bumping their
+    version and keeping the company counters and the trend rollups right.
+    Returns the number of jobs updated and the ids of those turned active.
+    """
+    updated = 0
+    activated = []
+    with transaction.atomic():
+        for i in range(0, len(job_ids), batch_size):
+            jobs = Job.objects.filter(id__in=job_ids[i : i + batch_size])
+            inactive = set(
+                jobs.select_for_update()
+                .exclude(status="active")
+                .values_list("id", flat=True)
+            )
+            deltas = job_set_deltas(jobs, -1)
+            updated += jobs.update(
+                **changes, version=F("version") + 1, updated_at=timezone.now()
+            )
+            _merge_deltas(deltas, job_set_deltas(jobs, 1))
+            apply_company_deltas(deltas[0])
+            apply_trend_deltas(deltas[1])
+            if inactive:
+                activated += jobs.filter(id__in=inactive, status="active").values_list(
+                    "id", flat=True
+                )
+    return updated, activated
+
+
+def delete_jobs(job_ids, batch_size=500):
+    """
+    Soft delete the jobs `job_ids` with set-based UPDATEs in batches, see
+    `update_jobs`. Returns the number of jobs deleted.
+    """
+    deleted, _ = update_jobs(job_ids, {"deleted_at": timezone.now()}, batch_size)
+    return deleted
+
+
+def refresh_statuses():
+    """
+    The status sweep of `list_jobs`: save the jobs whose status changed with
+    the date alone, so that their counters, rollups and `updated_at` follow.
+    Returns the number of jobs saved.
+    """
+    today = date.today()
+    jobs = Job.objects.filter(
+        Q(status="SCHEDULED", posting_date__lte=today)
+        | Q(status="ACTIVE", expiration_date__lt=today)
+    )
+    saved = 0
+    for job in jobs:
+        job.save()  # This will trigger status update logic in the model
+        saved += 1
+    return saved
+
+
+def purge_jobs(before, batch_size=500, pause=0.0):
+    """
+    Hard delete the jobs soft deleted before `before`, `batch_size` at a
+    time in their own transactions, sleeping `pause` seconds in between so
+    other writers get the locks. Yields the number purged per batch.
+    """
+    while True:
+        with transaction.atomic():
+            ids = list(
+                Job.all_objects.filter(deleted_at__lt=before)
+                .order_by("deleted_at")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not ids:
+                return
+            Job.all_objects.filter(id__in=ids).delete()
+        yield len(ids)
+        if len(ids) < batch_size:
+            return
+        time.sleep(pause)
+
+
+class SavedSearch(models.Model):
+    """
+    `JobListFilters` saved by a user to be alerted of new matching jobs,
+    matched by the percolator of app/percolator.py.
+    """
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        verbose_name="使用者",
+        on_delete=models.CASCADE,
+        related_name="saved_searches",
+    )
+    name = models.CharField("名稱", max_length=255, blank=True)
+    filters = models.JSONField("篩選條件", default=dict)
+    created_at = models.DateTimeField("建立時間", auto_now_add=True)
+    updated_at = models.DateTimeField("更新時間", auto_now=True)
+
+    class Meta:
+        verbose_name = "儲存的搜尋"
+        verbose_name_plural = "儲存的搜尋"
+        ordering = ["-created_at"]
+        indexes = [
+            # incremental refreshes of the percolator
+            models.Index(fields=["updated_at"], name="app_savedsearch_updated_idx"),
+        ]
+
+    def __str__(self):
+        return self.name or f"Saved search {self.pk}"
+
+
+class SavedSearchMatch(models.Model):
+    """A job matching a saved search, pending delivery until `delivered_at`."""
+
+    saved_search = models.ForeignKey(
+        SavedSearch,
+        verbose_name="儲存的搜尋",
+        on_delete=models.CASCADE,
+        related_name="matches",
+    )
+    job = models.ForeignKey(
+        Job, verbose_name="工作職缺", on_delete=models.CASCADE, related_name="+"
+    )
+    created_at = models.DateTimeField("建立時間", auto_now_add=True)
+    delivered_at = models.DateTimeField("寄送時間", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "搜尋通知"
+        verbose_name_plural = "搜尋通知"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["saved_search", "job"], name="app_savedsearchmatch_unique"
+            ),
+        ]
+        indexes = [
+            # the delivery queue
+            models.Index(
+                fields=["id"],
+                condition=models.Q(delivered_at__isnull=True),
+                name="app_match_pending_idx",
+            ),
+        ]
+
+
+class Task(models.Model):
+    """
+    Deferred derived work of the writes, claimed and run by the run_tasks
+    workers with retries, see app/tasks.py. Tasks with a `key` are enqueued
+    at most once per key while their row is kept.
+    """
+
+    class TaskStatus(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        DONE = "done", "Done"
+        FAILED = "failed", "Failed"
+
+    name = models.CharField("名稱", max_length=100)
+    kwargs = models.JSONField("參數", default=dict)
+    key = models.CharField("冪等鍵", max_length=255, null=True, blank=True)
+    status = models.CharField(
+        "狀態", max_length=10, choices=TaskStatus.choices, default=TaskStatus.QUEUED
+    )
+    attempts = models.PositiveIntegerField("嘗試次數", default=0)
+    run_at = models.DateTimeField("執行時間", default=timezone.now)
+    locked_by = models.CharField("執行者", max_length=100, blank=True)
+    locked_until = models.DateTimeField("鎖定期限", null=True, blank=True)
+    last_error = models.TextField("錯誤", blank=True)
+    created_at = models.DateTimeField("建立時間", auto_now_add=True)
+    finished_at = models.DateTimeField("完成時間", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "背景工作"
+        verbose_name_plural = "背景工作"
+        constraints = [
+            models.UniqueConstraint(fields=["key"], name="app_task_key"),
+        ]
+        indexes = [
+            # the queue, and the tasks of workers that died holding them
+            models.Index(
+                fields=["run_at", "id"],
+                condition=models.Q(status="queued"),
+                name="app_task_queued_idx",
+            ),
+            models.Index(
+                fields=["locked_until"],
+                condition=models.Q(status="running"),
+                name="app_task_running_idx",
+            ),
+            # the cleanup of the finished tasks
+            models.Index(
+                fields=["finished_at"],
+                condition=models.Q(status="done"),
+                name="app_task_done_idx",
+            ),
+        ]
+
+    @classmethod
+    def enqueue(cls, tasks):
+        """Insert `tasks`, skipping those whose key is already queued or run."""
+        cls.objects.bulk_create(tasks, ignore_conflicts=True)
+
+    def __str__(self):
+        return f"{self.name} {self.key or self.pk}"
@@ -0,0 +1,85 @@
+"""
+OpenAPI document of the API built once per process instead of on every
+request of openapi.json, and served with an ETag so that clients, the docs
+page included, revalidate it with a 304.
+
+The `openapi_schema` command writes the document at deploy time to
+OPENAPI_SCHEMA_PATH, which the workers then serve instead of building it.
+`openapi_schema --check` fails when the file no longer matches the code.
+"""
+import hashlib
+import json
+import threading
+from functools import partial
+from pathlib import Path
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import path
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from ninja import NinjaAPI
+from ninja.responses import NinjaJSONEncoder
+
+
+def render_document(schema):
+    return json.dumps(schema, cls=NinjaJSONEncoder).encode()
+
+
+def document_etag(body):
+    return quote_etag(hashlib.sha256(body).hexdigest()[:32])
+
+
+class CachedSchemaAPI(NinjaAPI):
+    """NinjaAPI serving its OpenAPI document from `openapi_document`."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._documents = {}
+        self._documents_lock = threading.Lock()
+
+    def build_openapi_document(self, path_prefix=None):
+        """The document built from the routers, as JSON bytes."""
+        return render_document(self.get_openapi_schema(path_prefix=path_prefix))
+
+    def openapi_document(self, path_params=None):
+        """
+        (body, ETag) of the document, read from OPENAPI_SCHEMA_PATH when it
+        exists, else built, once per process.
+        """
+        path_prefix = self.get_root_path(path_params or {})
+        document = self._documents.get(path_prefix)
+        if document is not None:
+            return document
+        with self._documents_lock:
+            if path_prefix not in self._documents:
+                schema_path = settings.OPENAPI_SCHEMA_PATH
+                if schema_path and Path(schema_path).exists():
+                    body = Path(schema_path).read_bytes()
+                else:
+                    body = self.build_openapi_document(path_prefix)
+                self._documents[path_prefix] = body, document_etag(body)
+            return self._documents[path_prefix]
+
+    def _get_urls(self):
+        view = partial(openapi_json, api=self)
+        if self.docs_decorator:
+            view = self.docs_decorator(view)
+        return [
+            (
+                path(self.openapi_url.lstrip("/"), view, name="openapi-json")
+                if getattr(pattern, "name", None) == "openapi-json"
+                else pattern
+            )
+            for pattern in super()._get_urls()
+        ]
+
+
+def openapi_json(request, api, **kwargs):
+    body, etag = api.openapi_document(kwargs)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type="application/json")
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
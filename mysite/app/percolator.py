@@ -0,0 +1,263 @@
+"""
+Reverse index of the saved searches, matching new jobs against them.
+
+Every saved search is indexed under its most selective predicate only:
+its location, company, skill term, salary floor or status, in that order,
+or in the match-all list when it has none. A job then looks up the
+candidate searches of its own values, skill terms being found by sliding
+a window of every indexed term length over its skills, and only the
+candidates are checked against their full filters, with the semantics of
+`list_jobs`. Matches are queued in SavedSearchMatch for delivery.
+
+The index lives in-process and is refreshed from `SavedSearch.updated_at`
+like the columnar snapshot, at most every PERCOLATOR_REFRESH_INTERVAL
+seconds.
+"""
+import bisect
+import logging
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+
+from app import geo
+from app.models import Job, SavedSearch, SavedSearchMatch, Task
+from app.utils import fold_case
+
+logger = logging.getLogger(__name__)
+
+EXACT_FIELDS = ["location", "company_id"]
+JOB_FIELDS = [
+    "id",
+    "location",
+    "company_id",
+    "status",
+    "salary_range_avg",
+    "posting_date",
+    "expiration_date",
+    "required_skills",
+    "latitude",
+    "longitude",
+    "remote",
+]
+DATE_FILTERS = {
+    "posting_date__gte": ("posting_date", "gte"),
+    "posting_date__lte": ("posting_date", "lte"),
+    "expiration_date__gte": ("expiration_date", "gte"),
+    "expiration_date__lte": ("expiration_date", "lte"),
+}
+
+# Searches saved slightly out of updated_at order are picked up again
+WATERMARK_OVERLAP = timedelta(seconds=5)
+
+
+def compile_filters(filters):
+    """Parse stored `JobListFilters` into comparable values."""
+    compiled = dict(filters)
+    for name in DATE_FILTERS:
+        if isinstance(compiled.get(name), str):
+            compiled[name] = date.fromisoformat(compiled[name])
+    for name in ["salary_gte", "salary_lte"]:
+        if compiled.get(name) is not None:
+            compiled[name] = Decimal(compiled[name])
+    if compiled.get("required_skills") is not None:
+        compiled["required_skills"] = fold_case(compiled["required_skills"])
+    return {name: value for name, value in compiled.items() if value is not None}
+
+
+def matches(filters, job):
+    """Whether `job` (a dict of JOB_FIELDS) is listed by `list_jobs(filters)`."""
+    if not geo.in_area(filters, job["latitude"], job["longitude"]):
+        return False
+    for name, value in filters.items():
+        if name in geo.GEO_FILTERS:
+            continue
+        elif name in DATE_FILTERS:
+            field, comparison = DATE_FILTERS[name]
+            if comparison == "gte" and not job[field] >= value:
+                return False
+            if comparison == "lte" and not job[field] <= value:
+                return False
+        elif name == "salary_gte":
+            if not job["salary_range_avg"] >= value:
+                return False
+        elif name == "salary_lte":
+            if not job["salary_range_avg"] <= value:
+                return False
+        elif name == "required_skills":
+            if value not in job["folded_skills"]:
+                return False
+        elif job.get(name) != value:
+            return False
+    return True
+
+
+class Percolator:
+    def __init__(self, refresh_interval=1.0):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._refreshed_at = None
+        self._watermark = None
+        self._reset()
+
+    def _reset(self):
+        self.filters = {}  # search id -> compiled filters
+        self.keys = {}  # search id -> index key
+        self.exact = {field: {} for field in EXACT_FIELDS + ["status"]}
+        self.terms = {}  # term length -> {term: ids}
+        self.salary = []  # sorted (salary_gte, id)
+        self.match_all = set()
+
+    def __len__(self):
+        return len(self.filters)
+
+    def _index_key(self, filters):
+        for field in EXACT_FIELDS:
+            if field in filters:
+                return ("exact", field, filters[field])
+        if filters.get("required_skills"):
+            return ("term", filters["required_skills"])
+        if "salary_gte" in filters:
+            return ("salary", filters["salary_gte"])
+        if "status" in filters:
+            return ("exact", "status", filters["status"])
+        return ("all",)
+
+    def add(self, search_id, filters):
+        self.remove(search_id)
+        filters = compile_filters(filters)
+        key = self._index_key(filters)
+        if key[0] == "exact":
+            self.exact[key[1]].setdefault(key[2], set()).add(search_id)
+        elif key[0] == "term":
+            self.terms.setdefault(len(key[1]), {}).setdefault(key[1], set()).add(
+                search_id
+            )
+        elif key[0] == "salary":
+            bisect.insort(self.salary, (key[1], search_id))
+        else:
+            self.match_all.add(search_id)
+        self.filters[search_id] = filters
+        self.keys[search_id] = key
+
+    def remove(self, search_id):
+        key = self.keys.pop(search_id, None)
+        if key is None:
+            return
+        del self.filters[search_id]
+        if key[0] == "exact":
+            self.exact[key[1]][key[2]].discard(search_id)
+        elif key[0] == "term":
+            self.terms[len(key[1])][key[1]].discard(search_id)
+        elif key[0] == "salary":
+            i = bisect.bisect_left(self.salary, (key[1], search_id))
+            del self.salary[i]
+        else:
+            self.match_all.discard(search_id)
+
+    def rebuild(self):
+        self._reset()
+        searches = SavedSearch.objects.values_list("id", "filters", "updated_at")
+        watermark = None
+        for search_id, filters, updated_at in searches.iterator(chunk_size=10000):
+            self.add(search_id, filters)
+            watermark = max(watermark or updated_at, updated_at)
+        self._watermark = watermark
+        logger.debug(f"Percolator rebuilt with {len(self)} saved searches")
+
+    def refresh(self, force=False):
+        """
+        Apply the searches saved since the last refresh, rebuilding when the
+        number of searches no longer matches the database.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if (
+                not force
+                and self._refreshed_at is not None
+                and now - self._refreshed_at < self.refresh_interval
+            ):
+                return
+            self._refreshed_at = now
+
+            if self._watermark is None:
+                self.rebuild()
+                return
+            changed = SavedSearch.objects.filter(
+                updated_at__gte=self._watermark - WATERMARK_OVERLAP
+            ).values_list("id", "filters", "updated_at")
+            for search_id, filters, updated_at in changed:
+                self.add(search_id, filters)
+                self._watermark = max(self._watermark, updated_at)
+            if SavedSearch.objects.count() != len(self):
+                self.rebuild()
+
+    def candidates(self, job):
+        ids = set(self.match_all)
+        for field in EXACT_FIELDS + ["status"]:
+            ids.update(self.exact[field].get(job[field], ()))
+        skills = job["folded_skills"]
+        for length, terms in self.terms.items():
+            for i in range(len(skills) - length + 1):
+                ids.update(terms.get(skills[i : i + length], ()))
+        stop = bisect.bisect_right(self.salary, (job["salary_range_avg"], float("inf")))
+        ids.update(search_id for _, search_id in self.salary[:stop])
+        return ids
+
+    def match(self, job):
+        """Ids of the saved searches listing `job`, a dict of JOB_FIELDS."""
+        self.refresh()
+        job = {**job, "folded_skills": fold_case(job["required_skills"])}
+        with self._lock:
+            return [
+                search_id
+                for search_id in self.candidates(job)
+                if matches(self.filters[search_id], job)
+            ]
+
+
+_percolator = None
+_percolator_lock = threading.Lock()
+
+
+def get_percolator():
+    global _percolator
+    with _percolator_lock:
+        if _percolator is None:
+            _percolator = Percolator(settings.PERCOLATOR_REFRESH_INTERVAL)
+        return _percolator
+
+
+def reset_percolator():
+    global _percolator
+    with _percolator_lock:
+        _percolator = None
+
+
+def percolate(job_ids):
+    """Queue the saved searches matching the jobs `job_ids` for delivery."""
+    percolator = get_percolator()
+    queued = []
+    for job in Job.objects.filter(id__in=job_ids).values(*JOB_FIELDS):
+        queued += [
+            SavedSearchMatch(saved_search_id=search_id, job_id=job["id"])
+            for search_id in percolator.match(job)
+        ]
+    SavedSearchMatch.objects.bulk_create(queued, batch_size=1000, ignore_conflicts=True)
+    logger.debug(f"Percolated {len(job_ids)} jobs into {len(queued)} matches")
+    return len(queued)
+
+
+def percolate_later(job_ids):
+    """
+    Percolate the jobs `job_ids` once the transaction commits, by the
+    run_tasks workers with TASK_QUEUE_ENABLED.
+    """
+    job_ids = list(job_ids)
+    if settings.TASK_QUEUE_ENABLED:
+        Task.enqueue([Task(name="percolate", kwargs={"job_ids": job_ids})])
+    else:
+        transaction.on_commit(lambda: percolate(job_ids), robust=True)
@@ -0,0 +1,184 @@
+"""
+Opt-in per-request profiling.
+
+A request is profiled when REQUEST_PROFILING_ENABLED is set and either a
+staff user sends the REQUEST_PROFILING_HEADER header or the
+REQUEST_PROFILING_SAMPLE_RATE draw triggers. It runs under cProfile while a
+background thread samples its stack, and three files are written to
+REQUEST_PROFILING_DIR: `<id>.pstats` (for pstats/snakeviz), `<id>.collapsed`
+(collapsed stacks for flamegraph.pl/speedscope) and `<id>.json` with the
+endpoint, query parameters and timing. Only the newest
+REQUEST_PROFILING_MAX_FILES profiles are kept.
+"""
+import cProfile
+import json
+import logging
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from app.auth import jwt_authentication
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ID = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$")
+KINDS = {"pstats": "application/octet-stream", "collapsed": "text/plain"}
+
+# Only one cProfile profiler can be active per process
+_profiler_lock = threading.Lock()
+
+
+class StackSampler:
+    """Count the stacks of one thread every `interval` seconds."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                filename = Path(code.co_filename).name
+                stack.append(f"{code.co_qualname} ({filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.items())
+
+
+def is_staff_request(request):
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    header = request.headers.get("Authorization", "")
+    if not header.startswith("Bearer "):
+        return False
+    try:
+        return (
+            jwt_authentication()
+            .authenticate(request, header[len("Bearer ") :])
+            .is_staff
+        )
+    except Exception:
+        return False
+
+
+def profile_trigger(request):
+    """Why `request` should be profiled, or None."""
+    if request.headers.get(settings.REQUEST_PROFILING_HEADER) and is_staff_request(
+        request
+    ):
+        return "header"
+    if random.random() < settings.REQUEST_PROFILING_SAMPLE_RATE:
+        return "sample"
+    return None
+
+
+def profile_request(request, get_response, trigger):
+    """
+    Run `get_response` under the profilers and store the result. Requests
+    arriving while another one is profiled are served normally.
+    """
+    if not _profiler_lock.acquire(blocking=False):
+        return get_response(request)
+    try:
+        profiler = cProfile.Profile()
+        sampler = StackSampler(
+            threading.get_ident(), settings.REQUEST_PROFILING_INTERVAL_MS / 1000
+        )
+        started = time.perf_counter()
+        with sampler:
+            profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                profiler.disable()
+        duration_ms = (time.perf_counter() - started) * 1000
+    finally:
+        _profiler_lock.release()
+
+    match = request.resolver_match
+    profile_id = save_profile(
+        profiler,
+        sampler,
+        {
+            "endpoint": f"{request.method} {match.route if match else request.path}",
+            "path": request.path,
+            "query": request.GET.dict(),
+            "status_code": response.status_code,
+            "duration_ms": round(duration_ms, 3),
+            "trigger": trigger,
+        },
+    )
+    response["X-Profile-Id"] = profile_id
+    return response
+
+
+def profile_dir():
+    return Path(settings.REQUEST_PROFILING_DIR)
+
+
+def save_profile(profiler, sampler, meta):
+    now = timezone.now()
+    profile_id = f"{now:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+
+    profiler.dump_stats(directory / f"{profile_id}.pstats")
+    (directory / f"{profile_id}.collapsed").write_text(sampler.collapsed())
+    meta = {"id": profile_id, "created_at": now.isoformat(), **meta}
+    (directory / f"{profile_id}.json").write_text(json.dumps(meta))
+    logger.info(
+        f"Profiled {meta['endpoint']} in {meta['duration_ms']} ms: {profile_id}"
+    )
+
+    for stale in list_profiles()[settings.REQUEST_PROFILING_MAX_FILES :]:
+        for kind in ["json", *KINDS]:
+            (directory / f"{stale['id']}.{kind}").unlink(missing_ok=True)
+    return profile_id
+
+
+def list_profiles():
+    """Metadata of the stored profiles, newest first."""
+    directory = profile_dir()
+    if not directory.exists():
+        return []
+    profiles = []
+    for path in directory.glob("*.json"):
+        try:
+            profiles.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    return sorted(profiles, key=lambda profile: profile["created_at"], reverse=True)
+
+
+def profile_path(profile_id, kind):
+    """Path of a stored profile file, or None when it doesn't exist."""
+    if not PROFILE_ID.match(profile_id) or kind not in KINDS:
+        return None
+    path = profile_dir() / f"{profile_id}.{kind}"
+    return path if path.exists() else None
@@ -0,0 +1,203 @@
+"""
+Per-client rate limiting and admission control of the API, enabled with
+RATE_LIMIT_ENABLED, see RateLimitMiddleware.
+
+Every client, the user of a valid JWT or else the IP address, has a token
+bucket refilled at RATE_LIMIT_RATE tokens per second up to RATE_LIMIT_BURST.
+A request takes tokens according to its cost: RATE_LIMIT_COSTS per
+endpoint, plus RATE_LIMIT_SEARCH_COST for a `search` and
+RATE_LIMIT_DEEP_PAGE_COST for an unfiltered page past RATE_LIMIT_DEEP_PAGE,
+which can't be served by the indexes, the whole scaled by the `page_size`
+asked over RATE_LIMIT_PAGE_SIZE. A cost is capped at the burst, which a
+client can always save up. A client out of tokens gets a 429 with the
+seconds until it has enough in Retry-After.
+
+Requests costing RATE_LIMIT_EXPENSIVE_COST or more also wait up to
+RATE_LIMIT_QUEUE_TIMEOUT for one of the RATE_LIMIT_MAX_EXPENSIVE slots of
+the process, and are shed with a 503 when none frees up.
+
+The buckets live in the process. With RATE_LIMIT_SHARED, every bucket adds
+the tokens it took to a counter in the cache each RATE_LIMIT_SYNC_INTERVAL
+seconds and takes off the tokens taken by the other processes, so the
+limits hold across workers up to one sync interval of lag.
+"""
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+from ninja.conf import settings as ninja_settings
+
+# list_jobs query parameters that don't filter
+PAGE_PARAMS = {"page", "page_size", "order_by"}
+ROUTE_PARAM = re.compile(r"<(?:\w+:)?(\w+)>")
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated", "taken", "mine", "others", "synced")
+
+    def __init__(self, burst, now):
+        self.tokens = burst
+        self.updated = now
+        self.taken = 0.0  # Since the last sync
+        self.mine = 0.0  # Added to the shared counter by this process
+        self.others = 0.0  # Added by the other processes, as of the last sync
+        self.synced = now
+
+    def take(self, cost, rate, burst, now):
+        """Take `cost` tokens, returns 0 or the seconds until there are enough."""
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens < cost:
+            return (cost - self.tokens) / rate
+        self.tokens -= cost
+        self.taken += cost
+        return 0.0
+
+    def sync(self, key, timeout):
+        """
+        Add the tokens taken to the shared counter `key` and take off those
+        the other processes added since the last sync.
+        """
+        taken, self.taken = self.taken, 0.0
+        # In hundredths of tokens, cache counters are integers
+        cache.add(key, 0, timeout=timeout)
+        try:
+            total = cache.incr(key, round(taken * 100)) / 100
+        except ValueError:  # Expired in between
+            cache.add(key, round(taken * 100), timeout=timeout)
+            total = taken
+        self.mine += taken
+        others = total - self.mine
+        if others < self.others:
+            # The counter expired and restarted, start over from it
+            self.mine = min(taken, total)
+            self.others = total - self.mine
+            return
+        self.tokens -= others - self.others
+        self.others = others
+
+
+class RateLimiter:
+    """The token buckets of the clients seen last, and the expensive slots."""
+
+    def __init__(self):
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(settings.RATE_LIMIT_MAX_EXPENSIVE)
+
+    def take(self, client, cost, now=None):
+        """0 when `client` may send a request of `cost`, else the seconds to wait."""
+        now = time.monotonic() if now is None else now
+        rate, burst = settings.RATE_LIMIT_RATE, settings.RATE_LIMIT_BURST
+        # More could never be taken
+        cost = min(cost, burst)
+        with self.lock:
+            bucket = self.buckets.pop(client, None)
+            if bucket is None:
+                bucket = TokenBucket(burst, now)
+                while len(self.buckets) >= settings.RATE_LIMIT_MAX_CLIENTS:
+                    self.buckets.popitem(last=False)
+            self.buckets[client] = bucket
+            wait = bucket.take(cost, rate, burst, now)
+            sync = (
+                settings.RATE_LIMIT_SHARED
+                and now - bucket.synced >= settings.RATE_LIMIT_SYNC_INTERVAL
+            )
+            if sync:
+                bucket.synced = now
+        if sync:
+            # Outside the lock, the cache may be remote
+            bucket.sync(f"ratelimit:{client}", timeout=math.ceil(burst / rate) + 60)
+        return wait
+
+    def acquire_slot(self):
+        return self.slots.acquire(timeout=settings.RATE_LIMIT_QUEUE_TIMEOUT)
+
+    def release_slot(self):
+        self.slots.release()
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
+
+
+def reset_limiter():
+    global _limiter
+    with _limiter_lock:
+        _limiter = None
+
+
+def client_ip(request):
+    """The address of the client, behind RATE_LIMIT_PROXY_COUNT proxies."""
+    proxies = settings.RATE_LIMIT_PROXY_COUNT
+    if proxies:
+        forwarded = request.headers.get("X-Forwarded-For", "").split(",")
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def client_key(request):
+    """The user of a valid JWT, else the IP address."""
+    scheme, _, raw = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and raw:
+        from ninja_jwt.exceptions import TokenError
+        from ninja_jwt.settings import api_settings
+        from ninja_jwt.tokens import AccessToken
+
+        try:
+            token = AccessToken(raw)
+            return f"user:{token[api_settings.USER_ID_CLAIM]}"
+        except (TokenError, KeyError):
+            pass
+    return f"ip:{client_ip(request)}"
+
+
+def endpoint(request):
+    """The "METHOD /path" of the request's route, as in the OpenAPI schema."""
+    route = ROUTE_PARAM.sub(r"{\1}", request.resolver_match.route)
+    return f"{request.method} /{route}"
+
+
+def int_param(request, name, default):
+    try:
+        return int(request.GET.get(name, default))
+    except ValueError:
+        return default
+
+
+def request_cost(request):
+    cost = settings.RATE_LIMIT_COSTS.get(endpoint(request), 1)
+    if request.GET.get("search"):
+        cost += settings.RATE_LIMIT_SEARCH_COST
+    page_size = min(
+        max(int_param(request, "page_size", settings.RATE_LIMIT_PAGE_SIZE), 1),
+        ninja_settings.PAGINATION_MAX_PER_PAGE_SIZE,
+    )
+    # Deep past RATE_LIMIT_DEEP_PAGE pages of RATE_LIMIT_PAGE_SIZE rows
+    skipped = (int_param(request, "page", 1) - 1) * page_size
+    if (
+        skipped >= settings.RATE_LIMIT_DEEP_PAGE * settings.RATE_LIMIT_PAGE_SIZE
+        and not set(request.GET) - PAGE_PARAMS
+    ):
+        cost += settings.RATE_LIMIT_DEEP_PAGE_COST
+    return cost * max(1, page_size / settings.RATE_LIMIT_PAGE_SIZE)
+
+
+def rejection(status, detail, retry_after):
+    response = JsonResponse({"detail": detail}, status=status)
+    response["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
@@ -1,9 +1,11 @@
 from datetime import date, datetime
 from enum import Enum
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 from ninja import Field, Schema
-from pydantic import field_validator
+from pydantic import field_validator, model_validator
+
+from app import geo
 
 
 class JobBaseSchema(Schema):
@@ -55,17 +57,71 @@ class JobUpdateSchema(Schema):
     desc: Optional[str] = Field(None, min_length=10)
 
 
+class JobPatchSchema(JobBaseSchema):
+    """
+    Partial update, only the fields sent by the client are written.
+    `version` may be sent instead of an If-Match header.
+    """
+
+    title: Optional[str] = Field(None, min_length=3, max_length=255)
+    company_name: Optional[str] = Field(None, min_length=1, max_length=255)
+    posting_date: Optional[date] = Field(None)
+    version: Optional[int] = Field(None, ge=1)
+
+
 class JobSchema(JobBaseSchema):
     id: int
     created_at: datetime
     updated_at: datetime
     status: Optional[str] = Field(None, max_length=10)
+    version: int
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    remote: bool = False
+
+
+class SimilarJobSchema(JobSchema):
+    score: float
+
+
+class JobBatchQuery(Schema):
+    """
+    Job ids, either comma separated (?ids=1,2,3) or repeated (?ids=1&ids=2)
+    """
+
+    ids: List[int] = Field(..., min_length=1, max_length=100)
+
+    @field_validator("ids", mode="before")
+    @classmethod
+    def split_ids(cls, value):
+        if isinstance(value, str):
+            value = [value]
+        ids = []
+        for item in value:
+            if isinstance(item, str):
+                ids.extend(part.strip() for part in item.split(",") if part.strip())
+            else:
+                ids.append(item)
+        return ids
+
+
+class JobBatchRequest(Schema):
+    ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+
+class JobBatchSchema(Schema):
+    items: List[JobSchema]
+    missing: List[int]
 
 
 class JobListFilters(Schema):
     """
     Filter by location, salary_range, posting_date, expiration_date, required_skills
     Filter by status
+    Filter by company_id
+    Filter by distance to a place (near) or point (lat, lon) within radius_km
+    Filter by bounding box: bbox=min_lon,min_lat,max_lon,max_lat
+    Filter by remote
     """
 
     location: Optional[str] = Field(None, min_length=1, max_length=255)
@@ -77,6 +133,13 @@ class JobListFilters(Schema):
     expiration_date__lte: Optional[date] = Field(None)
     required_skills: Optional[str] = Field(None, max_length=100)
     status: Optional[str] = Field(None, max_length=10)
+    company_id: Optional[int] = Field(None)
+    near: Optional[str] = Field(None, min_length=1, max_length=255)
+    lat: Optional[float] = Field(None, ge=-90, le=90)
+    lon: Optional[float] = Field(None, ge=-180, le=180)
+    radius_km: Optional[float] = Field(None, gt=0, le=20000)
+    bbox: Optional[str] = Field(None, max_length=100)
+    remote: Optional[bool] = Field(None)
 
     @field_validator("salary_gte", "salary_lte")
     @classmethod
@@ -88,9 +151,142 @@ class JobListFilters(Schema):
                 raise ValueError("salary_gte and salary_lte must be valid numbers")
         return value
 
+    @field_validator("near")
+    @classmethod
+    def validate_near(cls, value):
+        if value is not None and geo.geocode(value)[0] is None:
+            raise ValueError(f"Unknown place: {value}")
+        return value
+
+    @field_validator("bbox")
+    @classmethod
+    def validate_bbox(cls, value):
+        if value is not None:
+            try:
+                min_lat, min_lon, max_lat, max_lon = geo.parse_bbox(value)
+            except ValueError:
+                raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+            if not (
+                -90 <= min_lat <= max_lat <= 90
+                and -180 <= min_lon <= 180
+                and -180 <= max_lon <= 180
+            ):
+                raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+        return value
+
+    @model_validator(mode="after")
+    def validate_center(self):
+        if (self.lat is None) != (self.lon is None):
+            raise ValueError("lat and lon must be given together")
+        if self.near is not None and self.lat is not None:
+            raise ValueError("Give either near or lat and lon")
+        if self.radius_km is not None and self.near is None and self.lat is None:
+            raise ValueError("radius_km needs near or lat and lon")
+        return self
+
 
 class OrderByEnum(str, Enum):
     posting_date_asc = "posting_date"
     posting_date_desc = "-posting_date"
     expiration_date_asc = "expiration_date"
     expiration_date_desc = "-expiration_date"
+    popularity_desc = "-popularity"
+
+
+class SalaryGroupByEnum(str, Enum):
+    location = "location"
+    company = "company"
+    skill = "skill"
+
+
+class SalaryStatsSchema(Schema):
+    group: str
+    count: int
+    min: float
+    p25: float
+    median: float
+    p75: float
+    max: float
+
+
+class TrendDimensionEnum(str, Enum):
+    skill = "skill"
+    location = "location"
+
+
+class TrendPeriodEnum(str, Enum):
+    day = "day"
+    week = "week"
+
+
+class TrendPointSchema(Schema):
+    value: str
+    bucket: date
+    count: int
+
+
+class CompanySchema(Schema):
+    id: int
+    name: str
+    active_job_count: int
+    total_job_count: int
+
+
+class CompanyOrderByEnum(str, Enum):
+    name_asc = "name"
+    active_job_count_desc = "-active_job_count"
+    total_job_count_desc = "-total_job_count"
+
+
+class SlowQuerySchema(Schema):
+    sql: str
+    count: int
+    total_ms: float
+    mean_ms: float
+    max_ms: float
+    endpoints: List[str]
+    params: str
+    plan: Optional[str] = None
+
+
+class ProfileSchema(Schema):
+    id: str
+    created_at: datetime
+    endpoint: str
+    path: str
+    query: Dict[str, str]
+    status_code: int
+    duration_ms: float
+    trigger: str
+
+
+class DatabasePoolSchema(Schema):
+    alias: str
+    vendor: str
+    pooled: bool
+    conn_max_age: Optional[int] = None
+    min_size: Optional[int] = None
+    max_size: Optional[int] = None
+    size: Optional[int] = None
+    available: Optional[int] = None
+    in_use: Optional[int] = None
+    waiting: Optional[int] = None
+    saturation: Optional[float] = None
+    requests: Optional[int] = None
+    requests_queued: Optional[int] = None
+    requests_wait_ms: Optional[int] = None
+    requests_errors: Optional[int] = None
+    connections_opened: Optional[int] = None
+    connections_lost: Optional[int] = None
+
+
+class SavedSearchCreateSchema(Schema):
+    name: str = Field("", max_length=255)
+    filters: JobListFilters
+
+
+class SavedSearchSchema(Schema):
+    id: int
+    name: str
+    filters: Dict[str, Any]
+    created_at: datetime
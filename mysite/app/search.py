@@ -0,0 +1,131 @@
+"""
+Substring search of the job title, description and company name through a
+character trigram index, for Chinese and mixed-script text that has no
+words to tokenize.
+
+Every field is case-folded like `icontains` does, padded at its end and
+indexed by all its trigrams in JobSearchGram (see `app.models.search_grams`),
+so any substring of a field is either covered by trigrams or, when shorter,
+is the prefix of one. A term of three characters or more is looked up by
+intersecting the posting lists of its trigrams, a two character one by a
+range of the trigrams it prefixes. The candidates are then verified with the
+`icontains` filter itself, so the results are exactly the ones of the plain
+scan, which is kept for single characters.
+"""
+import logging
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Q
+
+from app.models import (
+    GRAM_BITS,
+    SEARCH_FIELDS,
+    JobSearchGram,
+    encode_gram,
+    search_grams,
+)
+from app.utils import fold_case
+
+logger = logging.getLogger(__name__)
+
+# Trigrams of a long term intersected, spread over it, the rest is verified
+MAX_QUERY_GRAMS = 4
+
+
+def contains_q(term):
+    """The plain `list_jobs` search filter."""
+    q = Q()
+    for field in SEARCH_FIELDS:
+        q |= Q(**{f"{field}__icontains": term})
+    return q
+
+
+def candidate_ids(term):
+    """
+    Ids of the jobs that may contain `term`, as a subquery, or None when
+    the term is too short for the index.
+    """
+    term = fold_case(term)
+    if len(term) < 2:
+        return None
+    if len(term) == 2:
+        start = encode_gram(term)
+        return (
+            JobSearchGram.objects.filter(
+                gram__gte=start, gram__lt=start + (1 << GRAM_BITS)
+            )
+            .values("job_id")
+            .distinct()
+        )
+    grams = list(
+        dict.fromkeys(encode_gram(term[i : i + 3]) for i in range(len(term) - 2))
+    )
+    if len(grams) > MAX_QUERY_GRAMS:
+        step = (len(grams) - 1) / (MAX_QUERY_GRAMS - 1)
+        grams = list(
+            dict.fromkeys(grams[round(i * step)] for i in range(MAX_QUERY_GRAMS))
+        )
+    return (
+        JobSearchGram.objects.filter(gram__in=grams)
+        .values("job_id")
+        .annotate(grams=Count("*"))
+        .filter(grams=len(grams))
+        .values("job_id")
+    )
+
+
+def search_q(term):
+    """Filter of the jobs containing `term`, like `contains_q`."""
+    candidates = None
+    if settings.JOB_SEARCH_INDEX_ENABLED:
+        candidates = candidate_ids(term)
+    if candidates is None:
+        return contains_q(term)
+    return Q(id__in=candidates) & contains_q(term)
+
+
+def index_jobs(jobs, batch_size=100000):
+    """
+    Index `jobs` (Job instances or rows of SEARCH_FIELDS with their id)
+    from scratch, for bulk loads that bypass `Job.save()`. Grams are inserted
+    with `executemany` in batches sorted by gram, which appends to the
+    posting lists instead of splitting index pages all over.
+    Returns the number of grams written.
+    """
+    table = connection.ops.quote_name(JobSearchGram._meta.db_table)
+    sql = f"INSERT INTO {table} (gram, job_id) VALUES (%s, %s)"
+    written = 0
+    pending = []
+
+    def flush():
+        pending.sort()
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, pending)
+        return len(pending)
+
+    for job in jobs:
+        row = job
+        if not isinstance(job, dict):
+            row = {field: getattr(job, field) for field in ["id", *SEARCH_FIELDS]}
+        pending += [
+            (gram, row["id"])
+            for gram in search_grams(*(row[field] for field in SEARCH_FIELDS))
+        ]
+        if len(pending) >= batch_size:
+            written += flush()
+            pending = []
+    if pending:
+        written += flush()
+    return written
+
+
+def rebuild(jobs):
+    """Rebuild the index of the jobs of a queryset, returns the grams written."""
+    with transaction.atomic():
+        JobSearchGram.objects.filter(job__in=jobs).delete()
+        written = index_jobs(
+            jobs.order_by().values("id", *SEARCH_FIELDS).iterator(chunk_size=2000)
+        )
+    logger.info(f"Indexed {written} search grams")
+    return written
@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from app.cache import invalidate_job
+from app.models import SEARCH_FIELDS, Job, update_job_search_grams
+from app.percolator import percolate_later
+
+
+@receiver(post_save, sender=Job)
+@receiver(post_delete, sender=Job)
+def invalidate_job_caches(sender, instance, **kwargs):
+    invalidate_job(instance.pk)
+
+
+@receiver(post_save, sender=Job)
+def percolate_activated_job(sender, instance, created, raw=False, **kwargs):
+    """Match jobs created or turned active against the saved searches."""
+    if raw or not settings.SAVED_SEARCH_ALERTS_ENABLED:
+        return
+    if instance.status == "active" and (
+        created or instance.loaded_value("status") != "active"
+    ):
+        percolate_later([instance.pk])
+
+
+@receiver(post_save, sender=Job)
+def index_loaded_job(sender, instance, raw=False, **kwargs):
+    """Index the jobs of fixtures, which are saved raw without `Job.save()`."""
+    if raw:
+        update_job_search_grams(
+            instance.pk, None, tuple(getattr(instance, f) for f in SEARCH_FIELDS)
+        )
@@ -0,0 +1,347 @@
+"""
+Similar jobs from hashed TF-IDF vectors of the title, description and
+skills.
+
+`build_similar_jobs` computes the vectors of every job offline and saves
+them as a sparse matrix stored by feature (CSC), so the cosine similarity
+of one job with all the others is a weighted `bincount` over the postings
+of its few features. Jobs written after the build are vectorized with the
+saved IDF when the index refreshes, kept in a small delta matrix scored
+the same way, and replace their stale rows of the matrix. Results are cached
+per job and per write seen by the index.
+
+Without a built index the endpoint answers 503: building it takes far too
+long for a request.
+"""
+import logging
+import math
+import os
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from app.models import Job, parse_skills
+
+logger = logging.getLogger(__name__)
+
+N_FEATURES = 2**18
+FIELD_WEIGHTS = {"title": 2.0, "desc": 1.0, "skill": 3.0}
+FIELDS = ["id", "title", "desc", "required_skills", "updated_at"]
+
+_WORD = re.compile(r"\w+")
+_CJK = re.compile(r"[\u3400-\u9fff\uf900-\ufaff]+")
+
+# Rows committed slightly out of updated_at order are picked up again
+WATERMARK_OVERLAP = timedelta(seconds=5)
+
+
+def tokenize(text):
+    """Lowercased words, runs of CJK characters split into bigrams."""
+    tokens = []
+    for word in _WORD.findall(text.lower()):
+        start = 0
+        for run in _CJK.finditer(word):
+            if run.start() > start:
+                tokens.append(word[start : run.start()])
+            chars = run.group()
+            tokens += [chars[i : i + 2] for i in range(max(1, len(chars) - 1))]
+            start = run.end()
+        if start < len(word):
+            tokens.append(word[start:])
+    return tokens
+
+
+def feature(token):
+    return zlib.crc32(token.encode()) % N_FEATURES
+
+
+def term_weights(title, desc, required_skills):
+    """Sublinear, field weighted term frequencies by hashed feature."""
+    counts = Counter()
+    for field, tokens in (
+        ("title", tokenize(title)),
+        ("desc", tokenize(desc)),
+        ("skill", [f"skill:{s.lower()}" for s in parse_skills(required_skills)]),
+    ):
+        for token, count in Counter(tokens).items():
+            counts[feature(token)] += FIELD_WEIGHTS[field] * (1 + math.log(count))
+    return counts
+
+
+def vectorize(weights, idf):
+    """L2 normalized TF-IDF vector, as (features, values) arrays."""
+    features = np.fromiter(weights.keys(), dtype=np.int64, count=len(weights))
+    values = np.fromiter(weights.values(), dtype=np.float32, count=len(weights))
+    values *= idf[features]
+    norm = np.linalg.norm(values)
+    if norm:
+        values /= norm
+    return features, values
+
+
+def postings(docs, features, values):
+    """(indptr, docs, values) of the entries sorted by feature, a CSC matrix."""
+    order = np.argsort(features, kind="stable")
+    indptr = np.zeros(N_FEATURES + 1, dtype=np.int64)
+    np.cumsum(np.bincount(features, minlength=N_FEATURES), out=indptr[1:])
+    return indptr, docs[order], values[order]
+
+
+def scores(indptr, docs, values, n, features, weights):
+    """Dot products of the `n` documents of a CSC matrix with a vector."""
+    starts, stops = indptr[features], indptr[features + 1]
+    lengths = stops - starts
+    positions = np.repeat(stops - lengths.cumsum(), lengths) + np.arange(lengths.sum())
+    return np.bincount(
+        docs[positions],
+        weights=values[positions] * np.repeat(weights, lengths),
+        minlength=n,
+    )
+
+
+def top(ids, row_scores, k):
+    """The (id, score) of the `k` + 1 best positive scores, unordered."""
+    if not len(row_scores):
+        return {}
+    best = np.argpartition(-row_scores, min(k, len(row_scores) - 1))[: k + 1]
+    return {
+        int(ids[row]): float(row_scores[row]) for row in best if row_scores[row] > 0
+    }
+
+
+class SimilarIndex:
+    def __init__(self, ids, indptr, docs, values, idf, built_at):
+        self.ids = ids
+        self.indptr = indptr
+        self.docs = docs
+        self.values = values
+        self.idf = idf
+        self.built_at = built_at
+        self.rows = {job_id: row for row, job_id in enumerate(ids.tolist())}
+        self.stale = np.zeros(len(ids), dtype=bool)
+        self.delta = {}  # job id -> (features, values)
+        self._delta_matrix = None
+        self.watermark = built_at
+
+    @classmethod
+    def build(cls, rows):
+        """Build the index of `rows`, dicts of FIELDS."""
+        ids, doc_weights, built_at = [], [], None
+        df = np.zeros(N_FEATURES, dtype=np.int64)
+        for row in rows:
+            weights = term_weights(row["title"], row["desc"], row["required_skills"])
+            ids.append(row["id"])
+            doc_weights.append(weights)
+            df[list(weights)] += 1
+            built_at = max(built_at or row["updated_at"], row["updated_at"])
+
+        n = len(ids)
+        idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+        lengths = np.fromiter(map(len, doc_weights), dtype=np.int64, count=n)
+        docs = np.repeat(np.arange(n, dtype=np.int32), lengths)
+        features = np.fromiter(
+            (f for weights in doc_weights for f in weights),
+            dtype=np.int64,
+            count=int(lengths.sum()),
+        )
+        values = np.fromiter(
+            (v for weights in doc_weights for v in weights.values()),
+            dtype=np.float32,
+            count=int(lengths.sum()),
+        )
+        values *= idf[features]
+        norms = np.sqrt(np.bincount(docs, weights=values**2, minlength=n))
+        values /= np.where(norms > 0, norms, 1)[docs].astype(np.float32)
+
+        return cls(
+            np.array(ids, dtype=np.int64),
+            *postings(docs, features, values),
+            idf,
+            built_at,
+        )
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.stem}.tmp.npz")
+        np.savez(
+            tmp,
+            ids=self.ids,
+            indptr=self.indptr,
+            docs=self.docs,
+            values=self.values,
+            idf=self.idf,
+            built_at=np.array(self.built_at.isoformat() if self.built_at else ""),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            built_at = str(data["built_at"])
+            return cls(
+                data["ids"],
+                data["indptr"],
+                data["docs"],
+                data["values"],
+                data["idf"],
+                datetime.fromisoformat(built_at) if built_at else None,
+            )
+
+    def update(self, rows):
+        """
+        Vectorize jobs written after the build into the delta, and drop the
+        jobs deleted since, rows with a `deleted_at`.
+        """
+        for row in rows:
+            if row.get("deleted_at") is not None:
+                self.delta.pop(row["id"], None)
+            else:
+                weights = term_weights(
+                    row["title"], row["desc"], row["required_skills"]
+                )
+                self.delta[row["id"]] = vectorize(weights, self.idf)
+            if row["id"] in self.rows:
+                self.stale[self.rows[row["id"]]] = True
+            self.watermark = max(self.watermark or row["updated_at"], row["updated_at"])
+        self._delta_matrix = None
+
+    def delta_matrix(self):
+        """(ids, indptr, docs, values) of the delta, built once per update."""
+        if self._delta_matrix is None:
+            ids = np.fromiter(self.delta, dtype=np.int64, count=len(self.delta))
+            vectors = list(self.delta.values())
+            lengths = np.fromiter(
+                (len(features) for features, _ in vectors),
+                dtype=np.int64,
+                count=len(vectors),
+            )
+            docs = np.repeat(np.arange(len(ids), dtype=np.int32), lengths)
+            features = np.concatenate(
+                [features for features, _ in vectors] or [np.zeros(0, np.int64)]
+            )
+            values = np.concatenate(
+                [values for _, values in vectors] or [np.zeros(0, np.float32)]
+            )
+            self._delta_matrix = (ids, *postings(docs, features, values))
+        return self._delta_matrix
+
+    def vector(self, job_id):
+        if job_id in self.delta:
+            return self.delta[job_id]
+        # Same as the stored row, which is spread over the feature postings
+        row = Job.objects.filter(id=job_id).values(*FIELDS).first()
+        if row is None:
+            return None
+        weights = term_weights(row["title"], row["desc"], row["required_skills"])
+        return vectorize(weights, self.idf)
+
+    def similar(self, job_id, k=10):
+        """The `k` most similar jobs as (id, cosine) pairs, best first."""
+        query = self.vector(job_id)
+        if query is None:
+            return []
+        features, weights = query
+        built = scores(
+            self.indptr, self.docs, self.values, len(self.ids), features, weights
+        )
+        built[self.stale] = 0
+        candidates = top(self.ids, built, k)
+
+        ids, *delta = self.delta_matrix()
+        candidates.update(top(ids, scores(*delta, len(ids), features, weights), k))
+        candidates.pop(job_id, None)
+        return sorted(candidates.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+
+def index_path():
+    return Path(settings.SIMILAR_JOBS_INDEX_PATH)
+
+
+def build_index(path=None):
+    rows = Job.objects.order_by("id").values(*FIELDS).iterator(chunk_size=5000)
+    index = SimilarIndex.build(rows)
+    index.save(path or index_path())
+    logger.info(f"Built the similar jobs index of {len(index.ids)} jobs")
+    return index
+
+
+class SimilarJobs:
+    """The loaded index of this process, refreshed with the recent writes."""
+
+    def __init__(self, refresh_interval=5.0):
+        self.refresh_interval = refresh_interval
+        self.index = None
+        self._lock = threading.Lock()
+        self._refreshed_at = None
+        self._mtime = None
+
+    def refresh(self):
+        with self._lock:
+            now = time.monotonic()
+            if (
+                self._refreshed_at is not None
+                and now - self._refreshed_at < self.refresh_interval
+            ):
+                return self.index
+            self._refreshed_at = now
+
+            path = index_path()
+            mtime = path.stat().st_mtime if path.exists() else None
+            if mtime is None and self.index is None:
+                logger.error(
+                    f"No similar jobs index at {path}, "
+                    "run `manage.py build_similar_jobs`"
+                )
+                return None
+            if mtime is not None and mtime != self._mtime:
+                self.index = SimilarIndex.load(path)
+                self._mtime = mtime
+
+            jobs = Job.all_objects.all()
+            if self.index.watermark is not None:
+                jobs = jobs.filter(
+                    updated_at__gte=self.index.watermark - WATERMARK_OVERLAP
+                )
+            self.index.update(jobs.values(*FIELDS, "deleted_at"))
+            return self.index
+
+    def similar(self, job_id, k=10):
+        """The `k` most similar jobs, None without a built index."""
+        index = self.refresh()
+        if index is None:
+            return None
+        # The last write seen, so results change with the delta
+        seen = int(index.watermark.timestamp() * 1e6) if index.watermark else 0
+        key = f"jobs:similar:{seen}:{job_id}:{k}"
+        result = cache.get(key)
+        if result is None:
+            result = index.similar(job_id, k)
+            cache.set(key, result, timeout=settings.SIMILAR_JOBS_CACHE_TIMEOUT)
+        return result
+
+
+_similar_jobs = None
+_similar_jobs_lock = threading.Lock()
+
+
+def get_similar_jobs():
+    global _similar_jobs
+    with _similar_jobs_lock:
+        if _similar_jobs is None:
+            _similar_jobs = SimilarJobs(settings.SIMILAR_JOBS_REFRESH_INTERVAL)
+        return _similar_jobs
+
+
+def reset_similar_jobs():
+    global _similar_jobs
+    with _similar_jobs_lock:
+        _similar_jobs = None
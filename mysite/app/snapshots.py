@@ -0,0 +1,186 @@
+"""
+Pre-rendered `GET /jobs` pages for the most requested listings.
+
+The first STATIC_SNAPSHOT_PAGES pages of the default listing, of every
+status in STATIC_SNAPSHOT_STATUSES and of the STATIC_SNAPSHOT_LOCATIONS
+locations with the most jobs are written as JSON, with a gzip sibling, to
+`<STATIC_SNAPSHOT_DIR>/jobs/<query>.json`. `<query>` is the urlencoded query
+string with its parameters sorted, `index` when empty, so the web server can
+serve `/api/v1/jobs?location=...&page=2` with a `try_files` on `$args` and
+fall back to Django on a miss.
+
+The publisher keeps a manifest of the job ids and count behind every
+listing. An incremental run only re-renders the listings that a job
+changed since the last run matches now, or matched then, or whose count
+moved; files whose content didn't change are left untouched.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+from datetime import timedelta
+from pathlib import Path
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils.dateparse import parse_datetime
+from ninja.responses import NinjaJSONEncoder
+
+from app.api import JOB_LIST_PAGE_SIZE, filter_jobs, serialize_job
+from app.models import Job, refresh_statuses
+from app.schemas import JobListFilters
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ORDER = "-posting_date"
+MANIFEST = "manifest.json"
+
+# Rows committed slightly out of updated_at order are picked up again
+WATERMARK_OVERLAP = timedelta(seconds=5)
+
+
+def snapshot_dir():
+    return Path(settings.STATIC_SNAPSHOT_DIR)
+
+
+def snapshot_name(params, page=1):
+    query = dict(params)
+    if page > 1:
+        query["page"] = page
+    return f"{urlencode(sorted(query.items())) or 'index'}.json"
+
+
+def popular_listings():
+    """The filter parameters of every published listing."""
+    listings = [{}]
+    listings += [{"status": status} for status in settings.STATIC_SNAPSHOT_STATUSES]
+    locations = (
+        Job.objects.values("location")
+        .annotate(jobs=Count("id"))
+        .order_by("-jobs", "location")[: settings.STATIC_SNAPSHOT_LOCATIONS]
+    )
+    listings += [{"location": row["location"]} for row in locations]
+    return listings
+
+
+def matches(job, params):
+    return all(job[name] == value for name, value in params.items())
+
+
+def write_atomic(path, content):
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_bytes(content)
+    os.replace(tmp, path)
+
+
+def render_listing(params):
+    """
+    Render the published pages of one listing like `list_jobs` does.
+    Returns the page bodies, the job ids on them and the total count.
+    """
+    jobs = filter_jobs(JobListFilters(**params), DEFAULT_ORDER)
+    count = jobs.count()
+    pages = max(1, min(settings.STATIC_SNAPSHOT_PAGES, -(-count // JOB_LIST_PAGE_SIZE)))
+    bodies, ids = {}, []
+    for page in range(1, pages + 1):
+        offset = (page - 1) * JOB_LIST_PAGE_SIZE
+        items = [
+            serialize_job(job) for job in jobs[offset : offset + JOB_LIST_PAGE_SIZE]
+        ]
+        ids += [item["id"] for item in items]
+        body = {"items": items, "count": count}
+        bodies[snapshot_name(params, page)] = json.dumps(
+            body, cls=NinjaJSONEncoder
+        ).encode()
+    return bodies, ids, count
+
+
+class Publisher:
+    def __init__(self, directory=None):
+        self.directory = Path(directory or snapshot_dir())
+        self.jobs_dir = self.directory / "jobs"
+        self.manifest_path = self.directory / MANIFEST
+
+    def load_manifest(self):
+        if not self.manifest_path.exists():
+            return {"watermark": None, "listings": {}}
+        return json.loads(self.manifest_path.read_text())
+
+    def publish(self, incremental=False):
+        """
+        Publish the popular listings, only the affected ones when
+        `incremental`. Returns the number of files written and removed.
+        """
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        manifest = self.load_manifest() if incremental else None
+        # Like list_jobs, and before the watermark so the jobs whose status
+        # changed with the date count as changed
+        refresh_statuses()
+        # Read before rendering so writes made meanwhile are picked up next run
+        watermark = Job.all_objects.aggregate(watermark=Max("updated_at"))["watermark"]
+
+        if manifest and manifest["watermark"]:
+            since = parse_datetime(manifest["watermark"]) - WATERMARK_OVERLAP
+            # Deleted jobs included, the listings they were on are affected
+            changed = list(
+                Job.all_objects.filter(updated_at__gte=since).values(
+                    "id", "location", "status"
+                )
+            )
+        else:
+            changed = None
+            manifest = {"watermark": None, "listings": {}}
+
+        written = removed = 0
+        listings = {}
+        for params in popular_listings():
+            key = snapshot_name(params)
+            previous = manifest["listings"].get(key)
+            if previous is not None and changed is not None:
+                previous_ids = set(previous["ids"])
+                affected = any(
+                    job["id"] in previous_ids or matches(job, params) for job in changed
+                )
+                if not affected:
+                    affected = (
+                        filter_jobs(JobListFilters(**params), DEFAULT_ORDER).count()
+                        != previous["count"]
+                    )
+                if not affected:
+                    listings[key] = previous
+                    continue
+
+            bodies, ids, count = render_listing(params)
+            files = {}
+            for name, body in bodies.items():
+                digest = hashlib.sha1(body).hexdigest()
+                files[name] = digest
+                if previous is None or previous["files"].get(name) != digest:
+                    write_atomic(self.jobs_dir / name, body)
+                    write_atomic(
+                        self.jobs_dir / f"{name}.gz", gzip.compress(body, mtime=0)
+                    )
+                    written += 1
+            listings[key] = {
+                "params": params,
+                "ids": ids,
+                "count": count,
+                "files": files,
+            }
+
+        published = {name for listing in listings.values() for name in listing["files"]}
+        for path in self.jobs_dir.glob("*.json"):
+            if path.name not in published:
+                path.unlink()
+                path.with_name(f"{path.name}.gz").unlink(missing_ok=True)
+                removed += 1
+
+        manifest = {
+            "watermark": watermark.isoformat() if watermark else None,
+            "listings": listings,
+        }
+        write_atomic(self.manifest_path, json.dumps(manifest).encode())
+        logger.info(f"Published {written} snapshots, removed {removed}")
+        return written, removed
@@ -0,0 +1,99 @@
+"""
+Production profile for SQLite, enabled with SQLITE_PRODUCTION=1.
+
+Every new connection gets the pragmas of settings.SQLITE_PRAGMAS (WAL so
+readers don't block on writers, a busy timeout instead of immediate
+"database is locked" errors, a larger page cache and memory mapped I/O).
+`PRAGMA optimize` and WAL checkpoints run periodically at the start of a
+request, or on demand with the `sqlite_maintenance` command.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+_last_run = {"optimize": time.monotonic(), "checkpoint": time.monotonic()}
+_last_run_lock = threading.Lock()
+
+
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def is_production_sqlite(connection):
+    return connection.vendor == "sqlite" and settings.SQLITE_PRODUCTION
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    if not is_production_sqlite(connection):
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, settings.SQLITE_PRAGMAS)
+        # Recommended on open for long lived connections, bounded analysis
+        cursor.execute("PRAGMA optimize = 0x10002")
+
+
+def wal_size(connection):
+    try:
+        return os.path.getsize(f"{connection.settings_dict['NAME']}-wal")
+    except OSError:
+        return 0
+
+
+def run_maintenance(using="default", force=False):
+    """
+    Run `PRAGMA optimize` and a WAL checkpoint when their interval elapsed.
+    The checkpoint truncates the WAL once it outgrows SQLITE_WAL_TRUNCATE_BYTES.
+    Returns the tasks that ran with their results.
+    """
+    connection = connections[using]
+    if not is_production_sqlite(connection):
+        return {}
+
+    now = time.monotonic()
+    due = []
+    with _last_run_lock:
+        for task, interval in (
+            ("optimize", settings.SQLITE_OPTIMIZE_INTERVAL),
+            ("checkpoint", settings.SQLITE_CHECKPOINT_INTERVAL),
+        ):
+            if force or now - _last_run[task] >= interval:
+                _last_run[task] = now
+                due.append(task)
+    if not due:
+        return {}
+
+    results = {}
+    with connection.cursor() as cursor:
+        if "optimize" in due:
+            cursor.execute("PRAGMA optimize")
+            results["optimize"] = "ok"
+        if "checkpoint" in due:
+            truncate = wal_size(connection) > settings.SQLITE_WAL_TRUNCATE_BYTES
+            mode = "TRUNCATE" if truncate else "PASSIVE"
+            cursor.execute(f"PRAGMA wal_checkpoint({mode})")
+            busy, log_frames, checkpointed = cursor.fetchone()
+            results["checkpoint"] = {
+                "mode": mode,
+                "busy": busy,
+                "log_frames": log_frames,
+                "checkpointed_frames": checkpointed,
+            }
+    logger.debug(f"SQLite maintenance on {using}: {results}")
+    return results
+
+
+@receiver(request_started)
+def maintenance_on_request(sender, **kwargs):
+    if settings.SQLITE_PRODUCTION:
+        run_maintenance()
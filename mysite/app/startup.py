@@ -0,0 +1,184 @@
+"""
+Server startup: warm-up of the processes before they take traffic and the
+import time report of the `importtime` command.
+
+`warm_up` runs named steps and returns how long each took. Its errors are
+logged, never raised, so a failing step can't keep a worker from starting.
+
+- urls: builds the URL resolver and resolves SERVER_WARMUP_PATHS
+- schemas: builds the OpenAPI document served by the API, or reads it from
+  OPENAPI_SCHEMA_PATH, see app/openapi.py
+- indexes: loads the gazetteer and the enabled in-process indexes
+  (columnar snapshot, percolator, similar jobs when built on disk)
+- connections: opens the database connections, kept across requests only
+  with SQL_CONN_MAX_AGE
+- requests: sends SERVER_WARMUP_PATHS through the WSGI application, which
+  fills the caches and runs the first queries. The views skip their writes
+  for these requests, see `is_warmup_request`, so that N workers starting
+  don't make N writes
+
+The first three are safe before fork, see gunicorn.conf.py, the last two
+run in every worker.
+"""
+import logging
+import re
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+PRELOAD_STEPS = ["urls", "schemas", "indexes"]
+WORKER_STEPS = ["connections", "requests"]
+
+# Set in the WSGI environ of the warm-up requests, clients can't send it
+WARMUP_ENVIRON_KEY = "app.warmup"
+
+# "import time: self [us] | cumulative | imported package"
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+def warmup_host():
+    """A host of ALLOWED_HOSTS for the warm-up requests."""
+    for host in settings.ALLOWED_HOSTS:
+        if host != "*":
+            return host.lstrip(".")
+    return "localhost"
+
+
+def is_warmup_request(request):
+    return bool(request.META.get(WARMUP_ENVIRON_KEY))
+
+
+def warm_urls():
+    resolver = get_resolver()
+    resolver.reverse_dict  # Populates the resolver
+    for path in settings.SERVER_WARMUP_PATHS:
+        resolver.resolve(path.partition("?")[0])
+
+
+def warm_schemas():
+    from mysite.urls import api_v1
+
+    api_v1.openapi_document()
+
+
+def warm_indexes():
+    from app import geo
+    from app.columnar import get_snapshot
+    from app.percolator import get_percolator
+    from app.similar import get_similar_jobs, index_path
+
+    geo.gazetteer()
+    if settings.JOB_COLUMNAR_ENABLED:
+        get_snapshot().refresh(force=True)
+    if settings.SAVED_SEARCH_ALERTS_ENABLED:
+        get_percolator().refresh(force=True)
+    if index_path().exists():
+        get_similar_jobs().refresh()
+
+
+def warm_connections():
+    for connection in connections.all():
+        connection.ensure_connection()
+
+
+def warm_requests(application=None):
+    from app.loadtest import WSGITarget
+
+    if application is None:
+        from mysite.wsgi import application
+
+    target = WSGITarget(application)
+    headers = {"Host": warmup_host()}
+    for path in settings.SERVER_WARMUP_PATHS:
+        status, _, exceptions = target.request(
+            "GET", path, headers=headers, extra_environ={WARMUP_ENVIRON_KEY: True}
+        )
+        if status >= 400:
+            logger.warning(f"Warm-up request {path} returned {status} {exceptions}")
+
+
+WARMUP_STEPS = {
+    "urls": warm_urls,
+    "schemas": warm_schemas,
+    "indexes": warm_indexes,
+    "connections": warm_connections,
+    "requests": warm_requests,
+}
+
+
+def warm_up(steps=None, application=None):
+    """
+    Run the warm-up `steps`, all of them by default, with the requests sent
+    to `application` (mysite.wsgi's by default). Returns the seconds taken
+    by each step that succeeded.
+    """
+    timings = {}
+    for name in steps or WARMUP_STEPS:
+        step = WARMUP_STEPS[name]
+        start = time.perf_counter()
+        try:
+            if step is warm_requests:
+                step(application)
+            else:
+                step()
+        except Exception:
+            logger.exception(f"Warm-up step {name} failed")
+            continue
+        timings[name] = time.perf_counter() - start
+    if timings:
+        logger.info(
+            "Warmed up "
+            + ", ".join(
+                f"{name} {seconds * 1000:.0f}ms" for name, seconds in timings.items()
+            )
+        )
+    return timings
+
+
+def parse_importtime(output):
+    """
+    Imports of a `python -X importtime` stderr `output` as dicts of module,
+    depth (0 for the imports of the program), self_us and cumulative_us.
+    """
+    imports = []
+    for line in output.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            own, cumulative, indent, module = match.groups()
+            imports.append(
+                {
+                    "module": module,
+                    "depth": len(indent) // 2,
+                    "self_us": int(own),
+                    "cumulative_us": int(cumulative),
+                }
+            )
+    return imports
+
+
+def importtime_summary(imports, limit=20):
+    """
+    Total import time, the top level packages taking the longest to import
+    all their modules and the slowest modules by their own time.
+    """
+    packages = {}
+    for entry in imports:
+        package = entry["module"].split(".")[0]
+        packages[package] = packages.get(package, 0) + entry["self_us"]
+    return {
+        "total_us": sum(entry["self_us"] for entry in imports),
+        "modules": len(imports),
+        "packages": [
+            {"package": package, "self_us": total}
+            for package, total in sorted(
+                packages.items(), key=lambda item: item[1], reverse=True
+            )[:limit]
+        ],
+        "slowest": sorted(imports, key=lambda entry: entry["self_us"], reverse=True)[
+            :limit
+        ],
+    }
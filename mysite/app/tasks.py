@@ -0,0 +1,205 @@
+"""
+Database-backed queue of the derived work of the job writes, enabled with
+TASK_QUEUE_ENABLED: the trend rollups, the search index and the saved
+search percolation are enqueued as Task rows in the write's transaction,
+see `update_job_derived` and `percolate_later`, and applied by the
+run_tasks workers.
+
+Workers claim batches of due tasks under a lease of TASK_LEASE_SECONDS.
+On PostgreSQL the claim locks the candidates with SKIP LOCKED so concurrent
+workers take different ones, on SQLite it is a single UPDATE, which runs
+under the database's write lock. Tasks whose lease expired, their worker
+having died, are claimed again.
+
+A handler runs in a transaction with the update marking its task done,
+which only applies while the worker still holds the lease, so the database
+work of a task commits once. Failed tasks are retried after
+TASK_RETRY_DELAY seconds, doubled on every attempt up to
+TASK_RETRY_MAX_DELAY, and marked failed after TASK_MAX_ATTEMPTS.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import uuid
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from app.models import (
+    SEARCH_FIELDS,
+    Job,
+    Task,
+    apply_trend_deltas,
+    update_job_search_grams,
+)
+from app.percolator import percolate
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+class LeaseLost(Exception):
+    pass
+
+
+def task(name):
+    """Register the decorated function as the handler of the tasks `name`."""
+
+    def register(handler):
+        HANDLERS[name] = handler
+        return handler
+
+    return register
+
+
+@task("apply_trend_deltas")
+def apply_serialized_trend_deltas(deltas):
+    apply_trend_deltas(
+        {
+            (period, dimension, value, date.fromisoformat(bucket), status): delta
+            for period, dimension, value, bucket, status, delta in deltas
+        }
+    )
+
+
+@task("index_job")
+def index_job(job_id):
+    """Bring the indexed grams of a job to its current fields."""
+    # Serializes the tasks of the same job on PostgreSQL
+    job = (
+        Job.all_objects.select_for_update()
+        .filter(id=job_id)
+        .values(*SEARCH_FIELDS)
+        .first()
+    )
+    if job is not None:
+        update_job_search_grams(
+            job_id, None, tuple(job[field] for field in SEARCH_FIELDS)
+        )
+
+
+@task("percolate")
+def percolate_jobs(job_ids):
+    percolate(job_ids)
+
+
+def retry_delay(attempts):
+    """Seconds before the next attempt, with jitter so retries spread out."""
+    delay = min(
+        settings.TASK_RETRY_DELAY * 2 ** (attempts - 1), settings.TASK_RETRY_MAX_DELAY
+    )
+    return delay * random.uniform(0.5, 1.0)
+
+
+def claim(worker, limit):
+    """Lease up to `limit` due tasks to `worker`, oldest first."""
+    now = timezone.now()
+    due = Q(status=Task.TaskStatus.QUEUED, run_at__lte=now) | Q(
+        status=Task.TaskStatus.RUNNING, locked_until__lt=now
+    )
+    candidates = Task.objects.filter(due).order_by("run_at", "id")
+    token = f"{worker}:{uuid.uuid4().hex[:12]}"
+    lease = {
+        "status": Task.TaskStatus.RUNNING,
+        "locked_by": token,
+        "locked_until": now + timedelta(seconds=settings.TASK_LEASE_SECONDS),
+        "attempts": F("attempts") + 1,
+    }
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(
+                candidates.select_for_update(skip_locked=True).values_list(
+                    "id", flat=True
+                )[:limit]
+            )
+            if not ids:
+                return []
+            Task.objects.filter(id__in=ids).update(**lease)
+    else:
+        # One statement, so no other worker claims the same rows in between
+        claimed = Task.objects.filter(id__in=candidates.values("id")[:limit]).update(
+            **lease
+        )
+        if not claimed:
+            return []
+    return list(Task.objects.filter(locked_by=token).order_by("run_at", "id"))
+
+
+def run(claimed):
+    """Run a claimed task, returns its new status."""
+    held = Task.objects.filter(id=claimed.id, locked_by=claimed.locked_by)
+    try:
+        handler = HANDLERS[claimed.name]
+        with transaction.atomic():
+            # Written first, which also takes SQLite's write lock before the
+            # handler reads, a read lock can't be upgraded while others write
+            if not held.update(
+                status=Task.TaskStatus.DONE,
+                locked_until=None,
+                finished_at=timezone.now(),
+                last_error="",
+            ):
+                raise LeaseLost
+            handler(**claimed.kwargs)
+    except LeaseLost:
+        logger.warning(f"Task {claimed} outlived its lease, rolled back")
+        return None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        if claimed.name in HANDLERS and claimed.attempts < settings.TASK_MAX_ATTEMPTS:
+            status = Task.TaskStatus.QUEUED
+            changes = {
+                "run_at": timezone.now()
+                + timedelta(seconds=retry_delay(claimed.attempts))
+            }
+            logger.warning(
+                f"Task {claimed} failed, attempt {claimed.attempts}: {error}"
+            )
+        else:
+            status = Task.TaskStatus.FAILED
+            changes = {"finished_at": timezone.now()}
+            logger.exception(f"Task {claimed} failed")
+        held.update(status=status, locked_until=None, last_error=error, **changes)
+        return status
+    return Task.TaskStatus.DONE
+
+
+def purge_tasks(before):
+    """Delete the tasks done before `before`, their keys can be enqueued again."""
+    deleted, _ = Task.objects.filter(
+        status=Task.TaskStatus.DONE, finished_at__lt=before
+    ).delete()
+    return deleted
+
+
+def work(worker, stop, batch_size=None, poll_interval=None, once=False):
+    """
+    Claim and run tasks until `stop` (a threading.Event) is set, or until
+    none is due with `once`. Returns the number of tasks run.
+    """
+    batch_size = batch_size or settings.TASK_BATCH_SIZE
+    poll_interval = (
+        settings.TASK_POLL_INTERVAL if poll_interval is None else poll_interval
+    )
+    ran = 0
+    while not stop.is_set():
+        tasks = claim(worker, batch_size)
+        for claimed in tasks:
+            run(claimed)
+        ran += len(tasks)
+        if not tasks:
+            if once:
+                break
+            stop.wait(poll_interval)
+    return ran
+
+
+def worker_name():
+    """host:pid:thread, unique among the running workers."""
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
@@ -1,15 +1,19 @@
+import json
 import logging
+import os
 import random
 from datetime import date
 
 import pytest
 from django.contrib.auth.models import User
 from django.core.management import call_command
+from django.utils.timezone import now as timezone_now
 from ninja.testing import TestClient
 from ninja_jwt.routers.obtain import obtain_pair_router
 
 from app.api import router as jobs_router
 from app.models import Job
+from mysite import urls  # noqa: F401, attaches the routers before the test clients
 
 logger = logging.getLogger(__name__)
 
@@ -305,9 +309,9 @@ class TestJobPostingAPI:
             {
                 "type": "enum",
                 "loc": ["query", "order_by"],
-                "msg": "Input should be 'posting_date', '-posting_date', 'expiration_date' or '-expiration_date'",
+                "msg": "Input should be 'posting_date', '-posting_date', 'expiration_date', '-expiration_date' or '-popularity'",
                 "ctx": {
-                    "expected": "'posting_date', '-posting_date', 'expiration_date' or '-expiration_date'"
+                    "expected": "'posting_date', '-posting_date', 'expiration_date', '-expiration_date' or '-popularity'"
                 },
             }
         ]
@@ -359,6 +363,139 @@ class TestJobPostingAPI:
         assert data["id"] == existing_job.id
         assert data["title"] == new_title
 
+    # --- PATCH /jobs/{id} ---
+    def test_patch_job_success(self, client: TestClient, existing_job: Job, token):
+        """Test the PATCH /jobs/{id} endpoint with a matching If-Match header.
+
+        assert:
+            - Only the sent field and its derived fields change.
+            - The version is bumped and returned as the ETag.
+        """
+        response = client.patch(
+            f"/jobs/{existing_job.id}",
+            headers={
+                "Authorization": f"Bearer {token}",
+                "If-Match": f'"{existing_job.version}"',
+            },
+            json={"salary_range": "40000~60000"},
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["salary_range"] == "40000~60000"
+        assert data["title"] == existing_job.title
+        assert data["version"] == existing_job.version + 1
+        assert response["ETag"] == f'"{existing_job.version + 1}"'
+
+        job = Job.objects.get(id=existing_job.id)
+        assert job.salary_range_avg == 50000
+        assert job.status == existing_job.status
+
+    def test_patch_job_recomputes_status(
+        self, client: TestClient, existing_job: Job, token: str, today
+    ):
+        """Test that changing a date through PATCH recomputes the status."""
+        response = client.patch(
+            f"/jobs/{existing_job.id}",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"posting_date": str(today), "expiration_date": "2000-01-01"},
+        )
+        assert response.status_code == 200
+        assert response.json()["status"] == "expired"
+
+        response = client.patch(
+            f"/jobs/{existing_job.id}",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"expiration_date": str(today)},
+        )
+        assert response.status_code == 200
+        assert response.json()["status"] == "active"
+
+    def test_patch_job_conflicts(
+        self, client: TestClient, existing_job: Job, token: str
+    ):
+        """Test the PATCH /jobs/{id} endpoint with a stale version.
+
+        assert:
+            - A stale If-Match header returns 412.
+            - A stale version in the body returns 409.
+            - A missing job returns 404.
+        """
+        stale = existing_job.version - 1
+        response = client.patch(
+            f"/jobs/{existing_job.id}",
+            headers={"Authorization": f"Bearer {token}", "If-Match": f'"{stale}"'},
+            json={"title": "Conflicting Title"},
+        )
+        assert response.status_code == 412
+
+        response = client.patch(
+            f"/jobs/{existing_job.id}",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"title": "Conflicting Title", "version": existing_job.version + 1},
+        )
+        assert response.status_code == 409
+        assert Job.objects.get(id=existing_job.id).title == existing_job.title
+
+        response = client.patch(
+            "/jobs/99999",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"title": "Missing Job"},
+        )
+        assert response.status_code == 404
+
+    def test_patch_job_return_minimal(
+        self, client: TestClient, existing_job: Job, token: str
+    ):
+        """Test the PATCH /jobs/{id} endpoint with `Prefer: return=minimal`."""
+        response = client.patch(
+            f"/jobs/{existing_job.id}",
+            headers={
+                "Authorization": f"Bearer {token}",
+                "Prefer": "return=minimal",
+            },
+            json={"title": "Minimal Title", "version": existing_job.version},
+        )
+        assert response.status_code == 204
+        assert response["ETag"] == f'"{existing_job.version + 1}"'
+        assert Job.objects.get(id=existing_job.id).title == "Minimal Title"
+
+    def test_patch_job_queries(
+        self,
+        client: TestClient,
+        existing_job: Job,
+        token: str,
+        django_assert_num_queries,
+    ):
+        """Test the queries of PATCH /jobs/{id} with and without the locked read.
+
+        assert:
+            - Other fields are written with the UPDATE alone.
+            - A new location reads the row under lock, without the searched text,
+              and updates the rollups.
+        """
+        headers = {"Authorization": f"Bearer {token}", "Prefer": "return=minimal"}
+        # The token's user, the savepoint and its release, the UPDATE
+        with django_assert_num_queries(4) as queries:
+            response = client.patch(
+                f"/jobs/{existing_job.id}",
+                headers=headers,
+                json={"salary_range": "40000~60000"},
+            )
+        assert response.status_code == 204
+        assert queries.captured_queries[2]["sql"].startswith("UPDATE")
+
+        # Plus the locked read and the rollup deltas
+        with django_assert_num_queries(6) as queries:
+            response = client.patch(
+                f"/jobs/{existing_job.id}",
+                headers=headers,
+                json={"location": "Query Count City"},
+            )
+        assert response.status_code == 204
+        locked_read = queries.captured_queries[2]["sql"]
+        assert locked_read.startswith("SELECT")
+        assert '"desc"' not in locked_read
+
     # --- DELETE /jobs/{id} ---
     def test_delete_job_by_id_success(
         self, client: TestClient, existing_job: Job, token: str
@@ -372,3 +509,2157 @@ class TestJobPostingAPI:
         # Verify the job is deleted
         response = client.get(f"/jobs/{existing_job.id}")
         assert response.status_code == 404
+
+
+@pytest.mark.django_db
+class TestColumnarSnapshot:
+    """The columnar snapshot must answer list_jobs exactly like the ORM."""
+
+    @pytest.fixture(autouse=True)
+    def snapshot(self, settings, django_db_setup):
+        from app import columnar
+
+        settings.JOB_COLUMNAR_REFRESH_INTERVAL = 0
+        columnar.reset_snapshot()
+        yield columnar
+        columnar.reset_snapshot()
+
+    def list_jobs(self, client, settings, query, enabled):
+        settings.JOB_COLUMNAR_ENABLED = enabled
+        response = client.get(f"/jobs?{query}")
+        assert response.status_code == 200
+        return response.json()
+
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "status=active",
+            "status=active&page=3",
+            "status=active&location=Remote",
+            "status=active&location=Nowhere",
+            "status=active&required_skills=project",
+            "status=active&required_skills=Python&order_by=expiration_date",
+            "status=active&salary_gte=30000&salary_lte=60000&order_by=posting_date",
+            "status=active&posting_date__gte=2025-03-01&order_by=-expiration_date",
+            "status=active&expiration_date__lte=2025-06-01&page_size=50",
+        ],
+    )
+    def test_snapshot_matches_orm(self, client, settings, snapshot, query):
+        """Test that the snapshot and the ORM return the same page.
+
+        assert:
+            - The snapshot answered the query.
+            - The count and the items are identical.
+        """
+        expected = self.list_jobs(client, settings, query, enabled=False)
+        actual = self.list_jobs(client, settings, query, enabled=True)
+        assert actual == expected
+        assert len(snapshot.get_snapshot()) > 0
+
+    def test_snapshot_falls_back_to_orm(self, client, settings, snapshot):
+        """Test that unsupported queries are not answered by the snapshot."""
+        from app.schemas import JobListFilters
+
+        engine = snapshot.get_snapshot()
+        assert engine.query(JobListFilters(status="expired")) is None
+        assert engine.query(JobListFilters()) is None
+        assert (
+            engine.query(JobListFilters(status="active", required_skills="a,b")) is None
+        )
+
+        expected = self.list_jobs(client, settings, "status=expired", enabled=False)
+        actual = self.list_jobs(client, settings, "status=expired", enabled=True)
+        assert actual == expected
+
+    def test_snapshot_incremental_refresh(
+        self, client, settings, snapshot, existing_job, token
+    ):
+        """Test that writes are picked up by the next refresh."""
+        query = "status=active&location=Atlantis"
+        assert self.list_jobs(client, settings, query, enabled=True)["count"] == 0
+
+        Job.objects.filter(id=existing_job.id).update(
+            location="Atlantis", updated_at=existing_job.updated_at
+        )
+        job = Job.objects.get(id=existing_job.id)
+        job.expiration_date = date(2999, 1, 1)
+        job.posting_date = date(2000, 1, 1)
+        job.save()
+
+        actual = self.list_jobs(client, settings, query, enabled=True)
+        assert actual == self.list_jobs(client, settings, query, enabled=False)
+        assert [item["id"] for item in actual["items"]] == [existing_job.id]
+
+
+@pytest.mark.django_db
+class TestSalaryAnalytics:
+    @pytest.fixture(autouse=True)
+    def clear_cache(self, django_db_setup):
+        from django.core.cache import cache
+
+        cache.clear()
+
+    def expected_stats(self, salaries):
+        import numpy as np
+
+        p25, median, p75 = np.percentile(salaries, [25, 50, 75])
+        return {
+            "count": len(salaries),
+            "min": min(salaries),
+            "p25": p25,
+            "median": median,
+            "p75": p75,
+            "max": max(salaries),
+        }
+
+    def test_salary_stats_by_location(self, client: TestClient):
+        """Test GET /jobs/analytics/salary grouped by location.
+
+        assert:
+            - Every location gets the same statistics as numpy.percentile.
+            - Negotiable salaries are left out.
+        """
+        response = client.get("/jobs/analytics/salary?group_by=location")
+        assert response.status_code == 200
+        data = response.json()
+
+        jobs = Job.objects.exclude(salary_range__in=["", "面議"])
+        assert sum(group["count"] for group in data) == jobs.count()
+        for group in data:
+            salaries = [
+                float(job.salary_range_avg)
+                for job in jobs.filter(location=group["group"])
+            ]
+            expected = self.expected_stats(salaries)
+            assert group == pytest.approx({"group": group["group"], **expected})
+
+    def test_salary_stats_by_skill(self, client: TestClient):
+        """Test GET /jobs/analytics/salary grouped by skill with a status filter."""
+        response = client.get("/jobs/analytics/salary?group_by=skill&status=active")
+        assert response.status_code == 200
+        data = {group["group"]: group for group in response.json()}
+
+        salaries = [
+            float(job.salary_range_avg)
+            for job in Job.objects.filter(
+                status="active", required_skills__contains="Python"
+            ).exclude(salary_range__in=["", "面議"])
+        ]
+        assert data["Python"] == pytest.approx(
+            {"group": "Python", **self.expected_stats(salaries)}
+        )
+
+    def test_salary_stats_invalidated_by_writes(
+        self, client: TestClient, existing_job: Job, token: str
+    ):
+        """Test that a job write invalidates the cached statistics."""
+        url = "/jobs/analytics/salary?group_by=company"
+        before = {group["group"]: group for group in client.get(url).json()}
+
+        response = client.patch(
+            f"/jobs/{existing_job.id}",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"company_name": "Analytics Corp", "salary_range": "90000~110000"},
+        )
+        assert response.status_code == 200
+
+        after = {group["group"]: group for group in client.get(url).json()}
+        assert "Analytics Corp" not in before
+        assert after["Analytics Corp"]["median"] == 100000
+
+
+@pytest.mark.django_db
+class TestJobBatchAPI:
+    @pytest.fixture(autouse=True)
+    def clear_cache(self, django_db_setup):
+        from django.core.cache import cache
+
+        cache.clear()
+
+    def test_get_jobs_batch(self, client: TestClient):
+        """Test GET /jobs/batch with comma separated ids.
+
+        assert:
+            - The jobs come back in the requested order, without duplicates.
+            - Unknown ids are reported as missing.
+        """
+        response = client.get("/jobs/batch?ids=5,3,99999,5,1")
+        assert response.status_code == 200
+        data = response.json()
+        assert [job["id"] for job in data["items"]] == [5, 3, 1]
+        assert data["missing"] == [99999]
+        assert data["items"][0]["title"] == Job.objects.get(id=5).title
+
+    def test_get_jobs_batch_invalid(self, client: TestClient):
+        """Test GET /jobs/batch without ids or with too many ids."""
+        assert client.get("/jobs/batch").status_code == 422
+        assert client.get("/jobs/batch?ids=a,b").status_code == 422
+        ids = ",".join(str(job_id) for job_id in range(1, 102))
+        assert client.get(f"/jobs/batch?ids={ids}").status_code == 422
+
+    def test_post_jobs_batch(self, client: TestClient):
+        """Test POST /jobs/batch with a long list of ids."""
+        ids = list(range(300, 0, -1))
+        response = client.post("/jobs/batch", json={"ids": ids})
+        assert response.status_code == 200
+        data = response.json()
+        assert [job["id"] for job in data["items"]] == list(range(200, 0, -1))
+        assert data["missing"] == list(range(300, 200, -1))
+
+    def test_batch_shares_cache_with_get_job(
+        self,
+        client: TestClient,
+        settings,
+        django_assert_num_queries,
+        existing_job: Job,
+        token: str,
+    ):
+        """Test that the batch endpoints and GET /jobs/{id} share the per-id cache.
+
+        assert:
+            - Jobs cached by GET /jobs/{id} are not queried again by the batch.
+            - A write invalidates the cached job.
+        """
+        settings.JOB_CACHE_ENABLED = True
+        settings.JOB_VIEW_FLUSH_INTERVAL = 3600  # No view counter flush
+        other_id = existing_job.id % 200 + 1
+        with django_assert_num_queries(1):
+            client.get(f"/jobs/{existing_job.id}")
+        with django_assert_num_queries(1):
+            response = client.get(f"/jobs/batch?ids={existing_job.id},{other_id}")
+        assert len(response.json()["items"]) == 2
+        with django_assert_num_queries(0):
+            assert client.get(f"/jobs/{other_id}").status_code == 200
+
+        client.patch(
+            f"/jobs/{existing_job.id}",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"title": "Cached Title Changed"},
+        )
+        response = client.post("/jobs/batch", json={"ids": [existing_job.id]})
+        assert response.json()["items"][0]["title"] == "Cached Title Changed"
+
+
+@pytest.mark.django_db
+class TestCompanies:
+    def counters(self, name):
+        from app.models import Company
+
+        company = Company.objects.get(name=name)
+        return company.active_job_count, company.total_job_count
+
+    def assert_counters_match_jobs(self):
+        from app.models import Company
+
+        for company in Company.objects.all():
+            jobs = Job.objects.filter(company=company)
+            assert company.total_job_count == jobs.count()
+            assert company.active_job_count == jobs.filter(status="active").count()
+
+    def test_list_companies(self, client: TestClient):
+        """Test GET /companies ordered by active job count.
+
+        assert:
+            - The counters match the jobs of every company.
+        """
+        response = client.get("/companies?order_by=-active_job_count&page_size=50")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["count"] == 20
+        counts = [company["active_job_count"] for company in data["items"]]
+        assert counts == sorted(counts, reverse=True)
+        self.assert_counters_match_jobs()
+
+    def test_filter_jobs_by_company_id(self, client: TestClient, existing_job: Job):
+        """Test GET /jobs filtered by company_id."""
+        response = client.get(f"/jobs?company_id={existing_job.company_id}")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["count"] == 10
+        assert all(
+            job["company_name"] == existing_job.company_name for job in data["items"]
+        )
+
+    def test_counters_follow_job_writes(
+        self, client: TestClient, existing_job: Job, token: str, today
+    ):
+        """Test that creates, company changes, status changes and deletes
+        keep the company counters in sync with the jobs."""
+        headers = {"Authorization": f"Bearer {token}"}
+        payload = {
+            "title": "Counter Job",
+            "desc": "A job to check the company counters.",
+            "location": "Remote",
+            "salary_range": "50000~70000",
+            "company_name": "Counter Company",
+            "posting_date": str(today),
+            "expiration_date": "2999-01-01",
+            "required_skills": "Python",
+        }
+        response = client.post("/jobs", headers=headers, json=payload)
+        assert response.status_code == 201
+        job_id = response.json()["id"]
+        assert self.counters("Counter Company") == (1, 1)
+
+        response = client.patch(
+            f"/jobs/{job_id}", headers=headers, json={"expiration_date": "2000-01-01"}
+        )
+        assert response.json()["status"] == "expired"
+        assert self.counters("Counter Company") == (0, 1)
+
+        previous = self.counters(existing_job.company_name)
+        response = client.patch(
+            f"/jobs/{existing_job.id}",
+            headers=headers,
+            json={"company_name": "Counter Company"},
+        )
+        assert response.status_code == 200
+        moved = existing_job.status == "active"
+        assert self.counters("Counter Company") == (int(moved), 2)
+        assert self.counters(existing_job.company_name) == (
+            previous[0] - moved,
+            previous[1] - 1,
+        )
+
+        assert client.delete(f"/jobs/{job_id}", headers=headers).status_code == 204
+        assert self.counters("Counter Company") == (int(moved), 1)
+        self.assert_counters_match_jobs()
+
+
+@pytest.mark.django_db
+class TestListCache:
+    @pytest.fixture(autouse=True)
+    def list_cache(self, settings, django_db_setup):
+        from django.core.cache import cache
+
+        settings.JOB_LIST_CACHE_ENABLED = True
+        cache.clear()
+        yield cache
+        cache.clear()
+
+    def test_cached_list_matches_uncached(
+        self, client: TestClient, settings, django_assert_max_num_queries
+    ):
+        """Test that cached pages equal the uncached ones and skip the queries."""
+        expected = client.get("/jobs?status=active&page=2").json()
+        assert client.get("/jobs?status=active&page=2").json() == expected
+        with django_assert_max_num_queries(1):  # the status sweep
+            assert client.get("/jobs?status=active&page=2").json() == expected
+
+        settings.JOB_LIST_CACHE_ENABLED = False
+        assert client.get("/jobs?status=active&page=2").json() == expected
+
+    def test_concurrent_misses_compute_once(self):
+        """Test that concurrent callers of a missing key share one computation."""
+        import threading
+        import time
+
+        from app.cache import get_or_compute
+
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return "value"
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(get_or_compute("single-flight", compute))
+            )
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == ["value"] * 8
+        assert len(calls) == 1
+
+    def test_stale_value_served_while_revalidating(self, list_cache):
+        """Test that a stale value is returned while another process holds
+        the revalidation lock, and recomputed once the lock is released."""
+        from app.cache import bump_generation, get_or_compute
+
+        assert get_or_compute("stale", lambda: "old") == "old"
+        bump_generation()
+        list_cache.add("stale:lock", True)
+        assert get_or_compute("stale", lambda: "new") == "old"
+
+        list_cache.delete("stale:lock")
+        assert get_or_compute("stale", lambda: "new") == "new"
+        assert get_or_compute("stale", lambda: "newer") == "new"
+
+
+@pytest.mark.django_db
+class TestSlowQuerySampler:
+    @pytest.fixture
+    def sampler(self, settings, tmp_path, django_db_setup):
+        from app.instrumentation import sampler
+
+        settings.SLOW_QUERY_THRESHOLD_MS = 0
+        settings.SLOW_QUERY_LOG_PATH = str(tmp_path / "slow_queries.jsonl")
+        sampler.samples.clear()
+        yield sampler
+        sampler.samples.clear()
+
+    def test_normalize_sql(self):
+        """Test that literals and IN lists are normalized away."""
+        from app.instrumentation import normalize_sql
+
+        sql = (
+            "SELECT * FROM app_job WHERE id IN (%s, %s, %s) AND title = 'a''b' LIMIT 10"
+        )
+        assert normalize_sql(sql) == (
+            "SELECT * FROM app_job WHERE id IN (...) AND title = ? LIMIT ?"
+        )
+
+    @pytest.mark.django_db
+    def test_failed_explain(self, sampler):
+        """Test that a query that can't be explained leaves the transaction usable.
+
+        assert:
+            - No plan is recorded for it.
+            - Queries of the same transaction still run.
+        """
+        from django.db import connection, transaction
+
+        with transaction.atomic():
+            assert (
+                sampler.explain(connection, "SELECT missing FROM app_job", []) is None
+            )
+            assert Job.objects.exists()
+
+    def test_samples_are_recorded_with_plan(self, client: TestClient, sampler, token):
+        """Test that sampled queries are exposed by the staff endpoint and the
+        management command, with their query plan.
+
+        assert:
+            - The list_jobs query is sampled with its EXPLAIN output.
+            - GET /debug/slow-queries returns it to staff users.
+            - `slow_queries` reads the spooled samples.
+        """
+        from io import StringIO
+
+        from django.db import connection
+
+        from app.debug_api import router as debug_router
+
+        with connection.execute_wrapper(sampler.wrapper()):
+            client.get("/jobs?location=Remote")
+
+        list_queries = [s for s in sampler.samples if "app_job" in s["sql"]]
+        assert list_queries
+        assert any(sample["plan"] for sample in list_queries)
+
+        response = TestClient(debug_router).get(
+            "/slow-queries?limit=5", headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert 0 < len(data) <= 5
+        totals = [offender["total_ms"] for offender in data]
+        assert totals == sorted(totals, reverse=True)
+
+        out = StringIO()
+        call_command("slow_queries", "--json", stdout=out)
+        assert len(json.loads(out.getvalue())) > 0
+
+    def test_slow_queries_endpoint_requires_staff(self, create_user):
+        """Test that non-staff users can't read the samples."""
+        from app.debug_api import router as debug_router
+
+        create_user.is_staff = False
+        create_user.save()
+        response = TestClient(obtain_pair_router).post(
+            "/pair", json={"username": "testuser", "password": "testpassword"}
+        )
+        token = response.json()["access"]
+        response = TestClient(debug_router).get(
+            "/slow-queries", headers={"Authorization": f"Bearer {token}"}
+        )
+        assert response.status_code == 403
+
+
+class TestSQLiteProfile:
+    def test_apply_pragmas(self, settings, tmp_path):
+        """
+        Test the production pragmas on a new SQLite database.
+
+        assert:
+          - journal mode is WAL
+          - busy timeout and synchronous are set
+        """
+        import sqlite3
+
+        from app.sqlite import apply_pragmas
+
+        conn = sqlite3.connect(tmp_path / "db.sqlite3")
+        apply_pragmas(conn, settings.SQLITE_PRAGMAS)
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == (
+            settings.SQLITE_PRAGMAS["busy_timeout"]
+        )
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        conn.close()
+
+    @pytest.mark.django_db
+    def test_maintenance_intervals(self, settings):
+        """
+        Test that maintenance only runs when enabled and due.
+
+        assert:
+          - nothing runs without SQLITE_PRODUCTION
+          - nothing runs before the intervals elapse
+          - only the due checkpoint runs
+        """
+        from app.sqlite import run_maintenance
+
+        settings.SQLITE_PRODUCTION = False
+        assert run_maintenance(force=True) == {}
+
+        # PRAGMA optimize can't run inside the test transaction
+        settings.SQLITE_PRODUCTION = True
+        settings.SQLITE_OPTIMIZE_INTERVAL = 3600
+        settings.SQLITE_CHECKPOINT_INTERVAL = 3600
+        assert run_maintenance() == {}
+
+        settings.SQLITE_CHECKPOINT_INTERVAL = 0
+        results = run_maintenance()
+        assert list(results) == ["checkpoint"]
+        assert results["checkpoint"]["mode"] == "PASSIVE"
+
+
+class TestRequestProfiling:
+    @staticmethod
+    def profiled(request):
+        from django.http import HttpResponse
+
+        count = Job.objects.filter(location=request.GET["location"]).count()
+        return HttpResponse(str(count))
+
+    @pytest.mark.django_db
+    def test_staff_header_profiles_request(self, settings, tmp_path, token):
+        """
+        Test profiling a request with the staff header.
+
+        assert:
+          - the response carries the profile id
+          - the profile is listed with its endpoint and query parameters
+          - pstats and collapsed stacks can be downloaded
+          - a request without the header isn't profiled
+        """
+        import pstats
+
+        from django.test import RequestFactory
+
+        from app.debug_api import router as debug_router
+        from app.middleware import RequestProfilingMiddleware
+
+        settings.REQUEST_PROFILING_ENABLED = True
+        settings.REQUEST_PROFILING_DIR = str(tmp_path)
+        settings.REQUEST_PROFILING_INTERVAL_MS = 0.1
+        auth = {"Authorization": f"Bearer {token}"}
+        middleware = RequestProfilingMiddleware(self.profiled)
+
+        response = middleware(
+            RequestFactory().get(
+                "/api/v1/jobs?location=Remote", headers={"X-Profile": "1", **auth}
+            )
+        )
+        assert response.status_code == 200
+        profile_id = response["X-Profile-Id"]
+        response = middleware(
+            RequestFactory().get("/api/v1/jobs?location=Remote", headers=auth)
+        )
+        assert "X-Profile-Id" not in response
+
+        debug_client = TestClient(debug_router)
+        listed = debug_client.get("/profiles", headers=auth).json()
+        assert [profile["id"] for profile in listed] == [profile_id]
+        assert listed[0]["endpoint"] == "GET /api/v1/jobs"
+        assert listed[0]["query"] == {"location": "Remote"}
+        assert listed[0]["trigger"] == "header"
+
+        response = debug_client.get(f"/profiles/{profile_id}/pstats", headers=auth)
+        assert response.status_code == 200
+        stats = pstats.Stats(str(tmp_path / f"{profile_id}.pstats"))
+        assert any(func[2] == "profiled" for func in stats.stats)
+
+        response = debug_client.get(f"/profiles/{profile_id}/collapsed", headers=auth)
+        assert response.status_code == 200
+        collapsed = (tmp_path / f"{profile_id}.collapsed").read_text()
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in collapsed.splitlines())
+
+        response = debug_client.get("/profiles/..%2F..%2Fsecret/pstats", headers=auth)
+        assert response.status_code == 404
+
+    @pytest.mark.django_db
+    def test_profiles_are_bounded(self, settings, tmp_path):
+        """
+        Test that sampled profiles are triggered without staff and capped.
+
+        assert:
+          - anonymous requests are profiled at sample rate 1
+          - only REQUEST_PROFILING_MAX_FILES profiles are kept
+        """
+        from django.test import RequestFactory
+
+        from app.middleware import RequestProfilingMiddleware
+
+        settings.REQUEST_PROFILING_ENABLED = True
+        settings.REQUEST_PROFILING_DIR = str(tmp_path)
+        settings.REQUEST_PROFILING_SAMPLE_RATE = 1.0
+        settings.REQUEST_PROFILING_MAX_FILES = 2
+        middleware = RequestProfilingMiddleware(self.profiled)
+
+        for _ in range(4):
+            response = middleware(RequestFactory().get("/jobs?location=Remote"))
+            assert "X-Profile-Id" in response
+        assert len(list(tmp_path.glob("*.json"))) == 2
+        assert len(list(tmp_path.glob("*.pstats"))) == 2
+
+
+class TestStaticSnapshots:
+    @pytest.mark.django_db
+    def test_publish_matches_api(self, client, settings, tmp_path):
+        """
+        Test publishing the popular listings.
+
+        assert:
+          - snapshots are byte-for-byte the JSON of GET /jobs
+          - every snapshot has a gzip sibling
+          - an incremental run without changes writes nothing
+        """
+        import gzip
+
+        from app.snapshots import Publisher
+
+        settings.STATIC_SNAPSHOT_LOCATIONS = 2
+        publisher = Publisher(tmp_path)
+        written, removed = publisher.publish()
+        assert written > 0 and removed == 0
+
+        jobs_dir = tmp_path / "jobs"
+        for query in ["", "page=2", "status=active"]:
+            name = f"{query or 'index'}.json"
+            snapshot = json.loads((jobs_dir / name).read_bytes())
+            assert snapshot == client.get(f"/jobs?{query}").json()
+            assert (
+                gzip.decompress((jobs_dir / f"{name}.gz").read_bytes())
+                == (jobs_dir / name).read_bytes()
+            )
+
+        assert publisher.publish(incremental=True) == (0, 0)
+
+    @pytest.mark.django_db
+    def test_incremental_publish_only_affected(self, settings, tmp_path):
+        """
+        Test that an incremental run only rewrites affected listings.
+
+        assert:
+          - the listings of the changed job's location are rewritten
+          - the other locations are untouched
+        """
+        from urllib.parse import urlencode
+
+        from app.snapshots import Publisher, popular_listings
+
+        settings.STATIC_SNAPSHOT_LOCATIONS = 3
+        publisher = Publisher(tmp_path)
+        publisher.publish()
+        locations = [p["location"] for p in popular_listings() if "location" in p]
+        manifest = publisher.load_manifest()
+        untouched = {
+            path: path.stat().st_mtime_ns for path in (tmp_path / "jobs").glob("*.json")
+        }
+
+        job = Job.objects.filter(location=locations[0]).order_by("-posting_date")[0]
+        job.title = "Snapshot Engineer"
+        job.save()
+
+        written, _ = publisher.publish(incremental=True)
+        assert written > 0
+        changed = {
+            path.name
+            for path, mtime in untouched.items()
+            if path.stat().st_mtime_ns != mtime
+        }
+        assert changed
+        prefix = urlencode({"location": locations[0]})
+        for name in changed:
+            assert "location=" not in name or name.startswith(prefix)
+        assert publisher.load_manifest()["watermark"] > manifest["watermark"]
+
+    @pytest.mark.django_db
+    def test_publish_refreshes_statuses(self, tmp_path):
+        """
+        Test publishing a job whose status is due to change with the date.
+
+        assert:
+          - an incremental run sweeps the statuses like list_jobs does
+          - the job counts as changed and is published with its new status
+        """
+        from app.snapshots import Publisher
+
+        publisher = Publisher(tmp_path)
+        publisher.publish()
+        job = Job.objects.order_by("-posting_date", "-id")[0]
+        Job.objects.filter(id=job.id).update(status="ACTIVE")
+
+        publisher.publish(incremental=True)
+        assert Job.objects.get(id=job.id).status == "expired"
+        index = json.loads((tmp_path / "jobs" / "index.json").read_bytes())
+        assert index["items"][0] == {
+            **index["items"][0],
+            "id": job.id,
+            "status": "expired",
+        }
+
+
+class TestJobViews:
+    @pytest.mark.django_db
+    def test_views_are_buffered(self, client, settings, django_assert_num_queries):
+        """
+        Test that job views are counted in memory and flushed in batches.
+
+        assert:
+          - views aren't written before the flush interval
+          - one UPDATE per distinct count on flush
+          - views and popularity are incremented
+        """
+        from app.counters import view_counter
+
+        settings.JOB_VIEW_FLUSH_INTERVAL = 3600
+        view_counter.flush()
+        job_ids = list(Job.objects.order_by("id").values_list("id", flat=True)[:3])
+        for job_id, views in zip(job_ids, [2, 2, 5]):
+            for _ in range(views):
+                assert client.get(f"/jobs/{job_id}").status_code == 200
+        assert (
+            sum(Job.objects.filter(id__in=job_ids).values_list("views", flat=True)) == 0
+        )
+
+        with django_assert_num_queries(2):
+            assert view_counter.flush() == 3
+        jobs = Job.objects.in_bulk(job_ids)
+        assert [jobs[job_id].views for job_id in job_ids] == [2, 2, 5]
+        assert jobs[job_ids[2]].popularity > jobs[job_ids[0]].popularity > 0
+
+    @pytest.mark.django_db
+    def test_save_keeps_flushed_views(self, client, settings):
+        """
+        Test saving a job loaded before its views were flushed.
+
+        assert:
+          - the saved fields are written
+          - the views and popularity flushed meanwhile are kept
+        """
+        from app.counters import view_counter
+
+        settings.JOB_VIEW_FLUSH_INTERVAL = 3600
+        view_counter.flush()
+        job = Job.objects.order_by("id").first()
+        views = job.views
+        assert client.get(f"/jobs/{job.id}").status_code == 200
+        view_counter.flush()
+        popularity = Job.objects.get(id=job.id).popularity
+
+        job.title = "Saved Later"
+        job.save()
+        job = Job.objects.get(id=job.id)
+        assert job.title == "Saved Later"
+        assert (job.views, job.popularity) == (views + 1, popularity)
+
+    @pytest.mark.django_db
+    def test_order_by_popularity(self, client):
+        """
+        Test ordering jobs by their decayed view score.
+
+        assert:
+          - recent views outrank more but older views
+          - the most viewed jobs come first
+        """
+        from app.counters import view_score
+
+        old, recent = Job.objects.order_by("id").values_list("id", flat=True)[:2]
+        now = timezone_now().timestamp()
+        Job.objects.filter(id=old).update(
+            views=8, popularity=view_score(8, now - 30 * 86400)
+        )
+        Job.objects.filter(id=recent).update(views=1, popularity=view_score(1, now))
+
+        response = client.get("/jobs?order_by=-popularity")
+        assert response.status_code == 200
+        assert [job["id"] for job in response.json()["items"][:2]] == [recent, old]
+
+    @pytest.mark.django_db
+    def test_far_from_epoch(self, client, settings, monkeypatch):
+        """
+        Test that views decades after the popularity epoch are still counted.
+
+        assert:
+          - the flush doesn't overflow with a short half-life
+          - views add up in log2 space
+          - later views outrank the same number of earlier ones
+        """
+        import math
+        import time
+
+        from app.counters import POPULARITY_EPOCH, view_counter, view_score
+
+        settings.JOB_VIEW_FLUSH_INTERVAL = 3600
+        settings.JOB_POPULARITY_HALF_LIFE_DAYS = 1
+        view_counter.flush()
+        first, second = Job.objects.order_by("id").values_list("id", flat=True)[:2]
+        later = POPULARITY_EPOCH + 40 * 365 * 86400
+
+        monkeypatch.setattr(time, "time", lambda: later)
+        for job_id in (first, first, second):
+            assert client.get(f"/jobs/{job_id}").status_code == 200
+        view_counter.flush()
+        assert client.get(f"/jobs/{first}").status_code == 200
+        view_counter.flush()
+        monkeypatch.setattr(time, "time", lambda: later + 2 * 86400)
+        for _ in range(3):
+            assert client.get(f"/jobs/{second}").status_code == 200
+        view_counter.flush()
+        monkeypatch.undo()
+
+        jobs = Job.objects.in_bulk([first, second])
+        assert jobs[first].views == 3
+        assert math.isclose(jobs[first].popularity, view_score(3, later))
+        assert math.isclose(
+            jobs[second].popularity,
+            math.log2(2**-2 + 3) + view_score(1, later + 2 * 86400),
+        )
+        response = client.get("/jobs?order_by=-popularity")
+        assert [job["id"] for job in response.json()["items"][:2]] == [second, first]
+
+
+class TestTrends:
+    @staticmethod
+    def expected_weekly(dimension, value):
+        from collections import Counter
+        from datetime import timedelta
+
+        from app.models import parse_skills
+
+        counts = Counter()
+        for job in Job.objects.all():
+            values = (
+                parse_skills(job.required_skills)
+                if dimension == "skill"
+                else [job.location]
+            )
+            if value in values:
+                monday = job.posting_date - timedelta(days=job.posting_date.weekday())
+                counts[monday.isoformat()] += 1
+        return dict(counts)
+
+    @pytest.mark.django_db
+    def test_rebuild_matches_jobs(self, client):
+        """
+        Test the rebuilt rollups against counts over the jobs table.
+
+        assert:
+          - weekly skill and location counts match a full scan
+          - daily counts sum to the number of jobs
+        """
+        from app.trends import rebuild
+
+        rebuild(chunk_size=37)
+        skill = Job.objects.first().required_skills.split(",")[0].strip()
+        location = Job.objects.first().location
+        for dimension, value in (("skill", skill), ("location", location)):
+            response = client.get(
+                f"/jobs/analytics/trends?dimension={dimension}&value={value}"
+            )
+            assert response.status_code == 200
+            series = {point["bucket"]: point["count"] for point in response.json()}
+            assert series == self.expected_weekly(dimension, value)
+
+        response = client.get("/jobs/analytics/trends?dimension=location&period=day")
+        assert sum(point["count"] for point in response.json()) == Job.objects.count()
+
+    @pytest.mark.django_db
+    def test_rollups_follow_job_writes(self, client, existing_job, token):
+        """
+        Test that creates, PATCHes and deletes keep the rollups in sync.
+
+        assert:
+          - a PATCH of the skills moves the job between skill rollups
+          - a delete removes it
+          - the rollups still match a rebuild
+        """
+        from app.models import JobTrend
+        from app.trends import rebuild
+
+        rebuild()
+
+        def snapshot():
+            return set(
+                JobTrend.objects.filter(job_count__gt=0).values_list(
+                    "period", "dimension", "value", "bucket", "status", "job_count"
+                )
+            )
+
+        response = client.patch(
+            f"/jobs/{existing_job.id}",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"required_skills": "Trendology", "location": "Trend City"},
+        )
+        assert response.status_code == 200
+        response = client.get(
+            "/jobs/analytics/trends?dimension=skill&value=Trendology&period=day"
+        )
+        assert response.json() == [
+            {
+                "value": "Trendology",
+                "bucket": existing_job.posting_date.isoformat(),
+                "count": 1,
+            }
+        ]
+
+        job = Job.objects.get(id=existing_job.id)
+        job.required_skills = "Trendology,Python"
+        job.save()
+        other = Job.objects.exclude(id=existing_job.id).first()
+        other.delete()
+
+        incremental = snapshot()
+        rebuild()
+        assert incremental == snapshot()
+
+
+class TestSavedSearchAlerts:
+    @pytest.fixture(autouse=True)
+    def alerts(self, settings):
+        settings.SAVED_SEARCH_ALERTS_ENABLED = True
+
+    @pytest.mark.django_db
+    def test_percolator_matches_list_jobs(
+        self, client, token, create_user, today, django_capture_on_commit_callbacks
+    ):
+        """
+        Test matching new jobs against saved searches.
+
+        assert:
+          - a new active job is matched against exactly the saved searches
+            whose filters GET /jobs would list it with
+          - its matches are listed by the saved search endpoint
+        """
+        from app.api import filter_jobs
+        from app.models import SavedSearch, SavedSearchMatch
+        from app.percolator import reset_percolator
+        from app.schemas import JobListFilters
+
+        auth = {"Authorization": f"Bearer {token}"}
+        rng = random.Random(38)
+        locations = ["Remote", "Taipei", "London, UK"]
+        skills = ["python", "Django", "go", "React", "ml"]
+        for i in range(200):
+            filters = {}
+            if rng.random() < 0.4:
+                filters["location"] = rng.choice(locations)
+            if rng.random() < 0.5:
+                filters["required_skills"] = rng.choice(skills)
+            if rng.random() < 0.4:
+                filters["salary_gte"] = str(rng.choice([30000, 50000, 70000]))
+            if rng.random() < 0.3:
+                filters["salary_lte"] = str(rng.choice([60000, 90000]))
+            if rng.random() < 0.5:
+                filters["status"] = rng.choice(["active", "expired"])
+            if rng.random() < 0.2:
+                filters["posting_date__lte"] = today.isoformat()
+            response = client.post(
+                "/saved-searches", headers=auth, json={"filters": filters}
+            )
+            assert response.status_code == 201
+        reset_percolator()
+
+        payload = {
+            "title": "Percolated Job",
+            "desc": "This job should trigger saved search alerts.",
+            "location": "Remote",
+            "salary_range": "50000~70000",
+            "company_name": "Alert Company",
+            "posting_date": today.isoformat(),
+            "expiration_date": date.fromordinal(today.toordinal() + 30).isoformat(),
+            "required_skills": "Python, Django",
+        }
+        with django_capture_on_commit_callbacks(execute=True):
+            response = client.post("/jobs", headers=auth, json=payload)
+        job_id = response.json()["id"]
+
+        expected = {
+            search.id
+            for search in SavedSearch.objects.all()
+            if filter_jobs(JobListFilters(**search.filters), "-posting_date")
+            .filter(id=job_id)
+            .exists()
+        }
+        matched = set(
+            SavedSearchMatch.objects.filter(job_id=job_id).values_list(
+                "saved_search_id", flat=True
+            )
+        )
+        assert expected and matched == expected
+
+        search_id = next(iter(matched))
+        response = client.get(f"/saved-searches/{search_id}/matches", headers=auth)
+        assert response.json()["items"][0]["id"] == job_id
+
+    @pytest.mark.django_db
+    def test_deliver_alerts(
+        self,
+        client,
+        token,
+        existing_job,
+        django_capture_on_commit_callbacks,
+        mailoutbox,
+        monkeypatch,
+    ):
+        """
+        Test delivering queued matches by email.
+
+        assert:
+          - an expired job turned active through PATCH is matched
+          - a failed send leaves the matches pending
+          - one email per user, matches are marked delivered
+          - matches of deleted jobs are marked without being sent
+          - a second run delivers nothing
+        """
+        from io import StringIO
+
+        from app.management.commands import deliver_search_alerts
+        from app.models import SavedSearchMatch
+        from app.percolator import reset_percolator
+
+        auth = {"Authorization": f"Bearer {token}"}
+        Job.objects.filter(id=existing_job.id).update(status="expired")
+        client.post(
+            "/saved-searches",
+            headers=auth,
+            json={"name": "Anything", "filters": {"status": "active"}},
+        )
+        reset_percolator()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            client.patch(
+                f"/jobs/{existing_job.id}",
+                headers=auth,
+                json={"posting_date": "2020-01-01", "expiration_date": "2099-01-01"},
+            )
+        match = SavedSearchMatch.objects.get(job_id=existing_job.id)
+        deleted = Job.objects.exclude(id=existing_job.id).first()
+        SavedSearchMatch.objects.create(saved_search=match.saved_search, job=deleted)
+        deleted.delete()
+
+        out = StringIO()
+        with monkeypatch.context() as patch:
+
+            def send_mass_mail(messages):
+                raise ConnectionRefusedError
+
+            patch.setattr(deliver_search_alerts, "send_mass_mail", send_mass_mail)
+            with pytest.raises(ConnectionRefusedError):
+                call_command("deliver_search_alerts", stdout=out)
+        assert SavedSearchMatch.objects.filter(delivered_at__isnull=True).count() == 2
+
+        call_command("deliver_search_alerts", stdout=out)
+        assert len(mailoutbox) == 1
+        assert mailoutbox[0].to == ["testuser@mail.com"]
+        assert (
+            mailoutbox[0].body
+            == f"[{match.saved_search}] {match.job} ({match.job.location})"
+        )
+        assert not SavedSearchMatch.objects.filter(delivered_at__isnull=True).exists()
+
+        call_command("deliver_search_alerts", stdout=out)
+        assert len(mailoutbox) == 1
+
+
+class TestSimilarJobs:
+    @pytest.mark.django_db
+    def test_similar_matches_brute_force(self, existing_job, tmp_path):
+        """
+        Test the sparse index against a dense cosine similarity.
+
+        assert:
+          - the top neighbours and their scores match a brute-force ranking
+        """
+        import numpy as np
+
+        from app.similar import FIELDS, N_FEATURES, build_index, term_weights, vectorize
+
+        index = build_index(tmp_path / "similar.npz")
+        rows = list(Job.objects.order_by("id").values(*FIELDS))
+        dense = np.zeros((len(rows), N_FEATURES), dtype=np.float32)
+        for i, row in enumerate(rows):
+            features, values = vectorize(
+                term_weights(row["title"], row["desc"], row["required_skills"]),
+                index.idf,
+            )
+            dense[i, features] = values
+        position = [row["id"] for row in rows].index(existing_job.id)
+        scores = dense @ dense[position]
+        scores[position] = -1
+        expected = sorted(
+            ((rows[i]["id"], scores[i]) for i in range(len(rows)) if scores[i] > 0),
+            key=lambda item: (-item[1], item[0]),
+        )[:5]
+
+        result = index.similar(existing_job.id, 5)
+        assert [job_id for job_id, _ in result] == [job_id for job_id, _ in expected]
+        assert np.allclose([s for _, s in result], [s for _, s in expected], atol=1e-5)
+
+    @pytest.mark.django_db
+    def test_similar_endpoint_sees_new_jobs(
+        self, client, settings, existing_job, tmp_path
+    ):
+        """
+        Test GET /jobs/{id}/similar with jobs written after the build.
+
+        assert:
+          - without a built index the endpoint answers 503 and builds none
+          - a copy of a job created after the build is its best match, past
+            the cached results of the job
+          - results are ordered by score
+          - unknown jobs return 404
+        """
+        from app.similar import build_index, reset_similar_jobs
+
+        settings.SIMILAR_JOBS_INDEX_PATH = str(tmp_path / "similar.npz")
+        settings.SIMILAR_JOBS_REFRESH_INTERVAL = 0
+        reset_similar_jobs()
+        assert client.get(f"/jobs/{existing_job.id}/similar").status_code == 503
+        assert not (tmp_path / "similar.npz").exists()
+
+        build_index()
+        response = client.get(f"/jobs/{existing_job.id}/similar?limit=5")
+        assert response.status_code == 200
+        copy = Job.objects.create(
+            title=existing_job.title,
+            desc=existing_job.desc,
+            location=existing_job.location,
+            salary_range=existing_job.salary_range,
+            company_name=existing_job.company_name,
+            posting_date=existing_job.posting_date,
+            expiration_date=existing_job.expiration_date,
+            required_skills=existing_job.required_skills,
+        )
+        response = client.get(f"/jobs/{existing_job.id}/similar?limit=5")
+        assert response.status_code == 200
+        data = response.json()
+        assert data[0]["id"] == copy.id
+        assert data[0]["score"] == pytest.approx(1.0, abs=1e-5)
+        assert [job["score"] for job in data] == sorted(
+            (job["score"] for job in data), reverse=True
+        )
+
+        assert client.get("/jobs/999999/similar").status_code == 404
+        reset_similar_jobs()
+
+
+class TestGeoSearch:
+    @pytest.mark.django_db
+    def test_geocoding(self, client, token, existing_job):
+        """
+        Test geocoding of job locations.
+
+        assert:
+          - locations resolve through aliases and trailing parts
+          - remote keywords set the remote flag, unknown places stay empty
+          - created and patched jobs store their coordinates and geohash
+        """
+        from app.geo import encode, geocode
+
+        assert geocode("Austin, TX, USA") == (30.2672, -97.7431, False)
+        assert geocode("台北市") == geocode("Taipei")
+        assert geocode("Remote") == (None, None, True)
+        assert geocode("Remote, Europe") == (None, None, True)
+        assert geocode("Atlantis") == (None, None, False)
+        assert encode(52.52, 13.405) == "u33dc0cp"
+        assert encode(40.7128, -74.006, 6) == "dr5reg"
+
+        job = Job.objects.create(
+            title="Geo Test Job",
+            desc="A job to test geocoding.",
+            location="Potsdam, Germany",
+            company_name="Geo Corp",
+            salary_range="50000~70000",
+            expiration_date=existing_job.expiration_date,
+        )
+        assert (job.latitude, job.longitude, job.remote) == (52.3906, 13.0645, False)
+        assert job.geo_cell == encode(52.3906, 13.0645)
+
+        response = client.patch(
+            f"/jobs/{job.id}",
+            json={"location": "Remote"},
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        assert response.status_code == 200
+        job.refresh_from_db()
+        assert (job.latitude, job.remote, job.geo_cell) == (None, True, "")
+
+    @pytest.mark.django_db
+    def test_geo_filters_match_brute_force(self, client, existing_job):
+        """
+        Test radius and bounding box filters against a brute-force scan.
+
+        assert:
+          - list_jobs returns exactly the jobs within the haversine distance
+          - bounding boxes, also across the antimeridian, match exactly
+          - the percolator agrees with list_jobs on every job
+        """
+        from app.geo import geocode_jobs, haversine
+        from app.percolator import JOB_FIELDS, compile_filters, matches
+
+        geocode_jobs(Job.objects.all())
+        for location in ["Potsdam", "Leipzig", "Hamburg", "Auckland", "Tokyo"]:
+            Job.objects.create(
+                title=f"Job in {location}",
+                desc="A job to test the geo filters.",
+                location=location,
+                company_name="Geo Corp",
+                salary_range="50000~70000",
+                expiration_date=existing_job.expiration_date,
+            )
+        jobs = list(Job.objects.values(*JOB_FIELDS))
+
+        def within(job, lat, lon, km):
+            return (
+                job["latitude"] is not None
+                and haversine(lat, lon, job["latitude"], job["longitude"]) <= km
+            )
+
+        cases = [
+            (
+                {"near": "Berlin", "radius_km": 30},
+                lambda j: within(j, 52.52, 13.405, 30),
+            ),
+            (
+                {"near": "Berlin", "radius_km": 200},
+                lambda j: within(j, 52.52, 13.405, 200),
+            ),
+            ({"near": "Berlin"}, lambda j: within(j, 52.52, 13.405, 50)),
+            (
+                {"lat": 51.0, "lon": 0.0, "radius_km": 800},
+                lambda j: within(j, 51.0, 0.0, 800),
+            ),
+            (
+                {"bbox": "-10,45,14,55"},
+                lambda j: j["latitude"] is not None
+                and 45 <= j["latitude"] <= 55
+                and -10 <= j["longitude"] <= 14,
+            ),
+            (
+                {"bbox": "170,-50,145,50"},
+                lambda j: j["latitude"] is not None
+                and -50 <= j["latitude"] <= 50
+                and not 145 < j["longitude"] < 170,
+            ),
+            ({"remote": "true"}, lambda j: j["remote"]),
+        ]
+        for params, expected in cases:
+            response = client.get("/jobs", query_params={**params, "page_size": 500})
+            assert response.status_code == 200, params
+            data = response.json()
+            ids = {job["id"] for job in data["items"]}
+            assert data["count"] == len(ids)
+            assert ids == {job["id"] for job in jobs if expected(job)}, params
+
+            filters = compile_filters(
+                {**params, "remote": True} if "remote" in params else params
+            )
+            assert {
+                job["id"]
+                for job in jobs
+                if matches(filters, {**job, "folded_skills": job["required_skills"]})
+            } == ids
+
+    @pytest.mark.django_db
+    def test_geo_filters_validation(self, client):
+        """
+        Test GET /jobs with invalid geo filters.
+
+        assert:
+          - unknown places, lone lat/lon, radius without center and bad boxes
+            return 422
+        """
+        for query in [
+            "near=Atlantis",
+            "lat=52.5",
+            "radius_km=10",
+            "near=Berlin&lat=52.5&lon=13.4",
+            "bbox=1,2,3",
+            "bbox=0,50,10,40",
+            "lat=100&lon=0",
+        ]:
+            assert client.get(f"/jobs?{query}").status_code == 422, query
+
+
+class TestLoadTest:
+    def test_replay_and_stats(self):
+        """
+        Test replaying an access log through the load test runner.
+
+        assert:
+          - only GET requests are replayed, once each without --loop
+          - scenarios are named by route
+          - 5xx responses count as errors and lock errors are detected
+        """
+        from django.db import OperationalError
+
+        from app.loadtest import Replay, parse_access_log, run
+
+        log = [
+            '1.2.3.4 - - [19/Oct/2026:10:00:00 +0000] "GET /api/v1/jobs?page=2 '
+            'HTTP/1.1" 200 512 "-" "curl/8.0"',
+            '1.2.3.4 - - [19/Oct/2026:10:00:01 +0000] "GET /api/v1/jobs/12 HTTP/1.1" '
+            "200 512",
+            '1.2.3.4 - - [19/Oct/2026:10:00:02 +0000] "POST /api/v1/jobs HTTP/1.1" '
+            "201 64",
+            '1.2.3.4 - - [19/Oct/2026:10:00:03 +0000] "GET /api/v1/jobs/13 HTTP/1.1" '
+            "500 64",
+        ]
+
+        class Target:
+            def request(self, method, path, body=b"", headers=None):
+                if path.endswith("/13"):
+                    return 500, b"", [OperationalError("database is locked")]
+                return 200, b"[]", []
+
+        requests = parse_access_log(log)
+        assert [method for method, _ in requests] == ["GET"] * 3
+        stats, elapsed = run(Target(), Replay(requests), users=2, duration=5)
+        rows = {row["scenario"]: row for row in stats.summary(elapsed)}
+        assert rows["GET /api/v1/jobs"]["requests"] == 1
+        assert rows["GET /api/v1/jobs/{id}"]["requests"] == 2
+        assert rows["GET /api/v1/jobs/{id}"]["errors"] == 1
+        assert rows["GET /api/v1/jobs/{id}"]["lock_errors"] == 1
+        assert rows["total"]["requests"] == 3
+        assert rows["total"]["error_rate"] == pytest.approx(1 / 3, abs=1e-4)
+
+    @pytest.mark.django_db
+    def test_workload_mix(self):
+        """
+        Test the weighted request mix.
+
+        assert:
+          - requests are drawn from the weighted scenarios only
+          - writes require the credentials of a user
+        """
+        import random
+
+        from app.loadtest import Workload
+
+        workload = Workload({"list": 1, "detail": 1, "search": 0})
+        rng = random.Random(0)
+        requests = [workload(rng) for _ in range(50)]
+        assert {request["scenario"] for request in requests} == {"list", "detail"}
+        assert all(request["path"].startswith("/api/v1/jobs") for request in requests)
+        with pytest.raises(ValueError):
+            Workload({"write": 1})
+
+
+class TestSearchIndex:
+    @pytest.mark.django_db
+    def test_search_matches_icontains(self, existing_job):
+        """
+        Test the trigram search against the plain icontains scan.
+
+        assert:
+          - CJK, mixed-script, case-varied, short and absent terms return
+            exactly the jobs of the icontains filter
+        """
+        from app.search import contains_q, search_q
+
+        texts = [
+            ("資深後端工程師 (Python)", "負責台積電新竹廠的製程資料平台。", "台積電"),
+            ("前端工程師", "React 與 TypeScript，遠端工作 100%。", "聯發科技"),
+            ("數據分析師_Data Analyst", "熟悉 SQL、Python 與機器學習。", "Appier 沛星"),
+        ]
+        for title, desc, company_name in texts:
+            Job.objects.create(
+                title=title,
+                desc=desc,
+                company_name=company_name,
+                location="台北市",
+                salary_range="50000~70000",
+                expiration_date=existing_job.expiration_date,
+            )
+        terms = [
+            "工程師",
+            "後端工程",
+            "台積",
+            "新竹廠的製程",
+            "PYTHON",
+            "python)",
+            "sql、python",
+            "100%",
+            "_data",
+            "Ap",
+            "遠",
+            "ab",
+            "聯發科技股份有限公司",
+            existing_job.title[2:9],
+            existing_job.company_name.upper(),
+        ]
+        for term in terms:
+            expected = set(Job.objects.filter(contains_q(term)).values_list("id"))
+            assert (
+                set(Job.objects.filter(search_q(term)).values_list("id")) == expected
+            ), term
+
+    @pytest.mark.django_db
+    def test_index_follows_writes(self, client, token, existing_job):
+        """
+        Test the search index on job writes.
+
+        assert:
+          - created jobs are found by their text
+          - PATCH and PUT replace the grams of the changed text
+          - deleting a job removes its grams
+        """
+        from app.models import JobSearchGram, search_grams
+
+        auth = {"Authorization": f"Bearer {token}"}
+
+        def found(term):
+            response = client.get("/jobs", query_params={"search": term})
+            return {job["id"] for job in response.json()["items"]}
+
+        job = Job.objects.create(
+            title="雲端架構師",
+            desc="規劃與維運公司的雲端基礎設施。",
+            company_name="新創公司",
+            location="台北市",
+            salary_range="50000~70000",
+            expiration_date=existing_job.expiration_date,
+        )
+        assert job.id in found("端架構")
+
+        response = client.patch(
+            f"/jobs/{job.id}", json={"title": "資安工程師"}, headers=auth
+        )
+        assert response.status_code == 200
+        assert job.id not in found("端架構")
+        assert job.id in found("資安工")
+
+        response = client.put(
+            f"/jobs/{job.id}", json={"desc": "負責滲透測試與弱點掃描。"}, headers=auth
+        )
+        assert response.status_code == 200
+        assert job.id in found("弱點掃")
+        assert job.id not in found("基礎設施")
+        assert set(
+            JobSearchGram.objects.filter(job=job).values_list("gram", flat=True)
+        ) == search_grams("資安工程師", "負責滲透測試與弱點掃描。", "新創公司")
+
+        Job.objects.get(id=job.id).hard_delete()
+        assert not JobSearchGram.objects.filter(job_id=job.id).exists()
+
+
+class TestStartup:
+    @pytest.mark.django_db
+    def test_warm_up(self, settings, caplog):
+        """
+        Test the warm-up of the server processes.
+
+        assert:
+          - every step runs and is timed
+          - the warm-up requests reach the views and fill the list cache
+          - the warm-up requests don't run list_jobs' status sweep
+          - a failing step is logged without stopping the others
+        """
+        from django.core.cache import cache
+        from django.core.signals import request_finished, request_started
+        from django.db import close_old_connections
+
+        from app.startup import WARMUP_STEPS, warm_up
+
+        settings.JOB_LIST_CACHE_ENABLED = True
+        settings.SERVER_WARMUP_PATHS = ["/api/v1/jobs"]
+        cache.clear()
+        job = Job.objects.filter(expiration_date__lt=timezone_now()).first()
+        Job.objects.filter(id=job.id).update(status="ACTIVE")
+        # Like the test client, keep the test database connection open
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        try:
+            timings = warm_up()
+        finally:
+            request_started.connect(close_old_connections)
+            request_finished.connect(close_old_connections)
+        assert list(timings) == list(WARMUP_STEPS)
+        assert any(":jobs:list:" in key for key in cache._cache)
+        assert "Warm-up request" not in caplog.text
+        assert Job.objects.get(id=job.id).status == "ACTIVE"
+        assert TestClient(jobs_router).get("/jobs").status_code == 200
+        assert Job.objects.get(id=job.id).status == "expired"
+
+        settings.SERVER_WARMUP_PATHS = ["/api/v1/no-such-path"]
+        timings = warm_up(["urls", "connections"])
+        assert list(timings) == ["connections"]
+        assert "Warm-up step urls failed" in caplog.text
+
+    def test_parse_importtime(self):
+        """
+        Test parsing `python -X importtime` output.
+
+        assert:
+          - modules are read with their depth and times
+          - packages add up the own time of their modules
+        """
+        from app.startup import importtime_summary, parse_importtime
+
+        output = "\n".join(
+            [
+                "import time: self [us] | cumulative | imported package",
+                "import time:       300 |        300 |     django.utils",
+                "import time:       200 |        500 |   django.conf",
+                "import time:       100 |        600 | django",
+                "import time:        50 |         50 | ninja",
+                "some other line",
+            ]
+        )
+        imports = parse_importtime(output)
+        assert [(entry["module"], entry["depth"]) for entry in imports] == [
+            ("django.utils", 2),
+            ("django.conf", 1),
+            ("django", 0),
+            ("ninja", 0),
+        ]
+        summary = importtime_summary(imports, limit=1)
+        assert summary["total_us"] == 650
+        assert summary["modules"] == 4
+        assert summary["packages"] == [{"package": "django", "self_us": 600}]
+        assert summary["slowest"][0]["module"] == "django.utils"
+
+
+class TestJobAdmin:
+    @staticmethod
+    def changelist(create_user, **params):
+        from django.contrib import admin
+        from django.test import RequestFactory
+
+        request = RequestFactory().get("/admin/app/job/", params)
+        request.user = create_user
+        return admin.site._registry[Job].get_changelist_instance(request)
+
+    @pytest.mark.django_db
+    def test_changelist(self, create_user, settings, django_assert_max_num_queries):
+        """
+        Test the job changelist on a large table.
+
+        assert:
+          - counts above ADMIN_EXACT_COUNT_LIMIT are estimated, not counted
+          - the search goes through the search index, ids are matched too
+          - the description isn't loaded by the list
+        """
+        settings.ADMIN_EXACT_COUNT_LIMIT = 20
+        changelist = self.changelist(create_user)
+        assert changelist.result_count >= Job.objects.count()
+        assert changelist.full_result_count is None
+        assert all(
+            "desc" in job.get_deferred_fields() for job in changelist.result_list
+        )
+
+        active = Job.objects.filter(status="active").count()
+        changelist = self.changelist(create_user, status="active")
+        assert changelist.result_count == min(active, 21)
+
+        job = Job.objects.get(pk=7)
+        expected = set(
+            Job.objects.filter(title__icontains=job.title[:4]).values_list(
+                "id", flat=True
+            )
+        )
+        changelist = self.changelist(create_user, q=job.title[:4])
+        assert changelist.result_count == len(expected)
+        changelist = self.changelist(create_user, q="7")
+        assert 7 in {job.id for job in changelist.result_list}
+
+    @pytest.mark.django_db
+    def test_actions_keep_derived_data(self, create_user, existing_job):
+        """
+        Test the set-based admin actions and deletes.
+
+        assert:
+          - expire and reactivate update the statuses, dates and versions
+          - the company counters and the trend rollups still match a rebuild
+          - archiving soft deletes the jobs
+        """
+        from django.contrib import admin
+        from django.contrib.messages.storage.fallback import FallbackStorage
+        from django.test import RequestFactory
+
+        from app.models import Company, JobTrend
+        from app.trends import rebuild
+
+        model_admin = admin.site._registry[Job]
+        request = RequestFactory().post("/admin/app/job/")
+        request.user = create_user
+        request.session = {}
+        request._messages = FallbackStorage(request)
+
+        def derived():
+            return (
+                set(
+                    Company.objects.values_list(
+                        "id", "active_job_count", "total_job_count"
+                    )
+                ),
+                set(
+                    JobTrend.objects.filter(job_count__gt=0).values_list(
+                        "period", "dimension", "value", "bucket", "status", "job_count"
+                    )
+                ),
+            )
+
+        rebuild()
+        Company.recount()
+        jobs = Job.objects.filter(status="active")[:5]
+        ids = [job.id for job in jobs]
+        versions = dict(Job.objects.filter(id__in=ids).values_list("id", "version"))
+
+        model_admin.expire_jobs(request, Job.objects.filter(id__in=ids))
+        assert set(Job.objects.filter(id__in=ids).values_list("status", flat=True)) == {
+            "expired"
+        }
+        assert all(
+            job.expiration_date < date.today() and job.version == versions[job.id] + 1
+            for job in Job.objects.filter(id__in=ids)
+        )
+        incremental = derived()
+        rebuild()
+        Company.recount()
+        assert incremental == derived()
+
+        model_admin.reactivate_jobs(request, Job.objects.filter(id__in=ids))
+        assert all(
+            job.status == job.compute_status() == "active"
+            for job in Job.objects.filter(id__in=ids)
+        )
+        model_admin.archive_jobs(request, Job.objects.filter(id__in=ids[:2]))
+        assert not Job.objects.filter(id__in=ids[:2]).exists()
+        assert Job.all_objects.filter(id__in=ids[:2]).count() == 2
+        incremental = derived()
+        rebuild()
+        Company.recount()
+        assert incremental == derived()
+
+
+class TestRateLimit:
+    def test_token_buckets(self, settings):
+        """
+        Test the token buckets of the clients.
+
+        assert:
+          - requests are refused with the seconds until enough tokens refill
+          - clients have their own buckets
+          - costs over the burst are capped, a full bucket lets them through
+          - shared buckets take off the tokens taken by other processes
+        """
+        from django.core.cache import cache
+
+        from app.ratelimit import RateLimiter
+
+        settings.RATE_LIMIT_RATE = 1.0
+        settings.RATE_LIMIT_BURST = 10.0
+        limiter = RateLimiter()
+        assert limiter.take("ip:1", 6, now=0) == 0
+        assert limiter.take("ip:1", 6, now=0) == pytest.approx(2)
+        assert limiter.take("ip:2", 6, now=0) == 0
+        assert limiter.take("ip:1", 6, now=2) == 0
+        assert limiter.take("ip:3", 50, now=0) == 0
+        assert limiter.take("ip:3", 50, now=0) == pytest.approx(10)
+
+        settings.RATE_LIMIT_RATE = 0.001
+        settings.RATE_LIMIT_SHARED = True
+        settings.RATE_LIMIT_SYNC_INTERVAL = 0
+        cache.delete("ratelimit:user:1")
+        first, second = RateLimiter(), RateLimiter()
+        assert first.take("user:1", 6, now=1) == 0
+        # Allowed within the sync lag, then synced
+        assert second.take("user:1", 6, now=1) == 0
+        assert second.take("user:1", 1, now=1) > 0
+        assert first.take("user:1", 1, now=1) == 0
+        assert first.take("user:1", 1, now=1) > 0
+
+    def test_request_cost(self, settings):
+        """
+        Test the cost of list_jobs requests.
+
+        assert:
+          - searches and unfiltered deep pages cost more
+          - larger pages cost proportionally more and are deep sooner
+        """
+        from django.test import RequestFactory
+        from django.urls import resolve
+
+        from app.ratelimit import request_cost
+
+        settings.RATE_LIMIT_SEARCH_COST = 5
+        settings.RATE_LIMIT_DEEP_PAGE = 10
+        settings.RATE_LIMIT_DEEP_PAGE_COST = 5
+        settings.RATE_LIMIT_PAGE_SIZE = 10
+
+        def cost(query):
+            request = RequestFactory().get(f"/api/v1/jobs?{query}")
+            request.resolver_match = resolve(request.path)
+            return request_cost(request)
+
+        assert cost("") == 1
+        assert cost("search=engineer") == 6
+        assert cost("page=10") == 1
+        assert cost("page=11&order_by=-posting_date") == 6
+        assert cost("page=11&location=Remote") == 1
+        assert cost("page_size=50") == 5
+        assert cost("page=3&page_size=50") == 30
+        assert cost("page_size=100000") == 10
+
+    @pytest.mark.django_db
+    def test_middleware(self, settings, token):
+        """
+        Test the rate limits and the admission control of the API.
+
+        assert:
+          - searches cost more and get a 429 with Retry-After once out of tokens
+          - JWT users have their own buckets
+          - expensive requests over the concurrency limit get a 503
+          - other requests and paths outside the API aren't limited
+        """
+        from django.core.signals import request_finished, request_started
+        from django.db import close_old_connections
+
+        from app.loadtest import WSGITarget
+        from app.ratelimit import reset_limiter
+        from mysite.wsgi import application
+
+        settings.RATE_LIMIT_ENABLED = True
+        settings.RATE_LIMIT_RATE = 0.001
+        settings.RATE_LIMIT_BURST = 10.0
+        settings.RATE_LIMIT_SEARCH_COST = 5
+        settings.RATE_LIMIT_EXPENSIVE_COST = 6
+        reset_limiter()
+        target = WSGITarget(application)
+        headers = {"Host": "testserver"}
+
+        def get(path, headers=headers):
+            status, body, _ = target.request("GET", path, headers=headers)
+            return status
+
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        try:
+            assert get("/api/v1/jobs?search=engineer") == 200
+            assert get("/api/v1/jobs") == 200
+            status, body, _ = target.request(
+                "GET", "/api/v1/jobs?search=engineer", headers=headers
+            )
+            assert status == 429
+            assert json.loads(body) == {"detail": "Too many requests"}
+            assert (
+                get(
+                    "/api/v1/jobs?search=engineer",
+                    {**headers, "Authorization": f"Bearer {token}"},
+                )
+                == 200
+            )
+            assert get("/admin/login/") == 200
+
+            settings.RATE_LIMIT_BURST = 100.0
+            settings.RATE_LIMIT_MAX_EXPENSIVE = 0
+            settings.RATE_LIMIT_QUEUE_TIMEOUT = 0
+            reset_limiter()
+            assert get("/api/v1/jobs?search=engineer") == 503
+            assert get("/api/v1/jobs") == 200
+        finally:
+            request_started.connect(close_old_connections)
+            request_finished.connect(close_old_connections)
+            reset_limiter()
+
+
+class TestSoftDelete:
+    @pytest.mark.django_db
+    def test_deleted_jobs_are_hidden(self, client, token, existing_job):
+        """
+        Test soft deleting a job through the API.
+
+        assert:
+          - the job is gone from the reads and can't be updated
+          - its row is kept with `deleted_at` and its company counters drop
+          - the columnar snapshot drops it on its incremental refresh
+        """
+        from app.columnar import ActiveJobSnapshot
+        from app.models import Company
+
+        Company.recount()
+        company = Company.objects.get(id=existing_job.company_id)
+        snapshot = ActiveJobSnapshot(refresh_interval=0)
+        snapshot.refresh()
+        headers = {"Authorization": f"Bearer {token}"}
+
+        response = client.delete(f"/jobs/{existing_job.id}", headers=headers)
+        assert response.status_code == 204
+        assert client.get(f"/jobs/{existing_job.id}").status_code == 404
+        response = client.get("/jobs", query_params={"search": existing_job.title})
+        assert existing_job.id not in [job["id"] for job in response.json()["items"]]
+        response = client.patch(
+            f"/jobs/{existing_job.id}", headers=headers, json={"title": "Back"}
+        )
+        assert response.status_code == 404
+        assert (
+            client.delete(f"/jobs/{existing_job.id}", headers=headers).status_code
+            == 404
+        )
+
+        job = Job.all_objects.get(id=existing_job.id)
+        assert job.deleted_at is not None
+        assert job.version == existing_job.version + 1
+        company.refresh_from_db()
+        assert company.total_job_count == Job.objects.filter(company=company).count()
+        snapshot.refresh()
+        assert existing_job.id not in snapshot.state[0]["id"]
+
+    @pytest.mark.django_db
+    def test_purge(self, existing_job):
+        """
+        Test purging the soft deleted jobs.
+
+        assert:
+          - only the jobs deleted before the cutoff are purged, in batches
+          - their search grams go with them, the counters stay right
+        """
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from app.models import Company, JobSearchGram, purge_jobs
+
+        jobs = list(Job.objects.order_by("id")[:5])
+        for job in jobs:
+            job.delete()
+        Job.all_objects.filter(id__in=[job.id for job in jobs[:3]]).update(
+            deleted_at=timezone.now() - timedelta(days=10)
+        )
+        before = timezone.now() - timedelta(days=7)
+        assert list(purge_jobs(before, batch_size=2)) == [2, 1]
+        remaining = set(
+            Job.all_objects.filter(id__in=[job.id for job in jobs]).values_list(
+                "id", flat=True
+            )
+        )
+        assert remaining == {job.id for job in jobs[3:]}
+        assert not JobSearchGram.objects.filter(
+            job_id__in=[job.id for job in jobs[:3]]
+        ).exists()
+
+        counts = set(
+            Company.objects.values_list("id", "active_job_count", "total_job_count")
+        )
+        Company.recount()
+        assert counts == set(
+            Company.objects.values_list("id", "active_job_count", "total_job_count")
+        )
+
+
+class TestTaskQueue:
+    @pytest.fixture(autouse=True)
+    def queue(self, settings):
+        settings.TASK_QUEUE_ENABLED = True
+
+    @pytest.mark.django_db
+    def test_writes_defer_derived_work(self, client, token, existing_job):
+        """
+        Test the job writes with the task queue.
+
+        assert:
+          - the rollups and the search index are only updated by the worker
+          - duplicate tasks of a write are dropped by their idempotency key
+          - once run, the rollups match a rebuild and the job is found
+        """
+        import threading
+
+        from app.models import JobTrend, Task
+        from app.tasks import work
+        from app.trends import rebuild
+
+        rebuild()
+
+        def trends():
+            return set(
+                JobTrend.objects.filter(job_count__gt=0).values_list(
+                    "period", "dimension", "value", "bucket", "status", "job_count"
+                )
+            )
+
+        before = trends()
+        response = client.patch(
+            f"/jobs/{existing_job.id}",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"title": "Queuedology Engineer", "required_skills": "Queuedology"},
+        )
+        assert response.status_code == 200
+        tasks = list(
+            Task.objects.filter(
+                key__contains=f":{existing_job.id}:{existing_job.version + 1}:"
+            )
+        )
+        assert sorted(task.name for task in tasks) == [
+            "apply_trend_deltas",
+            "index_job",
+        ]
+        assert trends() == before
+        response = client.get("/jobs", query_params={"search": "Queuedology"})
+        assert response.json()["items"] == []
+
+        Task.enqueue([Task(name="index_job", key=tasks[0].key, kwargs={})])
+        assert Task.objects.filter(key=tasks[0].key).count() == 1
+
+        assert work("test", threading.Event(), once=True) >= 2
+        assert not Task.objects.exclude(status=Task.TaskStatus.DONE).exists()
+        response = client.get("/jobs", query_params={"search": "Queuedology"})
+        assert [job["id"] for job in response.json()["items"]] == [existing_job.id]
+        incremental = trends()
+        rebuild()
+        assert incremental == trends()
+
+    @pytest.mark.django_db
+    def test_stale_instance_writes(self, client, token, existing_job):
+        """
+        Test writes through an instance loaded before another write.
+
+        assert:
+          - a delete applies to the stored row, not to the instance's values
+          - the tasks of both writes are enqueued
+          - once run, the rollups match a rebuild
+        """
+        import threading
+
+        from app.models import JobTrend, Task
+        from app.tasks import work
+        from app.trends import rebuild
+
+        rebuild()
+        stale = Job.objects.get(id=existing_job.id)
+        response = client.patch(
+            f"/jobs/{existing_job.id}",
+            headers={"Authorization": f"Bearer {token}"},
+            json={"location": "Staleville"},
+        )
+        assert response.status_code == 200
+        stale.delete()
+        assert stale.version == existing_job.version + 2
+        assert (
+            Task.objects.filter(
+                name="apply_trend_deltas", key__startswith=f"trends:{existing_job.id}:"
+            ).count()
+            == 2
+        )
+
+        work("test", threading.Event(), once=True)
+        incremental = set(
+            JobTrend.objects.filter(job_count__gt=0).values_list(
+                "period", "dimension", "value", "bucket", "status", "job_count"
+            )
+        )
+        rebuild()
+        assert incremental == set(
+            JobTrend.objects.filter(job_count__gt=0).values_list(
+                "period", "dimension", "value", "bucket", "status", "job_count"
+            )
+        )
+
+    @pytest.mark.django_db
+    def test_retries_and_leases(self, settings, existing_job):
+        """
+        Test the failures of the tasks.
+
+        assert:
+          - a failed task is retried later, with backoff
+          - a task without handler is marked failed
+          - a task whose lease expired is claimed again, and isn't run by
+            the worker that lost it
+        """
+        from app.models import Task
+        from app.tasks import HANDLERS, claim, run
+
+        calls = []
+
+        def flaky(job_id):
+            calls.append(job_id)
+            Job.objects.filter(id=job_id).update(views=len(calls))
+            if len(calls) == 1:
+                raise ValueError("flaky")
+
+        settings.TASK_MAX_ATTEMPTS = 2
+        HANDLERS["flaky"] = flaky
+        try:
+            Task.enqueue([Task(name="flaky", kwargs={"job_id": existing_job.id})])
+            (task,) = claim("a", 10)
+            assert run(task) == Task.TaskStatus.QUEUED
+            task.refresh_from_db()
+            assert task.attempts == 1 and task.last_error == "ValueError: flaky"
+            assert task.run_at > timezone_now()
+            assert claim("a", 10) == []
+
+            Task.objects.filter(id=task.id).update(run_at=timezone_now())
+            (lost,) = claim("a", 10)
+            Task.objects.filter(id=task.id).update(locked_until=timezone_now())
+            (task,) = claim("b", 10)
+            assert task.attempts == 3
+            assert run(lost) is None
+            assert Job.objects.get(id=existing_job.id).views == existing_job.views
+            assert run(task) == Task.TaskStatus.DONE
+            assert Job.objects.get(id=existing_job.id).views == 2
+
+            Task.enqueue([Task(name="missing")])
+            (task,) = claim("a", 10)
+            assert run(task) == Task.TaskStatus.FAILED
+        finally:
+            del HANDLERS["flaky"]
+
+
+class TestOpenAPI:
+    @pytest.mark.django_db
+    def test_cached_document(self, create_user, settings, tmp_path):
+        """
+        Test serving the OpenAPI document.
+
+        assert:
+          - it is built once and revalidated with its ETag
+          - a document written by the openapi_schema command is served
+            instead, and checked against the code
+        """
+        from django.core.management.base import CommandError
+        from django.test import Client
+
+        from mysite.urls import api_v1
+
+        settings.OPENAPI_SCHEMA_PATH = ""
+        api_v1._documents.clear()
+        web = Client()
+        web.force_login(create_user)
+
+        response = web.get("/api/openapi.json")
+        assert response.status_code == 200
+        assert "/api/v1/token/pair" in response.json()["paths"]
+        etag = response["ETag"]
+        built = api_v1._documents.copy()
+        response = web.get("/api/openapi.json", HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert api_v1._documents == built
+
+        path = tmp_path / "openapi.json"
+        settings.OPENAPI_SCHEMA_PATH = str(path)
+        with pytest.raises(CommandError):
+            call_command("openapi_schema", check=True)
+        call_command("openapi_schema")
+        call_command("openapi_schema", check=True)
+        path.write_bytes(path.read_bytes().replace(b"Demo Job Finder", b"Precomputed"))
+        api_v1._documents.clear()
+        response = web.get("/api/openapi.json", HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.json()["info"]["title"].startswith("Precomputed")
+        api_v1._documents.clear()
+
+
+# A PostgreSQL database for TestDatabasePool, e.g. TEST_SQL_HOST=localhost
+POSTGRES_ENV = {
+    name[len("TEST_") :]: value
+    for name, value in os.environ.items()
+    if name.startswith("TEST_SQL_")
+}
+
+POOL_SCRIPT = """
+import json, threading, django
+django.setup()
+from django.db import connection, connections
+from app.dbpool import pool_stats
+
+def query():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_sleep(0.2)")
+    connections.close_all()  # Like the end of a request
+
+threads = [threading.Thread(target=query) for _ in range(6)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+with connection.cursor() as cursor:
+    cursor.execute("SELECT 1")
+    print(json.dumps(pool_stats()))
+"""
+
+
+class TestDatabasePool:
+    @pytest.mark.django_db
+    def test_debug_endpoint(self, create_user):
+        """
+        Test the pool metrics of the debug API, without a pool on SQLite.
+
+        assert:
+          - every database is reported with its CONN_MAX_AGE
+        """
+        from app.debug_api import router as debug_router
+
+        response = TestClient(debug_router).get(
+            "/db-pools", headers={"Authorization": "Bearer x"}
+        )
+        assert response.status_code == 401
+        tokens = TestClient(obtain_pair_router).post(
+            "/pair", json={"username": create_user.username, "password": "testpassword"}
+        )
+        response = TestClient(debug_router).get(
+            "/db-pools", headers={"Authorization": f"Bearer {tokens.json()['access']}"}
+        )
+        assert response.status_code == 200
+        assert response.json()[0]["alias"] == "default"
+        assert response.json()[0]["pooled"] is False
+
+    @pytest.mark.skipif(
+        "SQL_HOST" not in POSTGRES_ENV,
+        reason="set TEST_SQL_HOST (and TEST_SQL_USER, ...) to a PostgreSQL server",
+    )
+    def test_postgres_pool(self):
+        """
+        Test the pool against PostgreSQL, 6 threads sharing 2 connections.
+
+        assert:
+          - no more than SQL_POOL_MAX connections are opened
+          - the requests that waited and the saturation are reported
+        """
+        import subprocess
+        import sys
+
+        from django.conf import settings
+
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": "mysite.settings",
+            "SQL_ENGINE": "django.db.backends.postgresql",
+            "SQL_DATABASE": "postgres",
+            **POSTGRES_ENV,
+            "SQL_POOL_MIN": "1",
+            "SQL_POOL_MAX": "2",
+        }
+        process = subprocess.run(
+            [sys.executable, "-c", POOL_SCRIPT],
+            capture_output=True,
+            text=True,
+            cwd=settings.BASE_DIR,
+            env=env,
+        )
+        assert process.returncode == 0, process.stderr
+        (pool,) = json.loads(process.stdout.strip().splitlines()[-1])
+        assert pool["pooled"] and pool["vendor"] == "postgresql"
+        assert pool["max_size"] == 2 and pool["size"] <= 2
+        assert pool["connections_opened"] <= 2
+        assert pool["requests"] >= 7 and pool["requests_queued"] >= 4
+        assert pool["in_use"] == 1 and pool["saturation"] == 0.5
@@ -0,0 +1,266 @@
+"""
+Endpoint benchmarks, skipped unless BENCHMARK=1:
+
+    BENCHMARK=1 python -m pytest app/tests/test_benchmarks.py
+
+Every scenario runs through ninja's TestClient, BENCHMARK_ROUNDS times after a
+warm-up, against each dataset of BENCHMARK_SIZES (comma separated job
+counts). Its query count and fastest round, the least noisy timing, are
+compared with the baseline in app/tests/benchmarks.json: a scenario fails
+when it runs more queries, or when it is more than BENCHMARK_TOLERANCE (a
+fraction) and BENCHMARK_MIN_DELTA_MS slower. The median round is recorded
+too. Scenarios without a baseline only record their results.
+
+BENCHMARK_UPDATE=1 writes the results as the new baseline, and
+BENCHMARK_REPORT=<path> writes them to a JSON report.
+"""
+import itertools
+import json
+import os
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from ninja.testing import TestClient
+from ninja_jwt.routers.obtain import obtain_pair_router
+
+from app.api import router as jobs_router
+from app.counters import view_counter
+from app.geo import geo_fields
+from app.management.commands.seed_data import (
+    company_names,
+    job_titles,
+    required_skills_candidates,
+)
+from app.models import Company, Job
+from app.search import index_jobs
+
+pytestmark = pytest.mark.skipif(
+    os.environ.get("BENCHMARK", "0") != "1", reason="set BENCHMARK=1 to run"
+)
+
+SIZES = [int(size) for size in os.environ.get("BENCHMARK_SIZES", "1000").split(",")]
+ROUNDS = int(os.environ.get("BENCHMARK_ROUNDS", "20"))
+TOLERANCE = float(os.environ.get("BENCHMARK_TOLERANCE", "0.5"))
+MIN_DELTA_MS = float(os.environ.get("BENCHMARK_MIN_DELTA_MS", "1.0"))
+UPDATE = os.environ.get("BENCHMARK_UPDATE", "0") == "1"
+REPORT = os.environ.get("BENCHMARK_REPORT", "")
+BASELINE_PATH = Path(__file__).with_name("benchmarks.json")
+
+LOCATIONS = [
+    "New York, NY",
+    "San Francisco, CA",
+    "London, UK",
+    "Berlin, Germany",
+    "Remote",
+    "Austin, TX",
+]
+LIST_FILTERS = {
+    "all": {},
+    "location": {"location": "Berlin, Germany"},
+    "status": {"status": "active"},
+    "salary": {"salary_gte": "60000"},
+    "skills": {"required_skills": "Python"},
+    "company": {"company_id": None},  # the dataset's first company
+    "near": {"near": "Berlin", "radius_km": 50},
+}
+LIST_ORDERS = [None, "expiration_date", "-popularity"]
+LIST_SEARCHES = [None, "Engineer"]
+
+
+def seed_jobs(size, seed=0):
+    """`size` jobs like seed_data's, spread over the last and next months."""
+    rng = random.Random(seed)
+    companies = {name: Company.get_for_name(name) for name in company_names}
+    today = date.today()
+    jobs = []
+    for i in range(size):
+        company = rng.choice(company_names)
+        location = rng.choice(LOCATIONS)
+        low = rng.randint(30000, 80000)
+        high = rng.randint(low, 120000)
+        posting_date = today - timedelta(days=rng.randint(-10, 60))
+        expiration_date = posting_date + timedelta(days=rng.randint(7, 60))
+        jobs.append(
+            Job(
+                title=f"{rng.choice(job_titles)} #{i + 1}",
+                desc="A job seeded for the endpoint benchmarks.",
+                company_name=company,
+                company=companies[company],
+                location=location,
+                salary_range=f"{low}~{high}",
+                salary_range_avg=(low + high) // 2,
+                posting_date=posting_date,
+                expiration_date=expiration_date,
+                required_skills=",".join(
+                    rng.sample(required_skills_candidates, k=rng.randint(2, 6))
+                ),
+                status=Job(
+                    posting_date=posting_date, expiration_date=expiration_date
+                ).compute_status(),
+                popularity=rng.random() * 100,
+                **geo_fields(location),
+            )
+        )
+    Job.objects.bulk_create(jobs, batch_size=1000)
+    index_jobs(jobs)
+    Company.recount()
+
+
+def measure(call, rounds=ROUNDS):
+    """Fastest and median milliseconds and query count of `call`, after a warm-up."""
+    call()
+    with CaptureQueriesContext(connection) as queries:
+        call()
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return {
+        "min_ms": round(min(timings) * 1000, 3),
+        "median_ms": round(statistics.median(timings) * 1000, 3),
+        "queries": len(queries),
+    }
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(jobs_router)
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    """Baseline results by "<size>:<scenario>", collecting this run's."""
+    baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+    results = {}
+    yield baseline, results
+    if UPDATE:
+        BASELINE_PATH.write_text(
+            json.dumps({**baseline, **results}, indent=2, sort_keys=True) + "\n"
+        )
+    if REPORT:
+        Path(REPORT).write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+
+
+@pytest.fixture(scope="module", params=SIZES, ids=lambda size: f"{size}jobs")
+def dataset(request, django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        seed_jobs(request.param)
+        User.objects.create_user(
+            username="benchmark", password="benchmark", is_staff=True
+        )
+        response = TestClient(obtain_pair_router).post(
+            "/pair", json={"username": "benchmark", "password": "benchmark"}
+        )
+        assert response.status_code == 200
+        yield {
+            "size": request.param,
+            "ids": list(Job.objects.values_list("id", flat=True)),
+            "company_id": Company.objects.get(name=company_names[0]).id,
+            "headers": {"Authorization": f"Bearer {response.json()['access']}"},
+        }
+        view_counter.flush()
+        Job.objects.all().delete()
+        Company.objects.all().delete()
+        User.objects.filter(username="benchmark").delete()
+
+
+@pytest.fixture
+def check(dataset, baseline, settings):
+    # Views are flushed on a timer, which would make query counts vary
+    settings.JOB_VIEW_FLUSH_INTERVAL = 3600
+    expected, results = baseline
+
+    def check(scenario, result):
+        key = f"{dataset['size']}:{scenario}"
+        results[key] = result
+        previous = expected.get(key)
+        if previous is None or UPDATE:
+            return
+        assert (
+            result["queries"] <= previous["queries"]
+        ), f"{key} runs {result['queries']} queries, was {previous['queries']}"
+        limit = max(
+            previous["min_ms"] * (1 + TOLERANCE), previous["min_ms"] + MIN_DELTA_MS
+        )
+        assert (
+            result["min_ms"] <= limit
+        ), f"{key} takes {result['min_ms']}ms, was {previous['min_ms']}ms"
+
+    return check
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize(
+    "filter_name,order,search",
+    list(itertools.product(LIST_FILTERS, LIST_ORDERS, LIST_SEARCHES)),
+)
+def test_list_jobs(client, dataset, check, filter_name, order, search):
+    params = dict(LIST_FILTERS[filter_name])
+    if "company_id" in params:
+        params["company_id"] = dataset["company_id"]
+    if order:
+        params["order_by"] = order
+    if search:
+        params["search"] = search
+
+    def call():
+        response = client.get("/jobs", query_params=params)
+        assert response.status_code == 200
+
+    check(
+        f"list_jobs[{filter_name}|{order or 'default'}|{search or 'nosearch'}]",
+        measure(call),
+    )
+
+
+@pytest.mark.django_db
+def test_get_job(client, dataset, check):
+    ids = itertools.cycle(dataset["ids"])
+
+    def call():
+        response = client.get(f"/jobs/{next(ids)}")
+        assert response.status_code == 200
+
+    check("get_job", measure(call))
+
+
+@pytest.mark.django_db
+def test_create_job(client, dataset, check):
+    payload = {
+        "title": "Benchmark Engineer",
+        "desc": "A job created by the endpoint benchmarks.",
+        "location": "Berlin, Germany",
+        "salary_range": "50000~70000",
+        "company_name": company_names[0],
+        "expiration_date": (date.today() + timedelta(days=30)).isoformat(),
+        "required_skills": "Python,Django",
+    }
+
+    def call():
+        response = client.post("/jobs", json=payload, headers=dataset["headers"])
+        assert response.status_code == 201
+
+    check("create_job", measure(call))
+
+
+@pytest.mark.django_db
+def test_update_job(client, dataset, check):
+    ids = itertools.cycle(dataset["ids"])
+
+    def call():
+        response = client.put(
+            f"/jobs/{next(ids)}",
+            json={"title": "Updated Benchmark Engineer"},
+            headers=dataset["headers"],
+        )
+        assert response.status_code == 200
+
+    check("update_job", measure(call))
@@ -0,0 +1,100 @@
+"""
+Skill and location posting trends read from the JobTrend rollups.
+
+The rollups are kept up to date on every job write (see
+`app.models.update_job_trends`); `rebuild` recomputes them from scratch
+for backfills, counting id ranges of the jobs table in parallel processes.
+"""
+import logging
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import connections, transaction
+from django.db.models import Max, Min, Sum
+
+from app.models import TREND_FIELDS, Job, JobTrend, trend_keys
+
+logger = logging.getLogger(__name__)
+
+
+def count_chunk(start, stop):
+    """Count the rollup keys of the jobs with start <= id < stop."""
+    counts = Counter()
+    rows = (
+        Job.objects.filter(id__gte=start, id__lt=stop)
+        .order_by()
+        .values_list(*TREND_FIELDS)
+        .iterator(chunk_size=5000)
+    )
+    for row in rows:
+        counts.update(trend_keys(*row))
+    return counts
+
+
+def rebuild(workers=1, chunk_size=50000):
+    """
+    Recompute every rollup. Writes made while the jobs are counted may be
+    missed, run it when the jobs table is quiet. Returns the number of rows.
+    """
+    bounds = Job.objects.aggregate(low=Min("id"), high=Max("id"))
+    chunks = []
+    if bounds["low"] is not None:
+        chunks = [
+            (start, start + chunk_size)
+            for start in range(bounds["low"], bounds["high"] + 1, chunk_size)
+        ]
+
+    counts = Counter()
+    if workers > 1 and len(chunks) > 1:
+        # Forked workers must open their own database connections
+        connections.close_all()
+        with ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context("fork")
+        ) as executor:
+            for chunk_counts in executor.map(count_chunk, *zip(*chunks)):
+                counts.update(chunk_counts)
+    else:
+        for start, stop in chunks:
+            counts.update(count_chunk(start, stop))
+
+    with transaction.atomic():
+        JobTrend.objects.all().delete()
+        JobTrend.objects.bulk_create(
+            (
+                JobTrend(
+                    period=period,
+                    dimension=dimension,
+                    value=value,
+                    bucket=bucket,
+                    status=status,
+                    job_count=count,
+                )
+                for (period, dimension, value, bucket, status), count in counts.items()
+            ),
+            batch_size=1000,
+        )
+    logger.info(f"Rebuilt {len(counts)} trend rows from {len(chunks)} chunks")
+    return len(counts)
+
+
+def trend_series(dimension, period, value=None, status=None, start=None, end=None):
+    """
+    Job counts per bucket, per value when `value` isn't given, summed over
+    the statuses unless `status` is given.
+    """
+    trends = JobTrend.objects.filter(period=period, dimension=dimension)
+    if value is not None:
+        trends = trends.filter(value=value)
+    if status is not None:
+        trends = trends.filter(status=status)
+    if start is not None:
+        trends = trends.filter(bucket__gte=start)
+    if end is not None:
+        trends = trends.filter(bucket__lte=end)
+    return (
+        trends.values("value", "bucket")
+        .annotate(count=Sum("job_count"))
+        .filter(count__gt=0)
+        .order_by("value", "bucket")
+    )
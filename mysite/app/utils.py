@@ -1,3 +1,19 @@
+from django.db import connection
+from django.utils.http import parse_etags
+
+ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def fold_case(value: str) -> str:
+    """
+    Case-fold like the database does for `icontains`: SQLite's LIKE only
+    folds ASCII letters, the other backends compare UPPER() of both sides.
+    """
+    if connection.vendor == "sqlite":
+        return value.translate(ASCII_LOWER)
+    return value.upper()
+
+
 def salary_range_validator(value: str) -> None:
     """
     Validate the salary range format.
@@ -19,3 +35,22 @@ def salary_range_validator(value: str) -> None:
             raise ValueError("salary_range min cannot be greater than max")
     except ValueError:
         raise ValueError("salary_range must contain valid numeric values")
+
+
+def parse_if_match(value):
+    """
+    Parse an If-Match header into the list of job versions it accepts.
+    Returns None when the header is absent or is "*" (any version).
+    Weak entity tags never match, as required for If-Match.
+    """
+    if not value or value.strip() == "*":
+        return None
+    versions = []
+    for etag in parse_etags(value):
+        if etag.startswith('"') and etag[1:-1].isdigit():
+            versions.append(int(etag[1:-1]))
+    return versions
+
+
+def version_etag(version: int) -> str:
+    return f'"{version}"'
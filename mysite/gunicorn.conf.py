@@ -0,0 +1,84 @@
+"""
+Production server configuration, picked up by gunicorn from this directory:
+
+    gunicorn
+    gunicorn -k uvicorn_worker.UvicornWorker mysite.asgi:application
+
+The application is imported and warmed up (URL resolver, API schemas,
+in-process indexes, see app/startup.py) once in the master before forking,
+so workers share it and start ready. Each worker then opens its database
+connections and sends the warm-up requests before it is handed traffic.
+Connections and connection pools opened in the master are closed before
+forking, they can't be shared between processes. With GUNICORN_THREADS
+above 1, only the warm-up thread's connections are opened ahead.
+
+Environment:
+- GUNICORN_BIND (0.0.0.0:8000)
+- WEB_CONCURRENCY: number of workers, by default 2 per available CPU plus
+  one, capped at GUNICORN_MAX_WORKERS (8)
+- GUNICORN_THREADS (1), GUNICORN_TIMEOUT (30), GUNICORN_MAX_REQUESTS (0)
+- SERVER_WARMUP (1): 0 disables the warm-up
+"""
+import math
+import os
+
+from django.db import connections
+
+SERVER_WARMUP = os.environ.get("SERVER_WARMUP", "1") == "1"
+
+
+def available_cpus():
+    """CPUs this process may run on, within the cgroup v2 quota if any."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # macOS
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+def default_workers():
+    limit = int(os.environ.get("GUNICORN_MAX_WORKERS", "8"))
+    return min(2 * available_cpus() + 1, limit)
+
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mysite.settings")
+
+wsgi_app = "mysite.wsgi:application"
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", default_workers()))
+threads = int(os.environ.get("GUNICORN_THREADS", "1"))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+preload_app = True
+accesslog = "-"
+
+
+def when_ready(server):
+    # Runs in the master once the preloaded application is imported
+    from app.dbpool import close_pools
+
+    if SERVER_WARMUP:
+        from app.startup import PRELOAD_STEPS, warm_up
+
+        warm_up(PRELOAD_STEPS)
+    connections.close_all()
+    close_pools()
+
+
+def post_fork(server, worker):
+    connections.close_all()
+
+
+def post_worker_init(worker):
+    if SERVER_WARMUP:
+        from app.startup import WORKER_STEPS, warm_up
+
+        warm_up(WORKER_STEPS)
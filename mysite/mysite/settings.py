@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import os
+import tempfile
 from datetime import timedelta
 from pathlib import Path
 
@@ -51,6 +52,9 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "app.middleware.SlowQuerySamplerMiddleware",
+    "app.middleware.RequestProfilingMiddleware",
+    "app.middleware.RateLimitMiddleware",
 ]
 
 ROOT_URLCONF = "mysite.urls"
@@ -84,9 +88,216 @@ DATABASES = {
         "PASSWORD": os.environ.get("SQL_PASSWORD", ""),
         "HOST": os.environ.get("SQL_HOST", ""),
         "PORT": os.environ.get("SQL_PORT", ""),
+        # Seconds a connection is reused across requests, 0 closes it after each
+        "CONN_MAX_AGE": int(os.environ.get("SQL_CONN_MAX_AGE", "0")),
+        "CONN_HEALTH_CHECKS": os.environ.get("SQL_CONN_HEALTH_CHECKS", "0") == "1",
     },
 }
 
+# Connection pool of each process on PostgreSQL (psycopg 3), disabled with
+# SQL_POOL_MAX=0 for CONN_MAX_AGE's persistent connections. Requests borrow
+# a connection and return it when they finish, SQL_CONN_HEALTH_CHECKS checks
+# it when borrowed. Keep workers * SQL_POOL_MAX below max_connections. See
+# app/dbpool.py for the pool metrics.
+SQL_POOL_MIN = int(os.environ.get("SQL_POOL_MIN", "1"))
+# Below GUNICORN_THREADS (or run_tasks --threads), the threads beyond the pool
+# queue for a connection and fail after SQL_POOL_TIMEOUT, so the default
+# covers the threads of a gunicorn worker
+SQL_POOL_MAX = int(
+    os.environ.get("SQL_POOL_MAX", max(4, int(os.environ.get("GUNICORN_THREADS", "1"))))
+)
+# Seconds a request waits for a connection before failing
+SQL_POOL_TIMEOUT = float(os.environ.get("SQL_POOL_TIMEOUT", "10"))
+SQL_POOL_MAX_IDLE = float(os.environ.get("SQL_POOL_MAX_IDLE", "600"))
+SQL_POOL_MAX_LIFETIME = float(os.environ.get("SQL_POOL_MAX_LIFETIME", "3600"))
+if DATABASES["default"]["ENGINE"] == "django.db.backends.postgresql" and SQL_POOL_MAX:
+    DATABASES["default"]["CONN_MAX_AGE"] = 0  # Pooled connections aren't persistent
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": min(SQL_POOL_MIN, SQL_POOL_MAX),
+            "max_size": SQL_POOL_MAX,
+            "timeout": SQL_POOL_TIMEOUT,
+            "max_idle": SQL_POOL_MAX_IDLE,
+            "max_lifetime": SQL_POOL_MAX_LIFETIME,
+        },
+    }
+
+# Production profile for SQLite, see app/sqlite.py
+SQLITE_PRODUCTION = os.environ.get("SQLITE_PRODUCTION", "0") == "1"
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+    "cache_size": int(os.environ.get("SQLITE_CACHE_SIZE", -64 * 1024)),  # KiB
+    "busy_timeout": int(os.environ.get("SQLITE_BUSY_TIMEOUT", 5000)),  # ms
+    "temp_store": "MEMORY",
+}
+SQLITE_OPTIMIZE_INTERVAL = int(os.environ.get("SQLITE_OPTIMIZE_INTERVAL", 3600))
+SQLITE_CHECKPOINT_INTERVAL = int(os.environ.get("SQLITE_CHECKPOINT_INTERVAL", 300))
+SQLITE_WAL_TRUNCATE_BYTES = int(
+    os.environ.get("SQLITE_WAL_TRUNCATE_BYTES", 64 * 1024 * 1024)
+)
+if SQLITE_PRODUCTION and DATABASES["default"]["ENGINE"].endswith("sqlite3"):
+    # Take the write lock when a transaction starts, waiting on busy_timeout,
+    # instead of failing when a read transaction upgrades to a write
+    DATABASES["default"]["OPTIONS"] = {"transaction_mode": "IMMEDIATE"}
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    },
+}
+
+# Per-id cache of get_job and the batch endpoints, invalidated on job writes
+JOB_CACHE_ENABLED = os.environ.get("JOB_CACHE_ENABLED", "0") == "1"
+JOB_CACHE_TIMEOUT = int(os.environ.get("JOB_CACHE_TIMEOUT", "300"))
+
+# Cached list_jobs pages, served stale for up to STALE_TIMEOUT seconds after
+# expiring or after a job write while a single worker recomputes them
+JOB_LIST_CACHE_ENABLED = os.environ.get("JOB_LIST_CACHE_ENABLED", "0") == "1"
+JOB_LIST_CACHE_TIMEOUT = int(os.environ.get("JOB_LIST_CACHE_TIMEOUT", "30"))
+JOB_LIST_CACHE_STALE_TIMEOUT = int(
+    os.environ.get("JOB_LIST_CACHE_STALE_TIMEOUT", "300")
+)
+JOB_CACHE_LOCK_TIMEOUT = int(os.environ.get("JOB_CACHE_LOCK_TIMEOUT", "10"))
+
+# Seconds the salary analytics are kept, job writes invalidate them earlier
+JOB_ANALYTICS_CACHE_TIMEOUT = int(os.environ.get("JOB_ANALYTICS_CACHE_TIMEOUT", "600"))
+
+# Buffered job view counters and the popularity score, see app/counters.py
+JOB_VIEW_FLUSH_INTERVAL = float(os.environ.get("JOB_VIEW_FLUSH_INTERVAL", "10"))
+JOB_VIEW_FLUSH_MAX_PENDING = int(os.environ.get("JOB_VIEW_FLUSH_MAX_PENDING", "1000"))
+JOB_POPULARITY_HALF_LIFE_DAYS = float(
+    os.environ.get("JOB_POPULARITY_HALF_LIFE_DAYS", "7")
+)
+
+# In-process NumPy snapshot of the active jobs answering common list_jobs
+# queries, see app/columnar.py. VERIFY compares every answer with the ORM.
+JOB_COLUMNAR_ENABLED = os.environ.get("JOB_COLUMNAR_ENABLED", "0") == "1"
+JOB_COLUMNAR_REFRESH_INTERVAL = float(
+    os.environ.get("JOB_COLUMNAR_REFRESH_INTERVAL", "1.0")
+)
+JOB_COLUMNAR_VERIFY = os.environ.get("JOB_COLUMNAR_VERIFY", "0") == "1"
+
+# Opt-in sampler of slow queries with their query plans, see
+# app/instrumentation.py and the slow_queries management command
+SLOW_QUERY_SAMPLER_ENABLED = os.environ.get("SLOW_QUERY_SAMPLER_ENABLED", "0") == "1"
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", "100"))
+SLOW_QUERY_SAMPLE_RATE = float(os.environ.get("SLOW_QUERY_SAMPLE_RATE", "1.0"))
+SLOW_QUERY_BUFFER_SIZE = int(os.environ.get("SLOW_QUERY_BUFFER_SIZE", "500"))
+SLOW_QUERY_LOG_PATH = os.environ.get("SLOW_QUERY_LOG_PATH", "")
+
+# Per-request profiling, see app/profiling.py
+REQUEST_PROFILING_ENABLED = os.environ.get("REQUEST_PROFILING_ENABLED", "0") == "1"
+REQUEST_PROFILING_HEADER = os.environ.get("REQUEST_PROFILING_HEADER", "X-Profile")
+REQUEST_PROFILING_SAMPLE_RATE = float(
+    os.environ.get("REQUEST_PROFILING_SAMPLE_RATE", "0")
+)
+REQUEST_PROFILING_INTERVAL_MS = float(
+    os.environ.get("REQUEST_PROFILING_INTERVAL_MS", "5")
+)
+REQUEST_PROFILING_DIR = os.environ.get(
+    "REQUEST_PROFILING_DIR", os.path.join(tempfile.gettempdir(), "job-finder-profiles")
+)
+REQUEST_PROFILING_MAX_FILES = int(os.environ.get("REQUEST_PROFILING_MAX_FILES", "50"))
+
+# Saved search alerts, see app/percolator.py
+SAVED_SEARCH_ALERTS_ENABLED = os.environ.get("SAVED_SEARCH_ALERTS_ENABLED", "0") == "1"
+PERCOLATOR_REFRESH_INTERVAL = float(
+    os.environ.get("PERCOLATOR_REFRESH_INTERVAL", "1.0")
+)
+
+# Similar jobs index, see app/similar.py
+SIMILAR_JOBS_INDEX_PATH = os.environ.get(
+    "SIMILAR_JOBS_INDEX_PATH", BASE_DIR / "indexes" / "similar_jobs.npz"
+)
+SIMILAR_JOBS_REFRESH_INTERVAL = float(
+    os.environ.get("SIMILAR_JOBS_REFRESH_INTERVAL", "5")
+)
+SIMILAR_JOBS_CACHE_TIMEOUT = int(os.environ.get("SIMILAR_JOBS_CACHE_TIMEOUT", "600"))
+
+# Geocoding and geo filters of the jobs, see app/geo.py
+GEO_GAZETTEER_PATH = os.environ.get(
+    "GEO_GAZETTEER_PATH", BASE_DIR / "app" / "data" / "gazetteer.csv"
+)
+GEO_DEFAULT_RADIUS_KM = float(os.environ.get("GEO_DEFAULT_RADIUS_KM", "50"))
+
+# Trigram index of the list_jobs search, see app/search.py
+JOB_SEARCH_INDEX_ENABLED = os.environ.get("JOB_SEARCH_INDEX_ENABLED", "1") == "1"
+
+# Soft deleted jobs kept before purge_deleted_jobs removes them, in batches
+JOB_PURGE_AFTER_DAYS = float(os.environ.get("JOB_PURGE_AFTER_DAYS", "7"))
+JOB_PURGE_BATCH_SIZE = int(os.environ.get("JOB_PURGE_BATCH_SIZE", "200"))
+JOB_PURGE_PAUSE = float(os.environ.get("JOB_PURGE_PAUSE", "0.1"))
+
+# Database queue of the derived work of the job writes (trend rollups,
+# search index, percolation), run by the run_tasks command, see app/tasks.py
+TASK_QUEUE_ENABLED = os.environ.get("TASK_QUEUE_ENABLED", "0") == "1"
+TASK_WORKER_THREADS = int(os.environ.get("TASK_WORKER_THREADS", "4"))
+TASK_BATCH_SIZE = int(os.environ.get("TASK_BATCH_SIZE", "10"))
+TASK_POLL_INTERVAL = float(os.environ.get("TASK_POLL_INTERVAL", "1.0"))
+TASK_LEASE_SECONDS = int(os.environ.get("TASK_LEASE_SECONDS", "300"))
+TASK_MAX_ATTEMPTS = int(os.environ.get("TASK_MAX_ATTEMPTS", "5"))
+TASK_RETRY_DELAY = float(os.environ.get("TASK_RETRY_DELAY", "5"))  # doubled per attempt
+TASK_RETRY_MAX_DELAY = float(os.environ.get("TASK_RETRY_MAX_DELAY", "3600"))
+TASK_DONE_RETENTION_DAYS = float(os.environ.get("TASK_DONE_RETENTION_DAYS", "7"))
+
+# OpenAPI document written at deploy by the openapi_schema command and
+# served instead of being built by every worker, see app/openapi.py
+OPENAPI_SCHEMA_PATH = os.environ.get("OPENAPI_SCHEMA_PATH", "")
+
+# Rows the job admin counts exactly, larger counts are estimated, see app/admin.py
+ADMIN_EXACT_COUNT_LIMIT = int(os.environ.get("ADMIN_EXACT_COUNT_LIMIT", "10000"))
+
+# Per-client token buckets and admission control of the API, see app/ratelimit.py
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "0") == "1"
+RATE_LIMIT_PATH_PREFIX = os.environ.get("RATE_LIMIT_PATH_PREFIX", "/api/")
+RATE_LIMIT_RATE = float(os.environ.get("RATE_LIMIT_RATE", "10"))  # tokens/s
+RATE_LIMIT_BURST = float(os.environ.get("RATE_LIMIT_BURST", "100"))
+# Tokens taken by a request per "METHOD /path", 1 for the other endpoints
+RATE_LIMIT_COSTS = {
+    "GET /api/v1/jobs/analytics/salary": 5,
+    "GET /api/v1/jobs/analytics/trends": 2,
+    "GET /api/v1/jobs/{job_id}/similar": 2,
+    "POST /api/v1/jobs/batch": 2,
+}
+RATE_LIMIT_SEARCH_COST = float(os.environ.get("RATE_LIMIT_SEARCH_COST", "5"))
+RATE_LIMIT_DEEP_PAGE = int(os.environ.get("RATE_LIMIT_DEEP_PAGE", "10"))
+# Page size the costs are set for, larger pages cost proportionally more
+RATE_LIMIT_PAGE_SIZE = int(os.environ.get("RATE_LIMIT_PAGE_SIZE", "10"))
+RATE_LIMIT_DEEP_PAGE_COST = float(os.environ.get("RATE_LIMIT_DEEP_PAGE_COST", "5"))
+# Requests of this cost or more are limited to MAX_EXPENSIVE in flight per process
+RATE_LIMIT_EXPENSIVE_COST = float(os.environ.get("RATE_LIMIT_EXPENSIVE_COST", "5"))
+RATE_LIMIT_MAX_EXPENSIVE = int(os.environ.get("RATE_LIMIT_MAX_EXPENSIVE", "4"))
+RATE_LIMIT_QUEUE_TIMEOUT = float(os.environ.get("RATE_LIMIT_QUEUE_TIMEOUT", "0.5"))
+RATE_LIMIT_RETRY_AFTER = int(os.environ.get("RATE_LIMIT_RETRY_AFTER", "1"))
+RATE_LIMIT_MAX_CLIENTS = int(os.environ.get("RATE_LIMIT_MAX_CLIENTS", "10000"))
+RATE_LIMIT_PROXY_COUNT = int(os.environ.get("RATE_LIMIT_PROXY_COUNT", "0"))
+# Share the buckets across processes through the cache
+RATE_LIMIT_SHARED = os.environ.get("RATE_LIMIT_SHARED", "0") == "1"
+RATE_LIMIT_SYNC_INTERVAL = float(os.environ.get("RATE_LIMIT_SYNC_INTERVAL", "1"))
+
+# Warm-up of the server processes, see app/startup.py and gunicorn.conf.py
+SERVER_WARMUP_PATHS = [
+    path
+    for path in os.environ.get(
+        "SERVER_WARMUP_PATHS",
+        "/api/v1/jobs,/api/v1/jobs?search=engineer,/api/v1/companies",
+    ).split(",")
+    if path
+]
+
+# Pre-rendered GET /jobs pages, see app/snapshots.py
+STATIC_SNAPSHOT_DIR = os.environ.get("STATIC_SNAPSHOT_DIR", BASE_DIR / "snapshots")
+STATIC_SNAPSHOT_PAGES = int(os.environ.get("STATIC_SNAPSHOT_PAGES", "3"))
+STATIC_SNAPSHOT_LOCATIONS = int(os.environ.get("STATIC_SNAPSHOT_LOCATIONS", "10"))
+STATIC_SNAPSHOT_STATUSES = os.environ.get("STATIC_SNAPSHOT_STATUSES", "active").split(
+    ","
+)
+
 FIXTURE_DIRS = [BASE_DIR / "app/tests/fixtures"]
 
 # Password validation
@@ -15,13 +15,14 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from app.api import router as jobs_router
+from app.debug_api import router as debug_router
+from app.openapi import CachedSchemaAPI
 from django.contrib import admin
 from django.contrib.admin.views.decorators import staff_member_required
 from django.urls import path
-from ninja import NinjaAPI
 from ninja_jwt.routers.obtain import obtain_pair_router
 
-api_v1 = NinjaAPI(
+api_v1 = CachedSchemaAPI(
     openapi_extra={
         "info": {
             "termsOfService": "https://example.com/terms/",
@@ -33,6 +34,7 @@ api_v1 = NinjaAPI(
 )
 api_v1.add_router("/v1", jobs_router)  # Register the jobs router under /v1
 api_v1.add_router("/v1/token", tags=["Auth"], router=obtain_pair_router)
+api_v1.add_router("/v1/debug", debug_router)  # Staff only diagnostics
 
 urlpatterns = [
     path("admin/", admin.site.urls),